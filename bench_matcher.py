@@ -0,0 +1,127 @@
+"""
+匹配器最坏情况基准测试 (固定随机种子，可重复)。
+
+生成正常浮窗、超长噪声行、大量行、以及故意包含关键词碎片的对抗样本，
+逐帧调用 AffixMatcher.check，统计每次判定的耗时，超过上限时以非 0 退出码结束。
+另外检查超时退化不会污染词缀目录的关键词缓存 (一次超时之后的完整判定结果必须与不限时一致)。
+
+用法:
+    python bench_matcher.py                  # 默认 300 帧，单次上限 200 ms
+    python bench_matcher.py --frames 1000 --max-ms 150 --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.affix_config import DEFAULT_CONFIGS
+from src.gear_washer.affix_catalog import AffixCatalog
+from src.gear_washer.compiled_rule import split_keywords
+from src.gear_washer.matcher import AffixMatcher
+
+NORMAL_LINES = [
+    "+75% 法术伤害", "+120 智力", "冰霜抗性 +30%", "+2 所有技能", "+15% 冰冻系法术伤害",
+    "-20% 敌人冰冻抗性", "生命回复 +12", "暴击几率 +5.5%", "物品强度 800", "需要等级 70",
+]
+NOISE_CHARS = "一丨口日曰目田由甲申电里果木林森火炎焱水氵冫冰雹雪系技能法术伤害敌人抗性|_-=~.,:;'\"!@#$%^&*()[]{}<>/\\0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def make_frame(rng: random.Random, kind: str, keywords) -> str:
+    if kind == 'normal':
+        return '\n'.join(rng.sample(NORMAL_LINES, rng.randint(3, len(NORMAL_LINES))))
+    if kind == 'long_noise':
+        # 背景被读成一整段噪声
+        return ''.join(rng.choice(NOISE_CHARS) for _ in range(rng.randint(500, 6000)))
+    if kind == 'many_lines':
+        return '\n'.join(''.join(rng.choice(NOISE_CHARS) for _ in range(rng.randint(5, 60)))
+                         for _ in range(rng.randint(50, 400)))
+    # 对抗样本: 关键词碎片 (删/改一个字) 密集重复，尽量让每个窗口都通过 q-gram 过滤
+    parts = []
+    for _ in range(rng.randint(100, 800)):
+        kw = list(rng.choice(keywords))
+        if len(kw) > 1:
+            kw[rng.randrange(len(kw))] = rng.choice(NOISE_CHARS)
+        parts.append(''.join(kw))
+    return rng.choice(['', ' ', '|']).join(parts)
+
+
+def check_catalog_budget(rng: random.Random, size: int = 3000) -> bool:
+    """
+    大词缀目录 + 模糊关键词: 第一次判定故意超时 (退化)，之后按正常预算判定的结果必须和不限时相同。
+    """
+    entries = {"冰冻系法术伤害"}
+    while len(entries) < size:
+        entries.add(''.join(rng.choice(NOISE_CHARS[:40]) for _ in range(rng.randint(4, 12))))
+    text = "+15% 冰冻系法术伤害\n+120 智力"
+    rule = [{'type': 'AND', 'affixes': ['冰冻系法伤害']}]
+
+    reference = AffixMatcher(memo_size=0)
+    reference.time_budget = None
+    reference.set_catalog(AffixCatalog(entries))
+    expected = reference.check(text, rule)
+
+    matcher = AffixMatcher()
+    matcher.set_catalog(AffixCatalog(entries))
+    matcher.time_budget = 1e-9  # 立即超时
+    matcher.check(text, rule)
+    first_degraded = matcher.degraded_checks > 0  # 判定为满足时 check 会再不限时判定一次，last_degraded 看不出来
+    matcher.time_budget = None
+    results = [matcher.check(text, rule) for _ in range(2)]  # 第二次来自缓存
+    ok = all(r == expected for r in results)
+    print(f"目录超时回归 ({size} 条): 不限时 {expected}，超时后 {results} "
+          f"(第一次退化: {first_degraded}) -> {'通过' if ok else '失败'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匹配器最坏情况耗时基准")
+    parser.add_argument('--frames', type=int, default=300, help="生成的帧数")
+    parser.add_argument('--seed', type=int, default=20240101, help="随机种子")
+    parser.add_argument('--max-ms', type=float, default=200.0, help="单次 check 允许的最长耗时 (毫秒)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules = list(DEFAULT_CONFIGS.values())
+    keywords = [kw for rule in rules for kw in split_keywords(rule)] or ["法术伤害"]
+    kinds = ['normal', 'long_noise', 'many_lines', 'adversarial']
+
+    matcher = AffixMatcher(memo_size=0)  # 关闭缓存，测的是真实判定耗时
+    timings = {kind: [] for kind in kinds}
+    worst = (0.0, None, None)
+    for i in range(args.frames):
+        kind = kinds[i % len(kinds)]
+        text = make_frame(rng, kind, keywords)
+        rule = rules[i % len(rules)]
+        start = time.perf_counter()
+        matcher.check(text, rule)
+        elapsed = (time.perf_counter() - start) * 1000
+        timings[kind].append(elapsed)
+        if elapsed > worst[0]:
+            worst = (elapsed, kind, len(text))
+
+    print(f"种子: {args.seed}  帧数: {args.frames}  时间预算: {matcher.time_budget}s  "
+          f"行数上限: {matcher.MAX_FRAME_LINES}  单行上限: {matcher.MAX_LINE_LENGTH}")
+    for kind in kinds:
+        values = sorted(timings[kind])
+        if not values:
+            continue
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"  {kind:<12} 次数 {len(values):>4}  平均 {sum(values) / len(values):7.2f} ms  "
+              f"p95 {p95:7.2f} ms  最大 {values[-1]:7.2f} ms")
+    print(f"超时退化: {matcher.degraded_checks} 次")
+    print(f"最慢一次: {worst[0]:.2f} ms ({worst[1]}, 原始长度 {worst[2]})")
+
+    if not check_catalog_budget(random.Random(args.seed)):
+        print("失败: 超时退化的结果被写进了词缀目录的关键词缓存")
+        sys.exit(1)
+    if worst[0] > args.max_ms:
+        print(f"失败: 最慢一次超过上限 {args.max_ms} ms")
+        sys.exit(1)
+    print(f"通过: 所有判定均在 {args.max_ms} ms 以内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+端到端洗炼基准测试 (无头模拟器，Linux 上也能运行，不需要 Windows 和游戏)。
+
+用 simulator.GameSimulator 渲染 Median XL 风格的装备浮窗并模拟悬停 / 洗炼按键的延迟、抖动和丢失，
+让 GearWasher.run() 完整地洗若干件装备，统计:
+  - 洗炼速度 (次/秒)
+  - 成功用时 (p50 / p95) 与平均洗炼次数
+  - 误停率: 停下时装备实际的词缀 (等待中的刷新全部完成后) 并不满足目标的比例
+  - 洗掉的满足目标的装备 (识别漏判)
+
+默认用模拟器自带的识别 (直接返回渲染的文字，可用 --ocr-error 注入识别错误)；
+--ocr tesseract 时走真实的 tesseract (需要安装 tesseract、chi_sim 语言包和中文字体)。
+
+用法:
+    python bench_simulator.py                                # 默认 20 件装备
+    python bench_simulator.py --trials 50 --ocr-error 0.05 --drop 0.02
+    python bench_simulator.py --reroll-latency 0.15 --jitter 0.05 --interval 0.1 --timing
+    python bench_simulator.py --roi --adaptive                # 同时测试浮窗布局和自适应等待
+    python bench_simulator.py --rule "默认-冰雹项链" --affix-table my_affixes.json
+    python bench_simulator.py --ocr tesseract --font /usr/share/fonts/truetype/wqy/wqy-microhei.ttc
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+from contextlib import redirect_stdout, nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.affix_config import DEFAULT_CONFIGS
+from src.gear_washer.jobs import MATCHED, STATUS_TEXT
+from src.gear_washer.matcher import AffixMatcher
+from src.gear_washer.simulator import GameSimulator, load_affix_table
+from src.gear_washer.washer import GearWasher
+
+# 默认目标: 所有技能 + (冰冻系 或 敌人冰冻)，默认词缀表下大约每 6 次洗炼命中一次
+DEFAULT_RULE = [
+    {"type": "AND", "affixes": ["所有技能"]},
+    {"type": "COUNT", "min": 1, "affixes": ["冻系", "人冰"]},
+]
+
+
+def load_rule(value):
+    if not value:
+        return DEFAULT_RULE
+    if value in DEFAULT_CONFIGS:
+        return DEFAULT_CONFIGS[value]
+    with open(value, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无头模拟器上的端到端洗炼基准")
+    parser.add_argument('--trials', type=int, default=20, help="洗多少件装备")
+    parser.add_argument('--seed', type=int, default=20240101, help="随机种子")
+    parser.add_argument('--rule', default=None, help="目标规则: affix_config 中的名称或 JSON 文件 (默认 所有技能 + 冰冻)")
+    parser.add_argument('--affix-table', default=None, help="JSON 词缀表 (默认使用模拟器内置的)")
+    parser.add_argument('--max-attempts', type=int, default=500, help="每件装备最多洗炼次数")
+    parser.add_argument('--interval', type=float, default=0.1, help="洗炼后的等待时间 (秒)")
+    parser.add_argument('--hover-wait', type=float, default=0.05, help="悬停后的等待时间 (秒)")
+    parser.add_argument('--hover-latency', type=float, default=0.03, help="模拟的浮窗出现延迟 (秒)")
+    parser.add_argument('--reroll-latency', type=float, default=0.08, help="模拟的洗炼刷新延迟 (秒)")
+    parser.add_argument('--jitter', type=float, default=0.02, help="延迟的随机抖动 (±秒)")
+    parser.add_argument('--drop', type=float, default=0.0, help="按键丢失的概率")
+    parser.add_argument('--ocr', choices=('oracle', 'tesseract'), default='oracle', help="识别方式")
+    parser.add_argument('--ocr-error', type=float, default=0.0, help="oracle 识别时每行注入错误的概率")
+    parser.add_argument('--tesseract', default=None, help="tesseract 可执行文件路径 (默认使用 PATH 中的)")
+    parser.add_argument('--font', default=None, help="渲染浮窗用的中文字体文件")
+    parser.add_argument('--adaptive', action='store_true', help="开启自适应等待 (实测浮窗出现 / 刷新时间)")
+    parser.add_argument('--roi', action='store_true', help="开启浮窗布局学习 (只识别词缀区)")
+    parser.add_argument('--timing', action='store_true', help="结束时打印各阶段耗时 p50/p95/p99")
+    parser.add_argument('--max-false-stop', type=float, default=None, help="误停率上限，超过时以非 0 退出码结束")
+    parser.add_argument('--verbose', action='store_true', help="显示洗炼器的输出")
+    args = parser.parse_args()
+
+    rule = load_rule(args.rule)
+    sim = GameSimulator(load_affix_table(args.affix_table) if args.affix_table else None, seed=args.seed,
+                        font_path=args.font, hover_latency=args.hover_latency, reroll_latency=args.reroll_latency,
+                        jitter=args.jitter, drop_rate=args.drop, ocr_error_rate=args.ocr_error)
+    if args.ocr == 'tesseract' and not sim.font_path:
+        print("错误: 找不到中文字体，tesseract 无法识别渲染的浮窗，请用 --font 指定")
+        sys.exit(2)
+
+    washer = sim.attach(GearWasher(tesseract_cmd=args.tesseract), oracle_ocr=args.ocr == 'oracle')
+    washer.conditions = rule
+    washer.max_attempts = args.max_attempts
+    washer.interval = args.interval
+    washer.hover_wait = args.hover_wait
+    washer.adaptive_timing = args.adaptive
+    washer.roi_layout = args.roi
+    washer.record_timing = args.timing
+    washer.start_delay = 0.0
+    washer.register_stop_hotkey = False
+    washer.show_message_box = False
+
+    # 判定装备实际的词缀用单独的匹配器和无误差的文本
+    truth = AffixMatcher()
+    truth_rule = truth.compile(rule)
+    sim.judge = lambda text: truth.check(text, truth_rule)
+
+    print(f"规则: {json.dumps(rule, ensure_ascii=False)}")
+    print(f"模拟: 浮窗延迟 {args.hover_latency * 1000:.0f}ms，刷新延迟 {args.reroll_latency * 1000:.0f}ms "
+          f"(±{args.jitter * 1000:.0f}ms)，丢键率 {args.drop:.1%}，识别: {args.ocr}" +
+          (f" (每行错误率 {args.ocr_error:.1%})" if args.ocr == 'oracle' else "") +
+          f"，字体: {sim.font_path or 'PIL 内置'}")
+    if args.roi and not sim.font_path:
+        # PIL 内置字体不含汉字，各词缀行只剩数字和符号，渲染出来几乎一样，会被当成固定行
+        print("提示: 没有中文字体时浮窗布局的学习结果不可靠 (词缀行可能被当成固定行)，请用 --font 指定")
+
+    counts = {}
+    attempts = 0
+    elapsed = 0.0
+    success_times = []
+    success_attempts = []
+    stops = false_stops = 0
+    for trial in range(args.trials):
+        sim.new_item()
+        with (nullcontext() if args.verbose else redirect_stdout(io.StringIO())):
+            result = washer.run()
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+        attempts += result['attempts']
+        elapsed += result['elapsed']
+        if result['status'] == MATCHED:
+            stops += 1
+            if truth.check(sim.settled_text(), truth_rule):
+                success_times.append(result['elapsed'])
+                success_attempts.append(result['attempts'])
+            else:
+                false_stops += 1
+                if args.verbose:
+                    print(f"误停: 识别 [{result['text']}] / 实际 [{sim.settled_text()}]")
+        print(f"  第 {trial + 1:>3} 件: {STATUS_TEXT.get(result['status'], result['status'])}，"
+              f"{result['attempts']} 次，{result['elapsed']:.2f}s")
+
+    print("\n=== 结果 ===")
+    print("状态: " + "，".join(f"{STATUS_TEXT.get(s, s)} {n}" for s, n in counts.items()))
+    rate = attempts / elapsed if elapsed > 0 else 0.0
+    print(f"洗炼速度: {attempts} 次 / {elapsed:.1f}s = {rate:.2f} 次/秒")
+    if success_times:
+        print(f"成功用时: p50 {percentile(success_times, 50):.2f}s，p95 {percentile(success_times, 95):.2f}s，"
+              f"平均 {sum(success_attempts) / len(success_attempts):.1f} 次洗炼")
+    false_rate = false_stops / stops if stops else 0.0
+    print(f"误停: {false_stops} / {stops} 次停止 ({false_rate:.1%})")
+    print(f"模拟器: {sim.stats()}")
+    if args.timing:
+        print(washer.telemetry.summary())
+
+    if args.max_false_stop is not None and false_rate > args.max_false_stop:
+        print(f"失败: 误停率超过上限 {args.max_false_stop:.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
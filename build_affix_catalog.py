@@ -0,0 +1,45 @@
+"""
+生成 / 更新已知词缀目录 (affix_catalog.txt)。
+
+从录制的帧 (调试模式保存的 ocr_debug/*.txt) 中学习：同一词缀名出现次数达到 --min-count 才收录，
+偶发的误读会被过滤掉。已有目录文件中的条目会保留 (可以手工编辑该文件增删条目)。
+
+用法:
+    python build_affix_catalog.py
+    python build_affix_catalog.py --frames ocr_debug --min-count 3 --out affix_catalog.txt
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from normalize_report import load_frames
+from src.gear_washer.affix_catalog import AffixCatalog, DEFAULT_CATALOG_PATH
+from src.gear_washer.matcher import AffixMatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从历史识别结果学习已知词缀目录")
+    parser.add_argument('--frames', default='ocr_debug', help="录制帧目录 (*.txt)")
+    parser.add_argument('--out', default=DEFAULT_CATALOG_PATH, help="目录文件路径")
+    parser.add_argument('--min-count', type=int, default=2, help="至少出现几次才收录")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    if not frames:
+        print(f"没有找到录制的帧: {args.frames}/*.txt (调试模式运行一次即可生成)")
+        return
+
+    learned = AffixCatalog.learn(frames, AffixMatcher.normalize_text, min_count=args.min_count)
+    catalog = AffixCatalog.load(args.out) if os.path.exists(args.out) else AffixCatalog()
+    before = len(catalog)
+    for entry in learned.entries:
+        catalog.add(entry)
+
+    catalog.save(args.out)
+    print(f"帧数: {len(frames)}  学到条目: {len(learned)}  新增: {len(catalog) - before}  目录共 {len(catalog)} 条 -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+用人工标注的 OCR 行校准模糊匹配阈值 (match_thresholds.json)，代替统一的 AffixMatcher.DEFAULT_THRESHOLD。
+
+输入文件每行一条样本，用 Tab 分隔: 关键词<Tab>OCR 识别行<Tab>1 或 0
+(1 表示这一行确实是该词缀，0 表示不是)，例如
+    冰冻抗性	-20% 敌人水冻抗性	1
+    冰冻抗性	+30% 冰霜抗性	0
+
+按关键词长度分桶计算每个候选阈值的精确率 / 召回率：
+在 "误判为包含的数量不超过默认阈值" 的前提下选召回率最高的阈值 (减少白洗，不增加误停)。
+某个关键词的正负样本都足够多时，还会单独给它设置阈值。
+
+用法:
+    python calibrate_thresholds.py labels.tsv
+    python calibrate_thresholds.py labels.tsv --min-samples 20 --weighted --out match_thresholds.json
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.gear_washer.calibration import DEFAULT_THRESHOLD_PATH, calibrate
+from src.gear_washer.matcher import AffixMatcher
+from src.gear_washer.ocr_distance import ConfusionTable, DEFAULT_CONFUSION_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校准模糊匹配阈值")
+    parser.add_argument('labels', help="标注文件 (关键词<Tab>OCR 行<Tab>1/0)")
+    parser.add_argument('--out', default=DEFAULT_THRESHOLD_PATH, help="输出的阈值表")
+    parser.add_argument('--min-samples', type=int, default=10, help="正负样本都至少有几条才单独设置阈值")
+    parser.add_argument('--weighted', action='store_true', help="按形近字加权匹配的口径校准 (运行时也要开启该选项)")
+    args = parser.parse_args()
+
+    samples = []
+    with open(args.labels, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) != 3 or parts[2].strip() not in ('0', '1'):
+                continue
+            samples.append((parts[0], parts[1], parts[2].strip() == '1'))
+    if not samples:
+        print("没有读到有效的标注样本")
+        return
+
+    matcher = AffixMatcher(memo_size=0)
+    if args.weighted:
+        matcher.set_confusions(ConfusionTable.load(DEFAULT_CONFUSION_PATH)
+                               if os.path.exists(DEFAULT_CONFUSION_PATH) else ConfusionTable())
+
+    default = matcher.DEFAULT_THRESHOLD
+    table, curves = calibrate(samples, matcher.similarity, matcher.normalize_text, default,
+                              min_samples=args.min_samples)
+
+    print(f"样本: {len(samples)}  默认阈值: {default}")
+    sections = [(f"长度 {name}", points, table.by_length.get(name), default)
+                for name, points in sorted(curves['by_length'].items())]
+    sections += [(f"关键词 [{kw}]", points, table.by_keyword.get(kw), table.threshold_for(kw))
+                 for kw, points in sorted(curves['by_keyword'].items())]
+    for label, points, chosen, current in sections:
+        print(f"\n{label}  选用: {chosen if chosen is not None else f'{current} (沿用上一级)'}")
+        print("  阈值    精确率  召回率  误判  漏判")
+        for p in points:
+            mark = '  <- 选用' if p.threshold == chosen else ('  (默认)' if abs(p.threshold - default) < 1e-9 else '')
+            print(f"  {p.threshold:<6.3f}  {p.precision:6.3f}  {p.recall:6.3f}  {p.fp:>4}  {p.fn:>4}{mark}")
+
+    table.save(args.out)
+    print(f"\n长度分桶 {len(table.by_length)} 个，单独关键词 {len(table.by_keyword)} 个 -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import customtkinter as ctk
+from tkinter import messagebox
 import threading
 import sys
 import os
@@ -13,6 +14,15 @@ except ImportError:
     keyboard = None
 from src.gear_washer.washer import GearWasher
 from src.gear_washer.db_helper import SimpleDB
+from src.gear_washer.jobs import WashJob
+from src.gear_washer.multi_window import MultiWindowController
+from src.gear_washer.affix_catalog import DEFAULT_CATALOG_PATH
+from src.gear_washer.calibration import DEFAULT_THRESHOLD_PATH
+from src.gear_washer.ocr_distance import DEFAULT_CONFUSION_PATH
+from src.gear_washer.rule_validator import validate_rule, format_issues
+from src.gear_washer.telemetry import DEFAULT_TELEMETRY_PATH
+from src.gear_washer.wash_log import DEFAULT_LOG_FILE
+from src.gear_washer.session import default_session_path
 from config.affix_config import DEFAULT_CONFIGS
 from complex_editor import ComplexRuleEditor
 
@@ -100,11 +110,14 @@ class App(ctk.CTk):
         print(f"DEBUG: Checking if path exists: {os.path.exists(tessdata_path)}")
         
         self.washer = None # 将在运行时实例化
+        self.controller = None # 多窗口并行时的控制器
         self.running = False
         self.worker_thread = None
         self.current_rule_content = "" # 存储当前选择/编辑的规则内容(JSON string 或普通 string)
         self.current_affix_id = None   # 存储当前选择的规则ID (如果是DB类型)
         self.current_affix_source = None # 'FILE' or 'DB'
+        self.multi_target_ids = []     # 多目标模式下选中的规则ID (按加入顺序)
+        self.job_queue = []            # 任务队列 (WashJob 列表)，非空时开始按钮依次执行队列
 
         # 从数据库加载快捷键配置
         self.hk_start = self.db.get("hotkey_start", "end")
@@ -514,6 +527,9 @@ class App(ctk.CTk):
             self.rule_tab.combo_affix_mgr.set("")
             self.current_rule_content = ""
 
+        if self.multi_target_ids:
+            self._refresh_targets()
+
     def on_equip_change(self, choice):
         print(f"已选择装备: {choice}")
         self.equip_tab.combo_equip_mgr.set(choice)
@@ -535,6 +551,109 @@ class App(ctk.CTk):
             if self.run_tab.combo_affix.get() != choice:
                 self.run_tab.combo_affix.set(choice)
 
+    def add_current_to_targets(self):
+        """把当前选择的规则加入多目标列表"""
+        if self.current_affix_id is None:
+            print("错误：当前规则未关联数据库ID，无法加入多目标")
+            return
+        if self.current_affix_id in self.multi_target_ids:
+            print("提示：该规则已在多目标列表中")
+            return
+        self.multi_target_ids.append(self.current_affix_id)
+        self._refresh_targets()
+
+    def clear_targets(self):
+        self.multi_target_ids = []
+        self._refresh_targets()
+
+    def _refresh_targets(self):
+        """同步多目标列表 (剔除已被删除的规则) 并刷新显示"""
+        rows = self.db.get_affixes_by_ids(self.multi_target_ids)
+        self.multi_target_ids = [aid for aid, _, _ in rows]
+        names = [desc if desc else f"规则_{aid}" for aid, _, desc in rows]
+        self.run_tab.update_targets(names)
+
+    def add_current_to_queue(self):
+        """把当前装备 + 规则 (含多目标) + 预算加入任务队列"""
+        job = self._current_job()
+        if job is None:
+            return
+        self.job_queue.append(job)
+        print(f"已加入队列: {job.name}")
+        self.run_tab.update_queue([j.name for j in self.job_queue])
+
+    def clear_queue(self):
+        self.job_queue = []
+        self.run_tab.update_queue([])
+
+    def _current_job(self):
+        """用当前选择的装备、规则 (含多目标) 和预算生成一个任务，出错时打印原因并返回 None"""
+        equip_name = self.run_tab.combo_equip.get()
+        if not equip_name or equip_name == "无配置":
+             print("错误：请先选择装备配置！")
+             return None
+
+        affix_rule_str = self.current_rule_content
+        if not affix_rule_str:
+            print("错误：当前未加载任何词缀规则！")
+            return None
+
+        eid = self.equip_map.get(equip_name)
+        if not eid:
+            print(f"错误：内部映射错误，找不到装备 [{equip_name}] 的ID")
+            return None
+
+        cfg = self.db.get_equipment_type_by_id(eid)
+        if not cfg:
+            print(f"错误：找不到装备 [{equip_name}] 的数据库记录")
+            return None
+
+        try:
+            max_attempts, time_budget = self.run_tab.read_budget()
+        except ValueError:
+            print("错误：次数上限需为正整数，限时需为正数 (分钟)")
+            return None
+
+        p1, p2 = cfg['affix_points']
+        x = min(p1[0], p2[0])
+        y = min(p1[1], p2[1])
+        w = abs(p2[0] - p1[0])
+        h = abs(p2[1] - p1[1])
+
+        # 多目标模式: 一帧内统一判定所有选中的规则
+        rule_set = None
+        if self.multi_target_ids:
+            rule_set = {}
+            for aid, content, desc in self.db.get_affixes_by_ids(self.multi_target_ids):
+                # 按规则 id 区分，描述相同的规则不会互相覆盖
+                rule_set[f"{desc}#{aid}" if desc else f"规则_{aid}"] = self._parse_rule_content(content)
+            rule_set = rule_set or None
+        rule_name = f"多目标({len(rule_set)})" if rule_set else self.run_tab.combo_affix.get()
+
+        return WashJob(
+            name=f"{equip_name} - {rule_name}",
+            gear_pos=cfg['gear_pos'],
+            affix_region=(x, y, w, h),
+            conditions=self._parse_rule_content(affix_rule_str),
+            window_title=cfg.get('window_title'),
+            equipment_id=eid,
+            rule_id=self.current_affix_id,
+            rule_set=rule_set,
+            max_attempts=max_attempts,
+            time_budget=time_budget,
+        )
+
+    @staticmethod
+    def _parse_rule_content(content):
+        """把数据库中的规则内容解析成匹配条件 (JSON 结构或普通表达式字符串)"""
+        content = str(content)
+        if content.startswith("[") or content.startswith("{"):
+            try:
+                return json.loads(content)
+            except json.JSONDecodeError:
+                pass
+        return content
+
     def open_advanced_editor(self):
         current_text = self.current_rule_content.strip()
         initial_data = None
@@ -558,6 +677,9 @@ class App(ctk.CTk):
             
             if success:
                 print(f"规则 [{current_name}] 已成功更新！")
+                issues = validate_rule(data)
+                if issues:
+                    print(f"规则检查:\n{format_issues(issues)}")
                 self._load_data()
                 # 恢复选中状态
                 self.rule_tab.combo_affix_mgr.set(current_name)
@@ -723,61 +845,23 @@ class App(ctk.CTk):
 
     def start_washing(self):
         if self.running: return
-        
-        equip_name = self.run_tab.combo_equip.get()
-        if not equip_name or equip_name == "无配置":
-             print("错误：请先选择装备配置！")
-             return
 
-        affix_rule_str = self.current_rule_content
-        if not affix_rule_str:
-            print("错误：当前未加载任何词缀规则！")
-            return
-        
-        # ... (rest of start_washing logic) ...
+        # 队列为空时只洗当前选择的装备
+        jobs = list(self.job_queue)
+        job = None
+        if not jobs:
+            job = self._current_job()
+            if job is None:
+                return
 
         try:
-            eid = self.equip_map.get(equip_name)
-            if not eid:
-                print(f"错误：内部映射错误，找不到装备 [{equip_name}] 的ID")
-                return
-                 
-            cfg = self.db.get_equipment_type_by_id(eid)
-            
-            if not cfg:
-                print(f"错误：找不到装备 [{equip_name}] 的数据库记录")
-                return
-                
-            debug_mode = self.debug_mode_var.get()
-            bg_mode = self.background_mode_var.get()
-            
-            print(f"正在启动... 调试: {debug_mode}, 后台模式: {bg_mode}, 停止键: {self.hk_stop}")
-                
-            self.washer = GearWasher(tesseract_cmd=self.ocr_path, 
-                                    debug_mode=debug_mode,
-                                    background_mode=bg_mode,
-                                    stop_key=self.hk_stop)
-            
-            self.washer.gear_pos = cfg['gear_pos']
-            self.washer.window_title = cfg.get('window_title')
-            # 使用极速模式: 0.05-0.1s
-            self.washer.interval = 0.1 
-            
-            p1, p2 = cfg['affix_points']
-            x = min(p1[0], p2[0])
-            y = min(p1[1], p2[1])
-            w = abs(p2[0] - p1[0])
-            h = abs(p2[1] - p1[1])
-            self.washer.affix_region = (x, y, w, h)
-            
-            # Parsing JSON rule
-            final_conditions = affix_rule_str
-            if affix_rule_str.startswith("[") or affix_rule_str.startswith("{"):
-                try:
-                    final_conditions = json.loads(affix_rule_str)
-                except json.JSONDecodeError:
-                    pass
-            self.washer.conditions = final_conditions
+            print(f"正在启动... 调试: {self.debug_mode_var.get()}, 后台模式: {self.background_mode_var.get()}, 停止键: {self.hk_stop}")
+            self.washer = self._create_washer()
+
+            if job is not None:
+                self.washer.apply_job(job)
+                if job.rule_set:
+                    print(f"多目标模式: {', '.join(job.rule_set.keys())}")
             
         except Exception as e:
             print(f"初始化失败: {e}")
@@ -785,16 +869,105 @@ class App(ctk.CTk):
             traceback.print_exc()
             return
 
+        if jobs:
+            # 队列模式: 先检查所有任务的规则，无法满足的任务在运行时会被跳过
+            impossible = []
+            for queued in jobs:
+                self.washer.apply_job(queued)
+                if self.washer.validate_rules()[0]:
+                    impossible.append(queued.name)
+            if impossible and not messagebox.askyesno(
+                    "规则无法满足", "以下任务的规则永远无法满足，将被跳过：\n\n" + "\n".join(impossible) + "\n\n仍然要开始吗？"):
+                print("已取消: 请先修改规则")
+                return
+            print(f"队列模式: 共 {len(jobs)} 个任务")
+        else:
+            # 运行前检查规则，永远无法满足时需要用户确认 (否则会白白洗满最大次数)
+            impossible, report = self.washer.validate_rules()
+            for name, issues in report.items():
+                if issues:
+                    print(f"规则检查 [{name}]:\n{format_issues(issues)}")
+            if impossible:
+                details = '\n'.join(format_issues(issues) for issues in report.values() if issues)
+                if not messagebox.askyesno("规则无法满足", f"当前规则永远无法满足：\n\n{details}\n\n仍然要开始洗炼吗？"):
+                    print("已取消: 请先修改规则")
+                    return
+            self.washer.skip_rule_validation = True
+
+        self.controller = None
+        if self.multi_window_var.get():
+            self.controller = self._create_controller(jobs or [job])
+            if self.controller is None:
+                return
+
         self.running = True
         self.run_tab.btn_start.configure(state="disabled")
         self.run_tab.btn_stop.configure(state="normal")
         self.lbl_status.configure(text=f"运行中... (按 {self.hk_stop.upper()} 停止)", text_color="green")
         self.run_tab.update_status(f"运行中... (按 {self.hk_stop.upper()} 停止)", is_running=True)
         
-        self.worker_thread = threading.Thread(target=self._run_washer_loop, daemon=True)
+        self.worker_thread = threading.Thread(target=self._run_washer_loop, args=(jobs,), daemon=True)
         self.worker_thread.start()
+
+    def _create_washer(self):
+        """按当前设置创建洗炼器 (不含装备 / 规则，由任务写入)"""
+        washer = GearWasher(tesseract_cmd=self.ocr_path, 
+                            debug_mode=self.debug_mode_var.get(),
+                            background_mode=self.background_mode_var.get(),
+                            stop_key=self.hk_stop)
+        
+        # 使用极速模式: 0.05-0.1s
+        washer.interval = 0.1 
+        washer.streaming_ocr = self.streaming_ocr_var.get()
+        washer.affix_catalog_path = DEFAULT_CATALOG_PATH if self.catalog_snap_var.get() else None
+        washer.weighted_matching = self.weighted_match_var.get()
+        washer.confusion_path = DEFAULT_CONFUSION_PATH
+        washer.threshold_path = DEFAULT_THRESHOLD_PATH
+        washer.trace_matching = self.trace_match_var.get()
+        washer.digit_ocr = self.digit_ocr_var.get()
+        washer.roi_layout = self.roi_layout_var.get()
+        washer.adaptive_timing = self.adaptive_timing_var.get()
+        washer.record_timing = self.record_timing_var.get()
+        washer.telemetry_path = DEFAULT_TELEMETRY_PATH
+        washer.verbose_log = self.verbose_log_var.get()
+        washer.log_file = DEFAULT_LOG_FILE if self.log_file_var.get() else None
+        washer.session_path = default_session_path() if self.record_session_var.get() else None
+        washer.register_stop_hotkey = False  # 停止热键由 GUI 注册，回调里调用 washer.stop()
+        washer.db = self.db
+        return washer
+
+    def export_telemetry(self):
+        """导出当前 (或上一次) 运行的耗时统计，JSON 格式，包含最近的匹配追踪记录"""
+        if not self.washer:
+            print("提示：还没有运行过洗炼")
+            return
+        self.washer.export_telemetry(f"telemetry_{time.strftime('%Y%m%d_%H%M%S')}.json")
+
+    def _create_controller(self, jobs):
+        """多窗口并行: 为所有标题匹配的窗口各创建一个洗炼器，执行同一份任务"""
+        titles = {j.window_title for j in jobs}
+        if len(titles) != 1 or None in titles:
+            print("错误：多窗口并行要求所有任务绑定同一个窗口标题")
+            return None
+        title = titles.pop()
+        skip_validation = self.washer.skip_rule_validation
+
+        def make_washer():
+            washer = self._create_washer()
+            washer.skip_rule_validation = skip_validation
+            return washer
+
+        controller = MultiWindowController.for_windows(title, make_washer, jobs,
+                                                       interleave=self.interleave_var.get())
+        if not controller.entries:
+            print(f"错误：找不到标题包含 [{title}] 的窗口")
+            return None
+        print(f"多窗口并行: {len(controller.entries)} 个窗口，OCR 并发 {controller.pool.workers}")
+        return controller
         
     def stop_washing(self):
+        if self.controller:
+            self.controller.stop()
         if self.washer:
             self.washer.stop()
         self.running = False
@@ -803,10 +976,17 @@ class App(ctk.CTk):
         self.lbl_status.configure(text=f"已停止 (快捷键: {self.hk_start.upper()}开始 / {self.hk_stop.upper()}停止)", text_color="gray")
         self.run_tab.update_status("已手动停止", is_running=False)
 
-    def _run_washer_loop(self):
+    def _run_washer_loop(self, jobs=None):
         print("=== 洗炼开始 ===")
         try:
-            self.washer.run()
+            if self.controller is not None:
+                self.controller.run()
+            elif jobs and self.interleave_var.get():
+                self.washer.run_interleaved(jobs)
+            elif jobs:
+                self.washer.run_jobs(jobs)
+            else:
+                self.washer.run()
         except Exception as e:
             print(f"运行时错误: {e}")
         finally:
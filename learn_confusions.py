@@ -0,0 +1,55 @@
+"""
+从人工校对的行对中学习 OCR 形近字代价表 (ocr_confusions.json)，供 "形近字加权匹配" 使用。
+
+输入文件每行一对，用 Tab 分隔: 正确文本<Tab>OCR 识别文本，例如
+    +15% 冰冻系法术伤害	+15% 水冻糸法术伤害
+两边都会先经过与匹配时相同的标准化。
+
+用法:
+    python learn_confusions.py pairs.tsv
+    python learn_confusions.py pairs.tsv --min-count 3 --out ocr_confusions.json
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.gear_washer.matcher import AffixMatcher
+from src.gear_washer.ocr_distance import ConfusionTable, DEFAULT_CONFUSION_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="学习 OCR 形近字代价表")
+    parser.add_argument('pairs', help="校对行对文件 (正确文本<Tab>OCR 文本)")
+    parser.add_argument('--out', default=DEFAULT_CONFUSION_PATH, help="输出的代价表")
+    parser.add_argument('--min-count', type=int, default=2, help="字符对至少出现几次才收录")
+    args = parser.parse_args()
+
+    pairs = []
+    with open(args.pairs, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) != 2:
+                continue
+            truth, ocr = (AffixMatcher.normalize_text(p) for p in parts)
+            if truth and ocr:
+                pairs.append((truth, ocr))
+    if not pairs:
+        print("没有读到有效的行对")
+        return
+
+    base = ConfusionTable.load(args.out) if os.path.exists(args.out) else None
+    table = ConfusionTable.learn(pairs, min_count=args.min_count, base=base)
+    table.save(args.out)
+
+    before = set(base.costs if base is not None else ConfusionTable().costs)
+    learned = sorted(((a, b, c) for (a, b), c in table.costs.items() if a < b and (a, b) not in before),
+                     key=lambda x: x[2])
+    print(f"行对: {len(pairs)}  代价表共 {len(table.costs) // 2} 组，新增 {len(learned)} 组 -> {args.out}")
+    for a, b, cost in learned[:20]:
+        print(f"  {a} / {b}: {cost:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+统计 OCR 文本标准化的效果：对录制的帧 (调试模式保存的 ocr_debug/*.txt)，
+比较旧版标准化与当前标准化下，关键词 "精确包含" 的占比提升了多少。
+
+用法:
+    python normalize_report.py                       # 关键词取自数据库中的规则 + 默认配置
+    python normalize_report.py --frames ocr_debug --keywords "法术伤害,冰霜抗性"
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.affix_config import DEFAULT_CONFIGS
+from src.gear_washer.compiled_rule import split_keywords
+from src.gear_washer.db_helper import SimpleDB
+from src.gear_washer.matcher import AffixMatcher
+
+
+def legacy_normalize(text: str) -> str:
+    """旧版标准化 (只转小写、标点转空格、合并空白)，作为对照组"""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def load_keywords(db_name: str) -> list:
+    rules = list(DEFAULT_CONFIGS.values())
+    if os.path.exists(os.path.join(os.getcwd(), db_name)):
+        for _, content, _ in SimpleDB(db_name).get_all_affixes():
+            content = str(content)
+            if content.startswith('['):
+                try:
+                    content = json.loads(content)
+                except json.JSONDecodeError:
+                    pass
+            rules.append(content)
+
+    seen = []
+    for rule in rules:
+        for kw in split_keywords(rule):
+            if kw not in seen:
+                seen.append(kw)
+    return seen
+
+
+def load_frames(frames_dir: str) -> list:
+    frames = []
+    for path in sorted(glob.glob(os.path.join(frames_dir, '*.txt'))):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        if text.strip():
+            frames.append(text)
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计标准化前后关键词精确命中的占比")
+    parser.add_argument('--frames', default='ocr_debug', help="录制帧目录 (*.txt)")
+    parser.add_argument('--keywords', default=None, help="逗号分隔的关键词，不填则读取规则")
+    parser.add_argument('--db', default='game_data.db', help="数据库文件名 (当前目录下)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    if not frames:
+        print(f"没有找到录制的帧: {args.frames}/*.txt (调试模式运行一次即可生成)")
+        return
+    keywords = [k.strip() for k in args.keywords.split(',') if k.strip()] if args.keywords else load_keywords(args.db)
+    if not keywords:
+        print("没有可用的关键词")
+        return
+
+    matcher = AffixMatcher()
+    modes = [("旧版标准化", legacy_normalize), ("当前标准化", matcher.normalize_text)]
+    print(f"帧数: {len(frames)}  关键词: {len(keywords)}  组合: {len(frames) * len(keywords)}")
+
+    for label, normalize in modes:
+        norm_kws = [normalize(k) for k in keywords]
+        exact = fuzzy = 0
+        start = time.perf_counter()
+        for frame in frames:
+            text = normalize(frame)
+            for kw in norm_kws:
+                if not kw:
+                    continue
+                if kw in text:
+                    exact += 1
+                    fuzzy += 1
+                elif matcher._fuzzy_contains(text, kw):
+                    fuzzy += 1
+        elapsed = time.perf_counter() - start
+        share = exact / fuzzy if fuzzy else 0.0
+        print(f"[{label}] 命中 {fuzzy}，其中精确包含 {exact} ({share:.1%})，耗时 {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
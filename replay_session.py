@@ -0,0 +1,109 @@
+"""
+离线回放洗炼会话存档 (开启 "录制洗炼会话" 或 run_washer_v2.py --record 得到的 .gws 文件)。
+
+把录制时的每帧截图重新走一遍 预处理 -> OCR -> 判定，不需要游戏窗口，也不发送任何输入，
+输出各阶段耗时 (p50/p95/p99)，以及识别文本、判定结论和录制时不一样的帧数。
+用来在真实数据上比较 OCR / 匹配器改动的效果和速度。
+
+用法:
+    python replay_session.py sessions/session_20240101_120000.gws
+    python replay_session.py 存档.gws --no-ocr                  # 只用录制的识别文本测判定
+    python replay_session.py 存档.gws --start 5000 --stop 6000  # 只回放第 5000~5999 帧
+    python replay_session.py 存档.gws --realtime --speed 4      # 按录制时的节奏 4 倍速回放
+    python replay_session.py 存档.gws --catalog affix_catalog.txt --telemetry replay.csv
+    python replay_session.py 存档.gws --info                    # 只显示存档概况
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.gear_washer.session import SessionReader, rebuild_index, index_stale
+from src.gear_washer.telemetry import STAGES
+from src.gear_washer.washer import GearWasher
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+OCR_CMD = os.path.join(base_dir, 'OCR', 'tesseract.exe')
+
+
+def print_info(reader: SessionReader):
+    if not len(reader):
+        print("存档中没有洗炼记录")
+        return
+    first, last = reader[0], reader[-1]
+    matched = sum(1 for roll in reader if roll.matched)
+    print(f"洗炼记录: {len(reader)} 次，命中 {matched} 次，时长 {last.time - first.time:.1f}s")
+    for job in reader.jobs():
+        print(f"  任务: 规则 {job.get('rule_set') and list(job['rule_set']) or job.get('conditions')}，"
+              f"放大倍数 {job.get('ocr_scale_factor')}")
+    stages = [roll.stages for roll in reader.iter_range(max(0, len(reader) - 1000)) if roll.stages]
+    if stages:
+        means = [sum(s[i] for s in stages) / len(stages) for i in range(len(STAGES))]
+        print("  录制时各阶段平均耗时 (最近 1000 次, ms): " +
+              "，".join(f"{name} {value:.1f}" for name, value in zip(STAGES, means)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线回放洗炼会话存档")
+    parser.add_argument('session', help="会话存档 (.gws)")
+    parser.add_argument('--start', type=int, default=0, help="从第几帧开始 (从 0 开始)")
+    parser.add_argument('--stop', type=int, default=None, help="到第几帧之前结束")
+    parser.add_argument('--realtime', action='store_true', help="按录制时的节奏回放 (默认尽快回放)")
+    parser.add_argument('--speed', type=float, default=1.0, help="按录制节奏回放时的倍速")
+    parser.add_argument('--no-ocr', action='store_true', help="不重新识别，直接用录制的识别文本测判定")
+    parser.add_argument('--tesseract', default=OCR_CMD if os.path.exists(OCR_CMD) else None,
+                        help="tesseract 可执行文件路径 (默认使用 OCR 目录或 PATH 中的)")
+    parser.add_argument('--scale', type=float, default=None, help="覆盖录制时的 OCR 放大倍数")
+    parser.add_argument('--catalog', default=None, help="覆盖录制时的词缀目录文件")
+    parser.add_argument('--thresholds', default=None, help="覆盖录制时的阈值表文件")
+    parser.add_argument('--confusions', default=None, help="覆盖录制时的形近字表文件 (同时开启加权匹配)")
+    parser.add_argument('--telemetry', default=None, help="把回放的各阶段耗时导出到该文件 (.csv / .json)")
+    parser.add_argument('--show', type=int, default=20, help="最多列出多少个判定不一致的帧")
+    parser.add_argument('--info', action='store_true', help="只显示存档概况")
+    args = parser.parse_args()
+
+    if index_stale(args.session):
+        # 索引缺失、损坏或比数据短 (录制时程序中途退出)
+        print("索引文件不完整，正在重建...")
+        print(f"已重建索引: {rebuild_index(args.session)} 次洗炼")
+
+    overrides = {}
+    if args.scale is not None:
+        overrides['ocr_scale_factor'] = args.scale
+    if args.catalog:
+        overrides['affix_catalog_path'] = args.catalog
+    if args.thresholds:
+        overrides['threshold_path'] = args.thresholds
+    if args.confusions:
+        overrides['weighted_matching'] = True
+        overrides['confusion_path'] = args.confusions
+
+    with SessionReader(args.session) as reader:
+        print_info(reader)
+        if args.info or not len(reader):
+            return
+
+        washer = GearWasher(tesseract_cmd=args.tesseract)
+        stats = washer.replay(reader, args.start, args.stop, realtime=args.realtime, speed=args.speed,
+                              ocr=not args.no_ocr, overrides=overrides)
+
+    rolls = stats['rolls']
+    rate = rolls / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+    print(f"\n回放 {rolls} 帧，用时 {stats['elapsed']:.1f}s ({rate:.1f} 帧/秒)")
+    if stats['no_image']:
+        print(f"  其中 {stats['no_image']} 帧没有截图 (词缀区裁剪模式录制)，使用录制的识别文本")
+    if not args.no_ocr:
+        print(f"  识别文本与录制时不同: {stats['ocr_changed']} 帧")
+    print(f"  判定与录制时不同: {stats['decision_changed']} 帧")
+    for index, recorded, replayed in stats['changed'][:args.show]:
+        print(f"    第 {index} 帧: 录制时{'命中' if recorded else '未命中'} -> 回放{'命中' if replayed else '未命中'}")
+    if len(stats['changed']) > args.show:
+        print(f"    ... 另有 {len(stats['changed']) - args.show} 帧")
+    print(washer.telemetry.summary())
+    if args.telemetry:
+        washer.export_telemetry(args.telemetry)
+
+
+if __name__ == "__main__":
+    main()
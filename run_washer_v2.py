@@ -2,8 +2,14 @@ from src.gear_washer.washer import GearWasher
 import sys
 import os
 import time
+import json
 from config.affix_config import DEFAULT_CONFIGS
+from src.gear_washer.calibration import DEFAULT_THRESHOLD_PATH
 from src.gear_washer.db_helper import SimpleDB
+from src.gear_washer.rule_validator import format_issues
+from src.gear_washer.session import default_session_path
+from src.gear_washer.telemetry import DEFAULT_TELEMETRY_PATH
+from src.gear_washer.wash_log import DEFAULT_LOG_FILE
 
 # Tesseract 路径
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -40,6 +46,26 @@ def main():
     
     db = SimpleDB()
     washer = GearWasher(tesseract_cmd=OCR_CMD, debug_mode=debug_mode, ocr_scale_factor=scale_factor)
+
+    # 耗时统计: --telemetry 或 --telemetry=路径 (.csv / .json)，结束时导出各阶段耗时
+    for arg in sys.argv:
+        if arg == "--telemetry" or arg.startswith("--telemetry="):
+            washer.record_timing = True
+            washer.telemetry_path = arg.split("=", 1)[1] if "=" in arg else DEFAULT_TELEMETRY_PATH
+            print(f">>> 耗时统计已启用，结束时导出到 {washer.telemetry_path} <<<\n")
+
+    # 日志: --verbose 每次洗炼都输出识别文本；--log-file 或 --log-file=路径 把完整日志写入文件
+    washer.verbose_log = "--verbose" in sys.argv or "-v" in sys.argv
+    for arg in sys.argv:
+        if arg == "--log-file" or arg.startswith("--log-file="):
+            washer.log_file = arg.split("=", 1)[1] if "=" in arg else DEFAULT_LOG_FILE
+            print(f">>> 完整日志将写入 {washer.log_file} <<<\n")
+
+    # 会话录制: --record 或 --record=路径，每次洗炼追加到存档 (可用 replay_session.py 离线回放)
+    for arg in sys.argv:
+        if arg == "--record" or arg.startswith("--record="):
+            washer.session_path = arg.split("=", 1)[1] if "=" in arg else default_session_path()
+            print(f">>> 会话录制已启用，存档: {washer.session_path} <<<\n")
     
     # ---------------------------------------------------------
     # 第一步：选择物品类型 (Item Position)
@@ -144,12 +170,33 @@ def main():
         print(f"  [{idx + 1}] {name} (内容: {str(content)[:30]}...)")
         
     print(f"  [{len(all_options) + 1}] + 手动输入新词缀")
+    print("  (多目标模式: 输入多个序号并用逗号分隔，例如 1,3，任意一条满足即停止)")
 
     choice_aff = input("\n请选择 (输入序号): ").strip()
     
     final_conditions = None
     
-    if choice_aff.isdigit():
+    if ',' in choice_aff:
+        # 多目标模式: 所有选中的规则共享同一次关键词判定
+        rule_set = {}
+        for part in choice_aff.split(','):
+            part = part.strip()
+            if part.isdigit() and 0 <= int(part) - 1 < len(all_options):
+                name, content = all_options[int(part) - 1]
+                if isinstance(content, str) and content.startswith('['):
+                    try:
+                        content = json.loads(content)
+                    except json.JSONDecodeError:
+                        pass
+                # 同名的规则按序号区分，不能互相覆盖
+                if name in rule_set:
+                    name = f"{name}#{part}"
+                rule_set[name] = content
+        if rule_set:
+            washer.rule_set = rule_set
+            final_conditions = next(iter(rule_set.values()))
+            print(f"已选择多目标: {', '.join(rule_set.keys())}")
+    elif choice_aff.isdigit():
         idx = int(choice_aff) - 1
         if 0 <= idx < len(all_options):
             final_conditions = all_options[idx][1]
@@ -182,6 +229,8 @@ def main():
                 final_conditions = "冰霜抗性"
 
     washer.conditions = final_conditions
+    washer.db = db
+    washer.threshold_path = DEFAULT_THRESHOLD_PATH  # 有校准阈值表 (calibrate_thresholds.py) 时使用
     
     # ---------------------------------------------------------
     # 第四步：确认并开始
@@ -189,14 +238,30 @@ def main():
     clear_screen()
     print("=== 第四步：确认执行 ===")
     print(f"物品配置: {selected_item_name}")
-    print(f"词缀要求: {washer.conditions}")
+    if washer.rule_set:
+        print(f"词缀要求 (多目标): {', '.join(washer.rule_set.keys())}")
+    else:
+        print(f"词缀要求: {washer.conditions}")
     print(f"装备位置: {washer.gear_pos}")
+
+    # 规则静态检查: 永远无法满足的规则需要额外确认
+    impossible, report = washer.validate_rules()
+    for name, issues in report.items():
+        if issues:
+            print(f"规则检查 [{name}]:\n{format_issues(issues)}")
     print("-" * 30)
     
-    confirm = input("是否开始洗炼？(y/n) [y]: ").strip().lower()
-    if confirm == 'n':
-        print("已取消。")
-        return
+    if impossible:
+        confirm = input("规则永远无法满足！仍要开始洗炼？(y/n) [n]: ").strip().lower()
+        if confirm != 'y':
+            print("已取消。")
+            return
+    else:
+        confirm = input("是否开始洗炼？(y/n) [y]: ").strip().lower()
+        if confirm == 'n':
+            print("已取消。")
+            return
+    washer.skip_rule_validation = True
     washer.run()
 
 if __name__ == "__main__":
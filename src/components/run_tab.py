@@ -66,13 +66,108 @@ class RunTab(ctk.CTkFrame):
             font=("Microsoft YaHei", 14),
             command=self.app.on_affix_change
         )
-        self.combo_affix.grid(row=3, column=0, padx=20, pady=(0, 20), sticky="ew")
+        self.combo_affix.grid(row=3, column=0, padx=20, pady=(0, 10), sticky="ew")
+
+        # 3. 多目标 (任意一条规则满足即停止)
+        self.frame_targets = ctk.CTkFrame(self.config_card, fg_color="transparent")
+        self.frame_targets.grid(row=4, column=0, padx=20, pady=(0, 5), sticky="ew")
+        self.frame_targets.grid_columnconfigure(0, weight=1)
+        self.frame_targets.grid_columnconfigure(1, weight=1)
+
+        self.btn_add_target = ctk.CTkButton(
+            self.frame_targets,
+            text="＋ 加入多目标",
+            command=self.app.add_current_to_targets,
+            fg_color="#6E7681",
+            hover_color="#57606A",
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.btn_add_target.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+
+        self.btn_clear_targets = ctk.CTkButton(
+            self.frame_targets,
+            text="清空多目标",
+            command=self.app.clear_targets,
+            fg_color="#333333",
+            hover_color="#222222",
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.btn_clear_targets.grid(row=0, column=1, padx=(5, 0), sticky="ew")
+
+        self.lbl_targets = ctk.CTkLabel(
+            self.config_card,
+            text="多目标: 未启用 (仅使用上方规则)",
+            text_color="gray",
+            font=("Microsoft YaHei", 12),
+            wraplength=260,
+            justify="left"
+        )
+        self.lbl_targets.grid(row=5, column=0, padx=20, pady=(0, 20), sticky="w")
+
+        # --- 任务队列卡片 ---
+        # 每个任务 = 当前装备 + 当前规则 (含多目标) + 预算，开始后按顺序逐个洗炼
+        self.queue_card = ctk.CTkFrame(self, corner_radius=15, width=400)
+        self.queue_card.grid(row=2, column=0, padx=40, pady=10)
+        self.queue_card.grid_columnconfigure(0, weight=1)
+        self.queue_card.grid_columnconfigure(1, weight=1)
+
+        self.entry_attempts = ctk.CTkEntry(
+            self.queue_card,
+            placeholder_text="次数上限 (默认10000)",
+            width=130,
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.entry_attempts.grid(row=0, column=0, padx=(20, 5), pady=(15, 5), sticky="ew")
+
+        self.entry_minutes = ctk.CTkEntry(
+            self.queue_card,
+            placeholder_text="限时/分钟 (默认不限)",
+            width=130,
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.entry_minutes.grid(row=0, column=1, padx=(5, 20), pady=(15, 5), sticky="ew")
+
+        self.btn_add_job = ctk.CTkButton(
+            self.queue_card,
+            text="＋ 加入队列",
+            command=self.app.add_current_to_queue,
+            fg_color="#6E7681",
+            hover_color="#57606A",
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.btn_add_job.grid(row=1, column=0, padx=(20, 5), pady=5, sticky="ew")
+
+        self.btn_clear_jobs = ctk.CTkButton(
+            self.queue_card,
+            text="清空队列",
+            command=self.app.clear_queue,
+            fg_color="#333333",
+            hover_color="#222222",
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.btn_clear_jobs.grid(row=1, column=1, padx=(5, 20), pady=5, sticky="ew")
+
+        self.lbl_queue = ctk.CTkLabel(
+            self.queue_card,
+            text="队列: 空 (开始后只洗当前装备)",
+            text_color="gray",
+            font=("Microsoft YaHei", 12),
+            wraplength=260,
+            justify="left"
+        )
+        self.lbl_queue.grid(row=2, column=0, columnspan=2, padx=20, pady=(0, 15), sticky="w")
 
 
         # --- 操作按钮区域 ---
         # 按钮容器
         self.action_frame = ctk.CTkFrame(self, fg_color="transparent")
-        self.action_frame.grid(row=2, column=0, pady=20)
+        self.action_frame.grid(row=3, column=0, pady=20)
 
         # 开始按钮 - 绿色系 (GitHub Green 风格)，胶囊形状
         self.btn_start = ctk.CTkButton(
@@ -110,7 +205,35 @@ class RunTab(ctk.CTkFrame):
             text_color="gray",
             font=("Microsoft YaHei", 13)
         )
-        self.lbl_status.grid(row=3, column=0, pady=(5, 20))
+        self.lbl_status.grid(row=4, column=0, pady=(5, 20))
+
+    def update_targets(self, names):
+        """刷新多目标规则列表显示"""
+        if names:
+            self.lbl_targets.configure(text=f"多目标 ({len(names)}): " + "、".join(names), text_color="#1F6FEB")
+        else:
+            self.lbl_targets.configure(text="多目标: 未启用 (仅使用上方规则)", text_color="gray")
+
+    def update_queue(self, names):
+        """刷新任务队列显示"""
+        if names:
+            lines = [f"{i + 1}. {name}" for i, name in enumerate(names)]
+            self.lbl_queue.configure(text=f"队列 ({len(names)}):\n" + "\n".join(lines), text_color="#1F6FEB")
+        else:
+            self.lbl_queue.configure(text="队列: 空 (开始后只洗当前装备)", text_color="gray")
+
+    def read_budget(self):
+        """
+        读取预算输入框。
+        :return: (次数上限或 None, 限时秒数或 None)；输入无效时抛出 ValueError
+        """
+        attempts = self.entry_attempts.get().strip()
+        minutes = self.entry_minutes.get().strip()
+        max_attempts = int(attempts) if attempts else None
+        time_budget = float(minutes) * 60 if minutes else None
+        if (max_attempts is not None and max_attempts <= 0) or (time_budget is not None and time_budget <= 0):
+            raise ValueError("预算必须大于 0")
+        return max_attempts, time_budget
 
     def update_status(self, text, is_running=False):
         self.lbl_status.configure(text=f"状态: {text}")
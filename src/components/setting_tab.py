@@ -50,6 +50,173 @@ class SettingTab(ctk.CTkFrame):
             command=self._on_debug_change # Optional: print log
         )
         self.check_debug.grid(row=1, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 流式识别 (逐行 OCR，确定不满足时提前洗炼)
+        if not hasattr(self.app, 'streaming_ocr_var'):
+            self.app.streaming_ocr_var = ctk.BooleanVar(value=False)
+
+        self.check_streaming = ctk.CTkSwitch(
+            self.card_mode,
+            text="流式识别 (逐行判定，提前洗炼)",
+            variable=self.app.streaming_ocr_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_streaming.grid(row=2, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 词缀目录吸附 (需要先用 build_affix_catalog.py 生成 affix_catalog.txt)
+        if not hasattr(self.app, 'catalog_snap_var'):
+            self.app.catalog_snap_var = ctk.BooleanVar(value=False)
+
+        self.check_catalog = ctk.CTkSwitch(
+            self.card_mode,
+            text="词缀目录吸附 (按已知词缀纠正误读)",
+            variable=self.app.catalog_snap_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_catalog.grid(row=3, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 形近字加权匹配 (冰/水、系/糸 等误读按较低代价计算)
+        if not hasattr(self.app, 'weighted_match_var'):
+            self.app.weighted_match_var = ctk.BooleanVar(value=False)
+
+        self.check_weighted = ctk.CTkSwitch(
+            self.card_mode,
+            text="形近字加权匹配 (减少误读导致的漏判)",
+            variable=self.app.weighted_match_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_weighted.grid(row=4, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 匹配追踪 (未匹配时在日志中打印每组判定、命中行、得分与耗时)
+        if not hasattr(self.app, 'trace_match_var'):
+            self.app.trace_match_var = ctk.BooleanVar(value=False)
+
+        self.check_trace = ctk.CTkSwitch(
+            self.card_mode,
+            text="匹配追踪 (日志中显示每组判定与耗时)",
+            variable=self.app.trace_match_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_trace.grid(row=5, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 数值二次识别 (带数值条件的词缀行，数值部分只按数字再识别一次)
+        if not hasattr(self.app, 'digit_ocr_var'):
+            self.app.digit_ocr_var = ctk.BooleanVar(value=False)
+
+        self.check_digit = ctk.CTkSwitch(
+            self.card_mode,
+            text="数值二次识别 (提高数值条件的准确率)",
+            variable=self.app.digit_ocr_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_digit.grid(row=6, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 只识别词缀区 (自动学习浮窗布局，跳过装备名 / 基础属性等固定行)
+        if not hasattr(self.app, 'roi_layout_var'):
+            self.app.roi_layout_var = ctk.BooleanVar(value=False)
+
+        self.check_roi = ctk.CTkSwitch(
+            self.card_mode,
+            text="只识别词缀区 (自动学习浮窗布局)",
+            variable=self.app.roi_layout_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_roi.grid(row=7, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 自适应等待时间 (实测浮窗刷新速度，按装备保存)
+        if not hasattr(self.app, 'adaptive_timing_var'):
+            self.app.adaptive_timing_var = ctk.BooleanVar(value=False)
+
+        self.check_timing = ctk.CTkSwitch(
+            self.card_mode,
+            text="自适应等待时间 (按装备学习刷新速度)",
+            variable=self.app.adaptive_timing_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_timing.grid(row=8, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 多窗口并行 (同一游戏多开时，所有标题匹配的窗口同时洗炼，共享 OCR 并发)
+        if not hasattr(self.app, 'multi_window_var'):
+            self.app.multi_window_var = ctk.BooleanVar(value=False)
+
+        self.check_multi_window = ctk.CTkSwitch(
+            self.card_mode,
+            text="多窗口并行 (所有同标题窗口同时洗炼)",
+            variable=self.app.multi_window_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_multi_window.grid(row=9, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 交替洗炼 (队列中同一窗口的多件装备轮流洗，一件的识别与另一件的刷新重叠)
+        if not hasattr(self.app, 'interleave_var'):
+            self.app.interleave_var = ctk.BooleanVar(value=False)
+
+        self.check_interleave = ctk.CTkSwitch(
+            self.card_mode,
+            text="交替洗炼 (队列中的装备轮流洗，需同一窗口)",
+            variable=self.app.interleave_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_interleave.grid(row=10, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 耗时统计 (各阶段 p50/p95/p99，结束时导出 telemetry.csv)
+        if not hasattr(self.app, 'record_timing_var'):
+            self.app.record_timing_var = ctk.BooleanVar(value=False)
+
+        self.check_record_timing = ctk.CTkSwitch(
+            self.card_mode,
+            text="记录各阶段耗时 (结束时导出 telemetry.csv)",
+            variable=self.app.record_timing_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_record_timing.grid(row=11, column=0, sticky="w", padx=20, pady=(0, 5))
+
+        self.btn_export_telemetry = ctk.CTkButton(
+            self.card_mode,
+            text="立即导出耗时统计",
+            command=self.app.export_telemetry,
+            fg_color="#333333",
+            hover_color="#222222",
+            height=28,
+            font=("Microsoft YaHei", 12)
+        )
+        self.btn_export_telemetry.grid(row=12, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 日志: 默认每隔一段时间输出一行汇总；详细模式每次洗炼都输出识别文本 (按类别限速)
+        if not hasattr(self.app, 'verbose_log_var'):
+            self.app.verbose_log_var = ctk.BooleanVar(value=False)
+
+        self.check_verbose_log = ctk.CTkSwitch(
+            self.card_mode,
+            text="详细日志 (每次洗炼都显示识别文本)",
+            variable=self.app.verbose_log_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_verbose_log.grid(row=13, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 完整日志写入文件 (后台线程写入，不影响洗炼速度)
+        if not hasattr(self.app, 'log_file_var'):
+            self.app.log_file_var = ctk.BooleanVar(value=False)
+
+        self.check_log_file = ctk.CTkSwitch(
+            self.card_mode,
+            text="保存完整日志到 wash_log.txt",
+            variable=self.app.log_file_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_log_file.grid(row=14, column=0, sticky="w", padx=20, pady=(0, 10))
+
+        # 会话录制 (每次洗炼的截图、识别文本、判定、耗时写入 sessions/ 目录，可用 replay_session.py 离线回放)
+        if not hasattr(self.app, 'record_session_var'):
+            self.app.record_session_var = ctk.BooleanVar(value=False)
+
+        self.check_record_session = ctk.CTkSwitch(
+            self.card_mode,
+            text="录制洗炼会话 (保存到 sessions 目录，可离线回放)",
+            variable=self.app.record_session_var,
+            font=("Microsoft YaHei", 13)
+        )
+        self.check_record_session.grid(row=15, column=0, sticky="w", padx=20, pady=(0, 10))
         
         # 后台模式 - 强制开启且不可修改
         if not hasattr(self.app, 'background_mode_var'):
@@ -0,0 +1,191 @@
+import os
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .affix_record import parse_affix_line
+from .text_normalize import fix_pipe_digits
+
+# 默认目录文件 (与数据库一样放在当前运行目录下)
+DEFAULT_CATALOG_PATH = "affix_catalog.txt"
+
+
+def levenshtein(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    编辑距离 (插入/删除/替换各计 1)。
+    给定 limit 时，一旦整行的最小值超过 limit 就提前返回 limit + 1。
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+        if limit is not None and min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class BKTree:
+    """
+    编辑距离下的 BK 树。
+    按三角不等式剪枝：查询半径为 r 时，只需访问与当前节点距离在 [d-r, d+r] 内的子树。
+    """
+
+    def __init__(self, distance: Callable[[str, str], int] = levenshtein):
+        self.distance = distance
+        self.root: Optional[Tuple[str, Dict[int, tuple]]] = None
+        self.size = 0
+
+    def add(self, item: str):
+        if self.root is None:
+            self.root = (item, {})
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            word, children = node
+            d = self.distance(item, word)
+            if d == 0:
+                return
+            child = children.get(d)
+            if child is None:
+                children[d] = (item, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, query: str, radius: int) -> List[Tuple[int, str]]:
+        """返回所有距离 <= radius 的 (距离, 条目)，按距离排序"""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            word, children = stack.pop()
+            d = self.distance(query, word)
+            if d <= radius:
+                results.append((d, word))
+            for child_d, child in children.items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+        results.sort()
+        return results
+
+    def __len__(self):
+        return self.size
+
+
+class AffixCatalog:
+    """
+    已知词缀目录 (可选)。
+
+    条目是去掉数值后的标准化词缀名 (与 AffixRecord.name 同一形式)。
+    每一行 OCR 文本先吸附到编辑距离最近的目录条目，关键词匹配就变成 "规范条目的集合查询"：
+    - snap(): 行 -> 规范条目 (BK 树查找，结果按名字放在有上限的 LRU 缓存里)
+    - entries_for(): 关键词 -> 包含它的规范条目集合 (每个关键词只算一次)
+    OCR 的少量错字在吸附这一步就被纠正，匹配阶段不再需要逐窗口模糊比较。
+    """
+
+    # 允许的编辑距离 = 条目长度 * MAX_DISTANCE_RATIO (至少 1)
+    MAX_DISTANCE_RATIO = 0.2
+    # 吸附结果缓存的容量 (误读出来的名字各不相同，长时间运行不能无限增长)
+    SNAP_CACHE_SIZE = 4096
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self.tree = BKTree()
+        self.entries: Set[str] = set()
+        self._snap_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._keyword_cache: Dict[str, Set[str]] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: str):
+        entry = entry.strip()
+        if not entry or entry in self.entries:
+            return
+        self.entries.add(entry)
+        self.tree.add(entry)
+        self._snap_cache.clear()
+        self._keyword_cache.clear()
+
+    def max_distance(self, text: str) -> int:
+        return max(1, int(len(text) * self.MAX_DISTANCE_RATIO))
+
+    def snap(self, name: str) -> Optional[str]:
+        """
+        把一行的词缀名吸附到最近的目录条目。
+        超出距离上限，或有两个条目同样近 (无法确定是哪一个) 时返回 None。
+        """
+        if name in self.entries:
+            return name
+        if name in self._snap_cache:
+            self._snap_cache.move_to_end(name)
+            return self._snap_cache[name]
+
+        result = None
+        if name:
+            hits = self.tree.search(name, self.max_distance(name))
+            if hits and (len(hits) == 1 or hits[0][0] < hits[1][0]):
+                result = hits[0][1]
+        self._snap_cache[name] = result
+        if len(self._snap_cache) > self.SNAP_CACHE_SIZE:
+            self._snap_cache.popitem(last=False)
+        return result
+
+    def entries_for(self, keyword: str, contains: Callable[[str, str], bool]) -> Set[str]:
+        """包含 keyword 的所有规范条目 (对目录做一次模糊包含判断，之后按关键词缓存)"""
+        found = self._keyword_cache.get(keyword)
+        if found is None:
+            found = {entry for entry in self.entries if contains(entry, keyword)}
+            self._keyword_cache[keyword] = found
+        return found
+
+    # ------------------------------------------------------------------
+    # 加载 / 保存 / 从历史学习
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, path: str) -> "AffixCatalog":
+        """从文本文件加载，每行一个条目，# 开头为注释"""
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    entries.append(line)
+        return cls(entries)
+
+    def save(self, path: str):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# 已知词缀目录 (标准化后、去掉数值的词缀名)，每行一个\n")
+            for entry in sorted(self.entries):
+                f.write(entry + '\n')
+
+    @classmethod
+    def learn(cls, frames: Iterable[str], normalize: Callable[[str], str], min_count: int = 2) -> "AffixCatalog":
+        """
+        从历史 OCR 帧中学习目录：统计每行的词缀名，出现次数 >= min_count 的才收录
+        (误读出来的名字通常只出现一两次)。
+        """
+        counter: Counter = Counter()
+        for frame in frames:
+            clean = fix_pipe_digits(frame.replace('\r\n', '\n')).replace('|', '\n')
+            for i, line in enumerate(l.strip() for l in clean.split('\n')):
+                if not line:
+                    continue
+                name = parse_affix_line(line, i, normalize).name
+                if len(name) >= 2:
+                    counter[name] += 1
+        return cls(name for name, count in counter.most_common() if count >= min_count)
+
+    def __len__(self):
+        return len(self.entries)
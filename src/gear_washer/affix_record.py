@@ -0,0 +1,199 @@
+import re
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+
+# 数值: 整数或小数。范围 "5-10" / "5~10" 会被拆成两个数值依次记录
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+
+class AffixRecord(NamedTuple):
+    """
+    单行 OCR 文本解析出的词缀记录。
+
+    name:    去掉数值后的标准化词缀名 (如 "+75% 法术伤害" -> "法术伤害")
+    values:  这一行里按出现顺序提取到的所有数值 (范围会得到上下限两个值)
+    line_no: 在本帧中的行号 (从 0 开始)
+    text:    标准化后的整行文本 (保留数字)，用于模糊匹配和多数值时的定位
+    """
+    name: str
+    values: List[float]
+    line_no: int
+    text: str
+
+    def value_for(self, keyword: str) -> Optional[float]:
+        """
+        取出与 keyword 对应的数值。
+        绝大多数暗黑装备属性一行只有一个数值，直接返回即可；
+        只有一行里出现多个数值时才按关键词位置做一次定位。
+        """
+        if not self.values:
+            return None
+        if len(self.values) == 1:
+            return self.values[0]
+
+        val = extract_number_near(self.text, keyword)
+        if val is not None:
+            return val
+        # 关键词被 OCR 误读导致定位失败时，退回行首数值 (数值 + 描述 是最常见的格式)
+        return self.values[0]
+
+
+def parse_affix_line(line: str, line_no: int, normalize: Callable[[str], str]) -> AffixRecord:
+    """
+    把一行原始 OCR 文本解析为 AffixRecord。
+    数值在原始文本上提取 (此时小数点和范围符号都还在)，词缀名在去掉数值后再标准化。
+
+    :param line: 原始单行文本 (已经按 \\n 和 | 切分)
+    :param normalize: 文本标准化函数，一般传 AffixMatcher.normalize_text
+    """
+    values = []
+    for m in _NUMBER_RE.finditer(line):
+        try:
+            values.append(float(m.group(0)))
+        except ValueError:
+            pass
+
+    name = normalize(_NUMBER_RE.sub(' ', line))
+    return AffixRecord(name, values, line_no, normalize(line))
+
+
+class AffixRecordIndex:
+    """
+    一帧 OCR 文本的词缀记录索引。
+    每一行只解析一次，记录按标准化词缀名存入字典；
+    数值条件检查变成 "按名字查表 + 数值比较"，而不是对每个 (词缀, 行) 反复跑正则。
+    """
+
+    def __init__(self, lines: List[str], normalize: Callable[[str], str]):
+        self.records: List[AffixRecord] = [parse_affix_line(line, i, normalize) for i, line in enumerate(lines)]
+        self.by_name: Dict[str, List[AffixRecord]] = {}
+        for rec in self.records:
+            if rec.name:
+                self.by_name.setdefault(rec.name, []).append(rec)
+        # keyword -> 模糊包含该关键词的记录 (同一帧内只扫描一次)
+        self._fuzzy_cache: Dict[str, List[AffixRecord]] = {}
+
+    def iter_candidates(self, keyword: str, contains: Callable[[str, str], bool]) -> Iterator[AffixRecord]:
+        """
+        按优先级产出可能对应 keyword 的记录:
+        1. 词缀名与关键词完全一致的记录 (哈希查找，O(1))
+        2. 整行文本模糊包含关键词的记录 (只在第 1 步不够用时才计算，并按帧缓存)
+
+        :param contains: 模糊包含判断函数 contains(haystack, needle) -> bool
+        """
+        exact = self.by_name.get(keyword, [])
+        for rec in exact:
+            yield rec
+
+        fuzzy = self._fuzzy_cache.get(keyword)
+        if fuzzy is None:
+            fuzzy = [rec for rec in self.records if contains(rec.text, keyword)]
+            self._fuzzy_cache[keyword] = fuzzy
+
+        for rec in fuzzy:
+            if rec.name != keyword:
+                yield rec
+
+
+def extract_number_near(text: str, keyword: str) -> Optional[float]:
+    """
+    在 text 中找到 keyword 后，提取紧随其后的数值。
+    支持整数和小数，支持 % 号（虽然通常只提取数字部分）。
+    
+    [重要修复] 这里不仅要向后找，如果向后找的紧邻内容是换行符或无关内容，
+    而数字其实是在关键词的前面（例如 "+75% 法术伤害"），
+    那么需要尝试向前提取数字。
+    
+    [最新修复] OCR 有时会有竖线 | 作为边缘噪点或其他分割符，
+    如果提取到的数字跨越了 | 那肯定是错的。
+    """
+    if not text or not keyword:
+        return None
+
+    # 1. 找到关键词位置
+    idx = text.find(keyword)
+    if idx == -1:
+        return None
+    
+    kw_len = len(keyword)
+    
+    # --- 策略 A: 尝试向后提取 (适用于 "力量 +50" 这种格式) ---
+    # 截取关键词后面的一小段，比如 20 个字符
+    start_search = idx + kw_len
+    # 先找到第一个换行符或者 | 符号，作为硬性边界
+    stop_chars = ['\n', '|']
+    snippet_end = start_search + 20
+    
+    for char in stop_chars:
+        stop_idx = text.find(char, start_search)
+        if stop_idx != -1 and stop_idx < snippet_end:
+            snippet_end = stop_idx
+            
+    snippet_after = text[start_search : snippet_end]
+    
+    # 简单的正则: 允许少量空格或冒号或加号，紧接着数字
+    regex_after = r'^[:\+\s=\-]*(\d+\.?\d*)' 
+    match_after = re.search(regex_after, snippet_after)
+    
+    val_after = None
+    if match_after:
+        try:
+            val_str = match_after.group(1)
+            # 再次校验：如果匹配到的数字后面紧跟着就是 | (虽然 snippet 截断了，但为了保险)
+            # 其实不用，因为 snippet 已经截断了
+            if val_str: 
+                 val_after = float(val_str)
+        except: pass
+
+    if val_after is not None:
+        return val_after
+
+    # --- 策略 B: 尝试向前提取 (适用于 "+75% 法术伤害" 这种格式) ---
+    # 截取关键词前面的一小段
+    end_search = idx
+    start_search = max(0, idx - 20)
+    
+    # 同样需要截断，如果前面有换行符或 |
+    # 我们要找的是离 end_search 最近的的那个阻断符
+    # 因为是从左往右找，所以要找 snippet 里的 *最后一个* 阻断符
+    snippet_before_raw = text[start_search : end_search]
+    
+    last_stop_idx = -1
+    for char in stop_chars:
+        # 在片段里找最后一次出现的位置
+        p = snippet_before_raw.rfind(char)
+        if p > last_stop_idx:
+            last_stop_idx = p
+            
+    if last_stop_idx != -1:
+        # 只保留阻断符之后的内容
+        snippet_before = snippet_before_raw[last_stop_idx+1:]
+    else:
+        snippet_before = snippet_before_raw
+        
+    # 正则: 找结尾处的数字
+    regex_before = r'(\d+\.?\d*)[%\s\+\-]*$'
+    match_before = re.search(regex_before, snippet_before)
+    
+    if match_before:
+        try:
+            val_str = match_before.group(1)
+            return float(val_str)
+        except: pass
+        
+    # --- 策略 C: 尝试行首提取 (适用于 "97 冰冻系法术伤害" 但关键词只是 "系法术伤害" 这种情况) ---
+    # 如果前两种都没找到，且这一整行本来就是为了这个属性服务的，
+    # 那么数值很有可能就在行的最开头（绝大多数暗黑装备属性都是这样：数值 + 描述）
+    
+    # 必须确保我们是在处理单行文本（通过判断 text 是否包含换行符来简单猜测，或者直接试）
+    # 用于 lines 模式下的 line_norm
+    regex_head = r'^[:\+\s=\-]*(\d+\.?\d*)'
+    match_head = re.search(regex_head, text)
+    
+    if match_head:
+        try:
+            val_str = match_head.group(1)
+            return float(val_str)
+        except: pass
+        
+    return None
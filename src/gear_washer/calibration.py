@@ -0,0 +1,133 @@
+import json
+import os
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# 默认的阈值表文件 (与数据库一样放在当前运行目录下)
+DEFAULT_THRESHOLD_PATH = "match_thresholds.json"
+
+# 关键词长度分桶: (最短, 最长)，None 表示不限
+LENGTH_BUCKETS = ((1, 2), (3, 4), (5, 6), (7, None))
+
+# 校准时尝试的阈值: 0.50, 0.525, ..., 0.95
+CANDIDATE_THRESHOLDS = [round(0.5 + 0.025 * i, 3) for i in range(19)]
+
+
+def length_bucket(length: int) -> str:
+    """关键词长度所在的分桶名，例如 "1-2"、"7+" """
+    for lo, hi in LENGTH_BUCKETS:
+        if hi is None:
+            if length >= lo:
+                return f"{lo}+"
+        elif lo <= length <= hi:
+            return f"{lo}-{hi}"
+    return f"{LENGTH_BUCKETS[0][0]}-{LENGTH_BUCKETS[0][1]}"
+
+
+class ThresholdTable:
+    """
+    按关键词 / 关键词长度区分的模糊匹配阈值。
+    查找顺序: 单个关键词 -> 长度分桶 -> 默认值。关键词均为标准化后的文本。
+    """
+
+    def __init__(self, default: float, by_length: Optional[Dict[str, float]] = None,
+                 by_keyword: Optional[Dict[str, float]] = None):
+        self.default = default
+        self.by_length: Dict[str, float] = dict(by_length or {})
+        self.by_keyword: Dict[str, float] = dict(by_keyword or {})
+
+    def threshold_for(self, keyword: str) -> float:
+        value = self.by_keyword.get(keyword)
+        if value is None:
+            value = self.by_length.get(length_bucket(len(keyword)), self.default)
+        return value
+
+    @classmethod
+    def load(cls, path: str) -> "ThresholdTable":
+        """JSON 格式: {"default": 0.7, "by_length": {"1-2": 0.85, ...}, "by_keyword": {"人冰": 0.9, ...}}"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(float(data['default']),
+                   {k: float(v) for k, v in data.get('by_length', {}).items()},
+                   {k: float(v) for k, v in data.get('by_keyword', {}).items()})
+
+    def save(self, path: str):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        data = {'default': self.default, 'by_length': self.by_length, 'by_keyword': self.by_keyword}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+class CurvePoint(NamedTuple):
+    threshold: float
+    precision: float  # 判为包含的样本中真正包含的比例 (越低，误停越多)
+    recall: float     # 真正包含的样本中被判为包含的比例 (越低，白洗越多)
+    tp: int
+    fp: int
+    fn: int
+
+
+def curve(scored: List[Tuple[float, bool]], thresholds: Iterable[float] = CANDIDATE_THRESHOLDS) -> List[CurvePoint]:
+    """
+    :param scored: [(相似度得分, 是否真的包含关键词), ...]
+    """
+    points = []
+    positives = sum(1 for _, present in scored if present)
+    for t in thresholds:
+        tp = sum(1 for score, present in scored if present and score >= t - 1e-9)
+        fp = sum(1 for score, present in scored if not present and score >= t - 1e-9)
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / positives if positives else 1.0
+        points.append(CurvePoint(t, precision, recall, tp, fp, positives - tp))
+    return points
+
+
+def pick_threshold(points: List[CurvePoint], baseline: float) -> float:
+    """
+    在 "误判为包含的数量不超过基准阈值" 的前提下选召回率最高的阈值；
+    召回率相同时取较高的阈值，给没见过的误读留余量。
+    """
+    base = min(points, key=lambda p: abs(p.threshold - baseline))
+    allowed = [p for p in points if p.fp <= base.fp]
+    best = max(allowed, key=lambda p: (p.recall, p.threshold))
+    return best.threshold
+
+
+def calibrate(samples: Iterable[Tuple[str, str, bool]], score: Callable[[str, str], float],
+              normalize: Callable[[str], str], default: float,
+              min_samples: int = 10) -> Tuple[ThresholdTable, Dict[str, Dict[str, List[CurvePoint]]]]:
+    """
+    从标注样本计算阈值表。
+    :param samples: [(关键词, OCR 行文本, 该行是否真的是这个词缀), ...]
+    :param score: score(行文本, 关键词) -> 与匹配器同口径的相似度 (AffixMatcher.similarity)
+    :param min_samples: 分桶 / 单个关键词的正负样本都至少有这么多条才单独设置阈值，否则沿用上一级
+    :return: (阈值表, {'by_length': {分桶名: 曲线}, 'by_keyword': {关键词: 曲线}})
+    """
+    by_bucket: Dict[str, List[Tuple[float, bool]]] = {}
+    by_keyword: Dict[str, List[Tuple[float, bool]]] = {}
+    for keyword, line, present in samples:
+        kw = normalize(keyword)
+        if not kw:
+            continue
+        item = (score(normalize(line), kw), present)
+        by_bucket.setdefault(length_bucket(len(kw)), []).append(item)
+        by_keyword.setdefault(kw, []).append(item)
+
+    def enough(scored):
+        positives = sum(1 for _, present in scored if present)
+        return positives >= min_samples and len(scored) - positives >= min_samples
+
+    table = ThresholdTable(default)
+    curves: Dict[str, Dict[str, List[CurvePoint]]] = {'by_length': {}, 'by_keyword': {}}
+    for bucket, scored in by_bucket.items():
+        points = curves['by_length'][bucket] = curve(scored)
+        if enough(scored):
+            table.by_length[bucket] = pick_threshold(points, default)
+    for kw, scored in by_keyword.items():
+        if enough(scored):
+            points = curves['by_keyword'][kw] = curve(scored)
+            value = pick_threshold(points, table.threshold_for(kw))
+            if value != table.threshold_for(kw):
+                table.by_keyword[kw] = value
+    return table, curves
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import re
+from typing import Callable, Dict, List, Optional, Union
+
+
+def rule_fingerprint(conditions: Union[str, List, Dict]) -> str:
+    """规则内容的指纹 (与 key 顺序、空白无关)，规则一改指纹就变"""
+    try:
+        raw = json.dumps(conditions, ensure_ascii=False, sort_keys=True)
+    except (TypeError, ValueError):
+        raw = repr(conditions)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def is_expression(text: str) -> bool:
+    """是否为 && / || 逻辑表达式 (需要在整段文本上求值)"""
+    return '&&' in text or '||' in text
+
+
+def split_keywords(conditions: Union[str, List, Dict]) -> List[str]:
+    """规则中出现的所有原始关键词 (组列表按词缀取，表达式按 && / || / 括号 / ! 拆开)"""
+    if isinstance(conditions, str):
+        return [p.strip() for p in re.split(r'&&|\|\||[()!]', conditions) if p.strip()]
+    if isinstance(conditions, dict):
+        conditions = [conditions]
+    keywords = []
+    if isinstance(conditions, list):
+        for item in conditions:
+            if isinstance(item, dict):
+                for affix in item.get('affixes', []):
+                    name = affix.get('name', '') if isinstance(affix, dict) else affix
+                    keywords.extend(split_keywords(str(name)))
+            else:
+                keywords.extend(split_keywords(item))
+    return keywords
+
+
+class CompiledRule:
+    """
+    预编译后的匹配规则。
+
+    编辑器保存的规则 (组列表) 在这里一次性整理好：关键词提前标准化、空词缀提前剔除，
+    匹配时不再重复做这些工作。fingerprint 用作结果缓存的 key，规则内容变化时自动失效。
+
+    groups 结构:
+    [
+        {'type': 'AND'|'COUNT'|'NOT', 'min': int|None, 'max': int|None,
+         'affixes': [{'text': 原始词缀, 'kw': 标准化关键词, 'kind': 'text'|'value'|'expr',
+                      'min': min_value, 'max': max_value}, ...]},
+        ...
+    ]
+    非组结构的规则 (字符串 / 旧版列表) groups 为 None，匹配时按原逻辑处理。
+
+    选择性统计:
+    匹配时记录每个组 / 每个词缀的 "判定次数、通过(命中)次数、耗时"，
+    每 REORDER_EVERY 次检查按统计重新排列求值顺序，让 "便宜且经常失败" 的检查先跑。
+    顶层各组之间是 AND 关系，组内只按命中数量判定，所以调整顺序不改变规则语义。
+    group_order / affix_order 中存的都是编辑器里的原始下标。
+    """
+
+    # 每累计多少次完整判定重新排序一次
+    REORDER_EVERY = 50
+
+    def __init__(self, conditions: Union[str, List, Dict], normalize: Callable[[str], str], rule_id=None):
+        self.conditions = conditions
+        self.rule_id = rule_id
+        self.fingerprint = rule_fingerprint(conditions)
+        self.groups: Optional[List[Dict]] = None
+        # 规则涉及的所有关键词 (已标准化，去重；表达式会拆成单个关键词，字符串规则也包含在内)
+        self.all_keywords: List[str] = []
+        for kw in split_keywords(conditions):
+            kw = normalize(kw)
+            if kw and kw not in self.all_keywords:
+                self.all_keywords.append(kw)
+
+        if isinstance(conditions, list) and conditions and isinstance(conditions[0], dict) and 'type' in conditions[0]:
+            self.groups = [self._compile_group(g, normalize) for g in conditions]
+
+        groups = self.groups or []
+        # [判定次数, 通过次数, 累计耗时ns]
+        self.group_stats = [[0, 0, 0] for _ in groups]
+        # [判定次数, 命中次数, 累计耗时ns]
+        self.affix_stats = [[[0, 0, 0] for _ in g['affixes']] for g in groups]
+        self.group_order = list(range(len(groups)))
+        self.affix_order = [list(range(len(g['affixes']))) for g in groups]
+        self._checks_since_reorder = 0
+
+    @staticmethod
+    def _compile_group(group: Dict, normalize: Callable[[str], str]) -> Dict:
+        affixes = []
+        for affix_item in group.get('affixes', []):
+            affix_text, min_val, max_val = "", None, None
+            if isinstance(affix_item, dict):
+                affix_text = affix_item.get('name', '')
+                min_val = affix_item.get('min_value')
+                max_val = affix_item.get('max_value')
+            elif isinstance(affix_item, str):
+                affix_text = affix_item
+            if not affix_text.strip():
+                continue
+
+            if is_expression(affix_text):
+                kind = 'expr'
+            elif min_val is not None or max_val is not None:
+                kind = 'value'
+            else:
+                kind = 'text'
+            affixes.append({
+                'text': affix_text,
+                'kw': normalize(affix_text.strip()),
+                'kind': kind,
+                'min': float(min_val) if min_val is not None else None,
+                'max': float(max_val) if max_val is not None else None,
+            })
+
+        min_v = group.get('min')
+        max_v = group.get('max')
+        return {
+            'type': group.get('type', 'AND'),
+            'min': int(min_v) if min_v is not None else None,
+            'max': int(max_v) if max_v is not None else None,
+            'affixes': affixes,
+        }
+
+    def value_keywords(self) -> List[str]:
+        """带数值范围条件的词缀关键词 (已标准化，去重)"""
+        seen = []
+        for group in self.groups or []:
+            for affix in group['affixes']:
+                if affix['kind'] == 'value' and affix['kw'] not in seen:
+                    seen.append(affix['kw'])
+        return seen
+
+    # ------------------------------------------------------------------
+    # 选择性统计与求值顺序
+    # ------------------------------------------------------------------
+    def record_check(self):
+        """完成一次完整判定后调用，达到间隔时自动重新排序"""
+        self._checks_since_reorder += 1
+        if self._checks_since_reorder >= self.REORDER_EVERY:
+            self.reorder()
+
+    @staticmethod
+    def _rate(stat, idx: int) -> float:
+        """带拉普拉斯平滑的比例，避免样本很少时出现 0 或 1"""
+        return (stat[idx] + 1) / (stat[0] + 2)
+
+    @staticmethod
+    def _avg_cost(stat) -> float:
+        return stat[2] / stat[0] if stat[0] else 0.0
+
+    def reorder(self):
+        """
+        按观测到的通过率和耗时重新排列求值顺序 (期望代价 = 平均耗时 / 提前结束的概率，越小越先跑):
+        - 组: 越便宜、越常失败越靠前 (NOT 组和很少出现的关键词通常排在前面)
+        - AND 组内: 越常未命中越靠前 (第一个未命中即可判定失败)
+        - NOT 组内: 越常命中越靠前 (第一个命中即可判定失败)
+        - COUNT 组内: 组通常失败时按未命中率排，否则按命中率排
+        """
+        self._checks_since_reorder = 0
+        if not self.groups:
+            return
+
+        def group_key(gi):
+            stat = self.group_stats[gi]
+            fail_rate = 1.0 - self._rate(stat, 1)
+            return (self._avg_cost(stat) / fail_rate, gi)
+
+        self.group_order = sorted(range(len(self.groups)), key=group_key)
+
+        for gi, group in enumerate(self.groups):
+            g_type = group['type']
+            stats = self.affix_stats[gi]
+            group_fail_rate = 1.0 - self._rate(self.group_stats[gi], 1)
+
+            def affix_key(ai, stats=stats, g_type=g_type, group_fail_rate=group_fail_rate):
+                hit_rate = self._rate(stats[ai], 1)
+                if g_type == 'AND' or (g_type == 'COUNT' and group_fail_rate > 0.5):
+                    decisive = 1.0 - hit_rate
+                else:
+                    decisive = hit_rate
+                return (self._avg_cost(stats[ai]) / decisive, ai)
+
+            self.affix_order[gi] = sorted(range(len(group['affixes'])), key=affix_key)
+
+    def export_order(self) -> Dict:
+        """导出学习到的求值顺序 (按规则 ID 持久化用)"""
+        return {
+            'fingerprint': self.fingerprint,
+            'groups': list(self.group_order),
+            'affixes': [list(o) for o in self.affix_order],
+        }
+
+    def import_order(self, data: Optional[Dict]) -> bool:
+        """
+        恢复之前学习到的求值顺序。规则内容已经变化 (指纹不一致) 或数据不完整时忽略。
+        :return: 是否成功应用
+        """
+        if not data or not self.groups or data.get('fingerprint') != self.fingerprint:
+            return False
+        group_order = data.get('groups')
+        affix_order = data.get('affixes')
+        if not isinstance(group_order, list) or sorted(group_order) != list(range(len(self.groups))):
+            return False
+        if not isinstance(affix_order, list) or len(affix_order) != len(self.groups):
+            return False
+        for gi, order in enumerate(affix_order):
+            if not isinstance(order, list) or sorted(order) != list(range(len(self.groups[gi]['affixes']))):
+                return False
+        self.group_order = list(group_order)
+        self.affix_order = [list(o) for o in affix_order]
+        return True
+
+    @property
+    def keywords(self) -> List[str]:
+        """规则里所有不重复的关键词 (标准化后)"""
+        if self.groups is None:
+            return []
+        seen = []
+        for g in self.groups:
+            for a in g['affixes']:
+                if a['kw'] not in seen:
+                    seen.append(a['kw'])
+        return seen
+
+    def __repr__(self):
+        return f"CompiledRule(id={self.rule_id}, fp={self.fingerprint[:8]})"
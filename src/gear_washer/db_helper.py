@@ -228,6 +228,17 @@ class SimpleDB:
             cursor.execute('SELECT id, content, description FROM affix ORDER BY id')
             return cursor.fetchall()
 
+    def get_affixes_by_ids(self, affix_ids):
+        """按 ID 列表获取多条规则 (多目标模式)，返回 [(id, content, description)]，保持传入顺序"""
+        if not affix_ids:
+            return []
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' for _ in affix_ids)
+            cursor.execute(f'SELECT id, content, description FROM affix WHERE id IN ({placeholders})', tuple(affix_ids))
+            rows = {row[0]: row for row in cursor.fetchall()}
+            return [rows[i] for i in affix_ids if i in rows]
+
     def list_equipment_types(self):
         """列出所有装备类型 (id, name)"""
         with sqlite3.connect(self.db_path) as conn:
@@ -0,0 +1,95 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# 数字二次识别使用的字符白名单 (数值、百分号、正负号、范围连接符)
+DIGIT_WHITELIST = "0123456789.%+-~"
+
+# 只由数字和数值符号组成的词 (chi_sim 常把 "0" 读成 "O"、"1" 读成 "l/I/|"，这些也算)
+_NUMERIC_WORD_RE = re.compile(r'^[0-9OoIl|.%+\-~]+$')
+_DIGIT_RE = re.compile(r'\d')
+# 数字识别结果必须是 "数值" 或 "数值-数值" 的形式才会被采用
+_DIGIT_RESULT_RE = re.compile(r'^[+\-]?\d+(?:\.\d+)?%?(?:[-~]\d+(?:\.\d+)?%?)?$')
+
+
+class OcrWord(NamedTuple):
+    """tesseract TSV 输出中的一个词 (坐标为识别所用图片上的像素坐标)"""
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+def parse_tsv_lines(tsv: str) -> List[List[OcrWord]]:
+    """
+    解析 `tesseract ... tsv` 的输出，按 (块, 段, 行) 分组，返回从上到下的各行词列表。
+    """
+    lines: Dict[Tuple[int, int, int], List[OcrWord]] = {}
+    order: List[Tuple[int, int, int]] = []
+    for row in tsv.splitlines()[1:]:
+        cols = row.split('\t')
+        if len(cols) < 12 or cols[0] != '5':
+            continue
+        text = cols[11].strip()
+        if not text:
+            continue
+        try:
+            key = (int(cols[2]), int(cols[3]), int(cols[4]))
+            word = OcrWord(text, int(cols[6]), int(cols[7]), int(cols[8]), int(cols[9]))
+        except ValueError:
+            continue
+        if key not in lines:
+            lines[key] = []
+            order.append(key)
+        lines[key].append(word)
+    return [lines[key] for key in order]
+
+
+def line_text(words: List[OcrWord]) -> str:
+    """与 tesseract 纯文本输出一致: 同一行的词用空格连接"""
+    return ' '.join(w.text for w in words)
+
+
+def numeric_runs(words: List[OcrWord]) -> List[Tuple[int, int]]:
+    """
+    一行中连续的 "纯数值词" 区间 [(起始下标, 结束下标), ...]，至少包含一个真正的数字。
+    和汉字粘在一起的词 (如 "75%法术") 不处理: 裁剪框里会带上汉字，白名单识别反而更差。
+    """
+    runs = []
+    start = None
+    for i, word in enumerate(words + [None]):
+        if word is not None and _NUMERIC_WORD_RE.match(word.text):
+            if start is None:
+                start = i
+            continue
+        if start is not None:
+            if any(_DIGIT_RE.search(w.text) for w in words[start:i]):
+                runs.append((start, i))
+            start = None
+    return runs
+
+
+def run_box(words: List[OcrWord], run: Tuple[int, int], pad: int, size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """数值区间的裁剪框 (left, top, right, bottom)，四周留 pad 像素并限制在图片内"""
+    part = words[run[0]:run[1]]
+    left = min(w.left for w in part) - pad
+    top = min(w.top for w in part) - pad
+    right = max(w.left + w.width for w in part) + pad
+    bottom = max(w.top + w.height for w in part) + pad
+    return max(0, left), max(0, top), min(size[0], right), min(size[1], bottom)
+
+
+def clean_digit_result(text: str) -> Optional[str]:
+    """整理数字识别结果，不是合法数值时返回 None (保留主识别的结果)"""
+    text = re.sub(r'\s+', '', text).replace('~', '-')
+    if text and _DIGIT_RESULT_RE.match(text):
+        return text
+    return None
+
+
+def replace_run(words: List[OcrWord], run: Tuple[int, int], digits: str) -> List[OcrWord]:
+    """用数字识别结果替换一行中的数值区间 (合并为一个词)"""
+    part = words[run[0]:run[1]]
+    merged = OcrWord(digits, part[0].left, part[0].top,
+                     part[-1].left + part[-1].width - part[0].left, part[0].height)
+    return words[:run[0]] + [merged] + words[run[1]:]
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .jobs import EXHAUSTED, TIME_UP, WashJob, job_result
+
+
+class InterleavedItem:
+    """
+    交替洗炼中的一件装备 (各自的规则、预算和结束状态)。
+
+    每件装备在两个阶段之间轮换，每次轮到它只做其中一步:
+    - 截图: 悬停 -> 截图 -> 把识别和判定交给识别线程 (pending)
+    - 判定: 悬停 -> 取识别线程的结论 -> 命中则结束，否则按Z键洗炼
+    判定和按键之间必须拿到这件装备的结论 (先按键会把可能命中的词缀洗掉)，
+    所以识别时间和游戏刷新时间是靠 "处理其它装备" 来重叠的:
+    A 的识别在处理 B 时进行，A 按键后的刷新也在处理 B 时完成。
+    """
+
+    def __init__(self, job: WashJob, index: int, window: Tuple, rule, rules: Optional[Dict], all_rules: List,
+                 region: Tuple[int, int, int, int], hwnd, digit_filter: Optional[Callable[[str], bool]],
+                 max_attempts: int, time_budget: Optional[float]):
+        """
+        :param index: 在任务列表中的序号 (结果按序号返回)
+        :param window: GearWasher._locate_window() 的结果 (offset_x, offset_y, hwnd)
+        :param region: 截图区域，hwnd: 截图用的窗口句柄 (前台模式为 None)，见 GearWasher._read_target
+        """
+        self.job = job
+        self.index = index
+        self.window = window
+        self.rule = rule                # 主规则 (CompiledRule)
+        self.rules = rules              # 多目标规则 {名称: CompiledRule}，没有时为 None
+        self.all_rules = all_rules
+        self.region = region
+        self.hwnd = hwnd
+        self.digit_filter = digit_filter
+        self.max_attempts = max_attempts
+        self.time_budget = time_budget
+
+        self.pending: Optional[Future] = None  # 识别线程中的 (是否命中, 命中规则, 文本)
+        self.pressed_at: Optional[float] = None  # 上次按键的时间 (截图前要等刷新完成)
+        self.attempts = 0
+        self.text = ""
+        self.matched_rules: List[str] = []
+        self.result: Optional[Dict] = None
+        self._started = time.perf_counter()
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+    def out_of_budget(self) -> Optional[str]:
+        """预算用完时返回结束状态 (EXHAUSTED / TIME_UP)，否则返回 None"""
+        if self.attempts >= self.max_attempts:
+            return EXHAUSTED
+        if self.time_budget and time.perf_counter() - self._started >= self.time_budget:
+            return TIME_UP
+        return None
+
+    def refresh_wait(self, interval: float) -> float:
+        """截图前还需要等待游戏刷新多久"""
+        if self.pressed_at is None:
+            return 0.0
+        return max(0.0, interval - (time.perf_counter() - self.pressed_at))
+
+    def finish(self, status: str, reason: str = ""):
+        self.result = job_result(status, self.attempts, time.perf_counter() - self._started,
+                                 self.matched_rules, self.text, reason)
@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# 单个任务的结束状态
+MATCHED = 'matched'          # 洗到了目标
+EXHAUSTED = 'max_attempts'   # 用完了次数预算
+TIME_UP = 'time_budget'      # 用完了时间预算
+STOPPED = 'stopped'          # 用户中止 (队列中剩下的任务不再执行)
+SKIPPED = 'skipped'          # 没有执行 (规则无法满足 / 找不到窗口 / 配置不完整)
+
+STATUS_TEXT = {
+    MATCHED: "成功",
+    EXHAUSTED: "次数用完",
+    TIME_UP: "时间用完",
+    STOPPED: "已中止",
+    SKIPPED: "跳过",
+}
+
+
+class WashJob(NamedTuple):
+    """
+    洗炼队列中的一个任务: 装备配置 + 规则 + 预算。
+    max_attempts / time_budget 为 None 时使用 GearWasher 上的设置。
+    """
+    name: str
+    gear_pos: Tuple[int, int]
+    affix_region: Tuple[int, int, int, int]
+    conditions: Any
+    window_title: Optional[str] = None
+    equipment_id: Optional[int] = None
+    rule_id: Optional[int] = None
+    rule_set: Optional[Dict[str, Any]] = None  # 多目标模式: {规则名: 条件}
+    max_attempts: Optional[int] = None
+    time_budget: Optional[float] = None        # 秒
+
+
+def job_result(status: str, attempts: int = 0, elapsed: float = 0.0,
+               matched_rules: Optional[List[str]] = None, text: str = "", reason: str = "") -> Dict:
+    """一个任务的结果 (GearWasher.run() / run_jobs() 的返回值)"""
+    return {
+        'status': status,
+        'attempts': attempts,
+        'elapsed': elapsed,
+        'matched_rules': list(matched_rules or []),
+        'text': text,
+        'reason': reason,
+    }
+
+
+def format_results(jobs: List[WashJob], results: List[Dict]) -> str:
+    """队列结束后的汇总表"""
+    lines = [f"=== 队列汇总: 成功 {sum(r['status'] == MATCHED for r in results)}/{len(jobs)} ==="]
+    for idx, job in enumerate(jobs):
+        if idx >= len(results):
+            lines.append(f"[{idx + 1}] {job.name}: 未执行")
+            continue
+        r = results[idx]
+        line = f"[{idx + 1}] {job.name}: {STATUS_TEXT.get(r['status'], r['status'])}"
+        if r['status'] != SKIPPED:
+            line += f"，{r['attempts']} 次，{r['elapsed']:.1f}s"
+        if r['matched_rules'] and job.rule_set:
+            line += f"，命中 {', '.join(r['matched_rules'])}"
+        if r['reason']:
+            line += f" ({r['reason']})"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -0,0 +1,169 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 一个文字行带: (上边界, 下边界, 行签名)，坐标为截图区域内的原始像素 (未放大)
+Row = Tuple[int, int, str]
+
+
+def signature_distance(a: str, b: str) -> int:
+    """两个行签名 (十六进制位图) 不同的位数；长度不一致视为完全不同"""
+    if len(a) != len(b):
+        return 4 * max(len(a), len(b))
+    return bin(int(a, 16) ^ int(b, 16)).count('1') if a else 0
+
+
+class TooltipLayout:
+    """
+    某件装备浮窗的行布局。
+
+    洗炼只改变词缀，装备名、基础属性、需求等级这些固定行每次都一模一样。
+    学习阶段连续观察 LEARN_FRAMES 次完整截图的行带：顶部 / 底部签名始终不变的行是固定行，
+    其余的行就是词缀区 (affix_span)。学会之后只截取、识别词缀区；
+    每 VERIFY_EVERY 次再截一次整个区域，固定行变了或词缀行跑出了词缀区就重新学习。
+    有底部固定行时，词缀多一条底部行就会整体下移，所以只裁掉顶部固定行，词缀区一直保留到区域底部。
+    """
+
+    LEARN_FRAMES = 3
+    VERIFY_EVERY = 25
+    # 签名允许的差异位数 (抗锯齿 / 截图的细微差别)
+    MAX_SIGNATURE_DIFF = 8
+    # 词缀区上下额外保留的像素，防止词缀数量多一条时被截断
+    SPAN_MARGIN = 4
+
+    def __init__(self, size: Tuple[int, int]):
+        """
+        :param size: 截图区域的 (宽, 高)，区域变化后布局作废
+        """
+        self.size = tuple(size)
+        self.samples: List[List[Row]] = []
+        self.header: List[Row] = []   # 顶部固定行
+        self.footer: List[Row] = []   # 底部固定行 (坐标取自最后一次学习帧，仅用签名比较)
+        self.affix_span: Optional[Tuple[int, int]] = None
+        self.fixed_text = ""          # 固定行的识别文本 (用于判断规则是否依赖这些行)
+        self.rolls_since_verify = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.affix_span is not None
+
+    def reset(self):
+        self.samples = []
+        self.header = []
+        self.footer = []
+        self.affix_span = None
+        self.fixed_text = ""
+        self.rolls_since_verify = 0
+
+    # ------------------------------------------------------------------
+    # 学习
+    # ------------------------------------------------------------------
+    def _same(self, a: Row, b: Row) -> bool:
+        return signature_distance(a[2], b[2]) <= self.MAX_SIGNATURE_DIFF
+
+    def observe(self, rows: Sequence[Row]) -> bool:
+        """
+        记录一次完整截图的行带，学够帧数后计算布局。
+        :return: 这次调用后布局是否可用
+        """
+        if rows:
+            self.samples.append(list(rows))
+        if len(self.samples) >= self.LEARN_FRAMES:
+            self._learn()
+            self.samples = []
+        return self.ready
+
+    def _learn(self):
+        first = self.samples[0]
+        # 顶部: 所有帧在同一位置、签名相同的连续行
+        n_head = 0
+        while all(n_head < len(s) for s in self.samples) and \
+                all(abs(s[n_head][0] - first[n_head][0]) <= 2 and self._same(s[n_head], first[n_head]) for s in self.samples):
+            n_head += 1
+        # 底部: 从下往上比较签名 (词缀行数变化时底部行的位置会整体移动)
+        n_foot = 0
+        while all(n_foot < len(s) - n_head for s in self.samples) and \
+                all(self._same(s[-1 - n_foot], first[-1 - n_foot]) for s in self.samples):
+            n_foot += 1
+
+        tops = [s[n_head][0] for s in self.samples if len(s) > n_head + n_foot]
+        bottoms = [s[len(s) - n_foot - 1][1] for s in self.samples if len(s) > n_head + n_foot]
+        if not tops or (n_head == 0 and n_foot == 0):
+            # 没有发现固定行 (或者每一行都没变)，截取全部区域，不启用布局
+            self.affix_span = None
+            return
+
+        top = max(0, min(tops) - self.SPAN_MARGIN)
+        if n_foot:
+            # 底部固定行的位置随词缀行数变化，学习帧里的位置不代表以后的装备: 保留到区域底部
+            bottom = self.size[1]
+        else:
+            bottom = min(self.size[1], max(bottoms) + self.SPAN_MARGIN)
+        self.header = first[:n_head]
+        self.footer = self.samples[-1][len(self.samples[-1]) - n_foot:] if n_foot else []
+        self.affix_span = (top, bottom)
+        self.rolls_since_verify = 0
+
+    # ------------------------------------------------------------------
+    # 使用与校验
+    # ------------------------------------------------------------------
+    def crop(self, region: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """把截图区域缩小到词缀区 (宽度不变)"""
+        x, y, w, _ = region
+        top, bottom = self.affix_span
+        return x, y + top, w, bottom - top
+
+    def fixed_rows(self) -> List[Row]:
+        return self.header + self.footer
+
+    def due_for_verify(self) -> bool:
+        return self.rolls_since_verify >= self.VERIFY_EVERY
+
+    def verify(self, rows: Sequence[Row]) -> bool:
+        """
+        用一次完整截图检查布局是否仍然有效:
+        顶部 / 底部固定行签名不变，且其余的行都落在词缀区内。
+        """
+        self.rolls_since_verify = 0
+        n_head, n_foot = len(self.header), len(self.footer)
+        if len(rows) < n_head + n_foot:
+            return False
+        if not all(self._same(r, h) for r, h in zip(rows[:n_head], self.header)):
+            return False
+        if n_foot and not all(self._same(r, f) for r, f in zip(rows[len(rows) - n_foot:], self.footer)):
+            return False
+        top, bottom = self.affix_span
+        middle = rows[n_head:len(rows) - n_foot]
+        if not all(r[0] >= top for r in middle):
+            return False
+        # 任何一行 (包括下移的底部固定行) 超出词缀区下边界，都说明有词缀行没被截进来
+        return all(r[1] <= bottom for r in rows[n_head:])
+
+    # ------------------------------------------------------------------
+    # 持久化 (SimpleDB 中按装备保存)
+    # ------------------------------------------------------------------
+    def to_dict(self) -> Dict:
+        return {
+            'size': list(self.size),
+            'header': [list(r) for r in self.header],
+            'footer': [list(r) for r in self.footer],
+            'affix_span': list(self.affix_span) if self.affix_span else None,
+            'fixed_text': self.fixed_text,
+        }
+
+    @classmethod
+    def from_dict(cls, data, size: Tuple[int, int]) -> Optional["TooltipLayout"]:
+        """数据无效或截图区域大小变了时返回 None"""
+        try:
+            if not data or tuple(data['size']) != tuple(size) or not data.get('affix_span'):
+                return None
+            layout = cls(size)
+            layout.header = [(int(t), int(b), str(sig)) for t, b, sig in data.get('header', [])]
+            layout.footer = [(int(t), int(b), str(sig)) for t, b, sig in data.get('footer', [])]
+            top, bottom = data['affix_span']
+            if layout.footer:
+                # 旧版保存的布局截到底部固定行的上边界，按现在的规则放宽到区域底部
+                bottom = size[1]
+            layout.affix_span = (int(top), int(bottom))
+            layout.fixed_text = str(data.get('fixed_text', ''))
+            return layout
+        except (KeyError, TypeError, ValueError):
+            return None
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class MatchMemo:
+    """
+    匹配结果的 LRU 缓存: (标准化帧文本的哈希, 规则指纹) -> (是否匹配, 判定说明)。
+
+    不同的帧经常 OCR 出完全相同的文本 (词缀很少的装备尤其明显)，
+    命中缓存时直接返回上次的结论，跳过全部模糊匹配。
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[int, str], Tuple[bool, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text_hash: int, fingerprint: str) -> Optional[Tuple[bool, Any]]:
+        key = (text_hash, fingerprint)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, text_hash: int, fingerprint: str, matched: bool, explanation: Any = None):
+        if self.maxsize <= 0:
+            return
+        key = (text_hash, fingerprint)
+        self._data[key] = (matched, explanation)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, fingerprint: Optional[str] = None):
+        """清除指定规则的缓存；不传则全部清空"""
+        if fingerprint is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if k[1] == fingerprint]:
+            del self._data[key]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> str:
+        return f"缓存命中 {self.hits}/{self.hits + self.misses} ({self.hit_rate:.1%})，当前条目 {len(self._data)}"
+
+    def __len__(self):
+        return len(self._data)
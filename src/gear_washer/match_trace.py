@@ -0,0 +1,46 @@
+from typing import Dict, List, Optional
+
+_TYPE_NAMES = {'AND': '和', 'COUNT': '数量', 'NOT': '非'}
+
+
+def _format_affix(entry: Dict) -> str:
+    mark = '✓' if entry['hit'] else '✗'
+    parts = [f"{mark}{entry['kw']}"]
+    if 'line' in entry:
+        parts.append(f"行{entry['line'] + 1}")
+        parts.append(f"{entry['score']:.2f}")
+    if 'value' in entry:
+        lo, hi = entry['range']
+        lo = '' if lo is None else f"{lo:g}"
+        hi = '' if hi is None else f"{hi:g}"
+        value = '无' if entry['value'] is None else f"{entry['value']:g}"
+        parts.append(f"值{value}∈[{lo},{hi}]")
+    parts.append(f"{entry['us']}us")
+    return ' '.join(parts)
+
+
+def format_trace(traces: Optional[List[Dict]]) -> str:
+    """
+    把 AffixMatcher.last_trace 格式化成紧凑的多行文本 (用于日志):
+        规则 [名称] 未满足 312us
+          第1组(和) ✗ 1/2 120us: ✓法术伤害 行1 1.00 40us; ✗冰冻抗性 行3 0.62 80us
+    """
+    if not traces:
+        return ""
+    lines = []
+    for trace in traces:
+        verdict = '满足' if trace.get('passed') else '未满足'
+        flags = []
+        if trace.get('from_memo'):
+            flags.append('缓存')
+        if trace.get('degraded'):
+            flags.append('超时退化')
+        flag_str = f" ({', '.join(flags)})" if flags else ''
+        lines.append(f"规则 [{trace.get('rule')}] {verdict} {trace.get('us', 0)}us{flag_str}")
+        for group in trace.get('groups', []):
+            mark = '✓' if group['passed'] else '✗'
+            name = _TYPE_NAMES.get(group['type'], group['type'])
+            affixes = '; '.join(_format_affix(a) for a in group['affixes'])
+            lines.append(f"  第{group['group'] + 1}组({name}) {mark} {group['matched']}/{group['total']} "
+                         f"{group['us']}us: {affixes}")
+    return '\n'.join(lines)
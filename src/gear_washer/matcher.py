@@ -1,7 +1,88 @@
 import re
-from typing import List, Union, Dict
+import time
+from collections import OrderedDict
+from typing import List, Union, Dict, Optional
 import difflib
 
+from .affix_catalog import AffixCatalog
+from .affix_record import AffixRecord, AffixRecordIndex, extract_number_near
+from .calibration import ThresholdTable
+from .compiled_rule import CompiledRule, rule_fingerprint
+from .match_memo import MatchMemo
+from .ocr_distance import ConfusionTable, WeightedNeedle
+from .qgram import QGramIndex
+from .text_normalize import fix_pipe_digits, normalize_ocr_text
+
+
+class _FrameContext:
+    """
+    单帧 OCR 文本的预处理结果。
+    行切分、整段标准化和词缀记录索引都只做一次，供本帧内所有条件检查共享。
+    """
+
+    def __init__(self, screen_text: str, normalize, max_lines: Optional[int] = None,
+                 max_line_length: Optional[int] = None, deadline: Optional[float] = None):
+        """
+        :param max_lines / max_line_length: 行数和单行长度的硬上限。
+            OCR 把背景读成大段噪声时，超出部分直接截掉，保证模糊匹配的最坏耗时有界。
+        :param deadline: 本帧判定的截止时间 (time.perf_counter)，超时后只做精确匹配
+        """
+        self._normalize = normalize
+        self.deadline = deadline
+        self.degraded = False  # 是否因为超时退化成了只做精确匹配
+        # 按 \n 或 | 分割成独立的行 (先统一换行符，并把数字里被误读成 | 的 1 还原)
+        clean = fix_pipe_digits(screen_text.replace('\r\n', '\n')).replace('|', '\n')
+        self.lines = [line.strip() for line in clean.split('\n') if line.strip()]
+        self.truncated = False
+        if max_lines is not None and len(self.lines) > max_lines:
+            self.lines = self.lines[:max_lines]
+            self.truncated = True
+        if max_line_length is not None and any(len(line) > max_line_length for line in self.lines):
+            self.lines = [line[:max_line_length] for line in self.lines]
+            self.truncated = True
+        # 截断后整段文本也只由保留下来的行组成
+        self._screen_text = '\n'.join(self.lines) if self.truncated else screen_text
+        self._full_text: Optional[str] = None
+        self._text_hash: Optional[int] = None
+        self._records: Optional[AffixRecordIndex] = None
+        # 关键词级别的判定结果缓存，多条规则共用同一个关键词时只计算一次
+        # key: (关键词, min_value, max_value)，纯文本关键词的 min/max 为 None
+        self.keyword_hits: Dict[tuple, bool] = {}
+        # 文本 -> q-gram 倒排索引 (整段文本和每一行各建一次)
+        self._qgrams: Dict[str, QGramIndex] = {}
+        # 词缀目录模式: [(记录, 吸附到的规范条目或 None)]
+        self.canonical: Optional[List[tuple]] = None
+
+    @property
+    def full_text(self) -> str:
+        """整段标准化文本 (命中结果缓存时不需要计算)"""
+        if self._full_text is None:
+            self._full_text = self._normalize(self._screen_text)
+        return self._full_text
+
+    @property
+    def text_hash(self) -> int:
+        """帧文本的哈希 (按行、合并空白后)，作为结果缓存的 key"""
+        if self._text_hash is None:
+            self._text_hash = hash('\n'.join(' '.join(line.split()) for line in self.lines))
+        return self._text_hash
+
+    @property
+    def records(self) -> AffixRecordIndex:
+        """词缀记录索引 (只有规则里有数值条件时才会被构建)"""
+        if self._records is None:
+            self._records = AffixRecordIndex(self.lines, self._normalize)
+        return self._records
+
+    def qgrams(self, text: str) -> QGramIndex:
+        """取 (或建立) 本帧某段文本的 q-gram 索引"""
+        index = self._qgrams.get(text)
+        if index is None:
+            index = QGramIndex(text)
+            self._qgrams[text] = index
+        return index
+
+
 class AffixMatcher:
     """
     处理词缀匹配逻辑。
@@ -11,23 +92,89 @@ class AffixMatcher:
     # 默认相似度阈值 (0.0 - 1.0)，建议 0.7 左右
     DEFAULT_THRESHOLD = 0.7
 
+    # 最坏情况保护: 一帧最多处理的行数、单行最大长度 (正常浮窗约 10-20 行，每行 30 字以内)
+    MAX_FRAME_LINES = 40
+    MAX_LINE_LENGTH = 80
+    # 单次 check 的时间预算 (秒)，超时后剩余关键词只做精确包含判断，结果不写入缓存。
+    # 退化时模糊关键词按 "没有出现" 处理，NOT 组可能因此误放行，所以退化帧判定为满足时会不限时重新判定一次
+    CHECK_TIME_BUDGET = 0.05
+
+    def __init__(self, memo_size: int = 512):
+        """
+        :param memo_size: 匹配结果缓存的容量 (帧数)，0 表示关闭缓存
+        """
+        self.memo = MatchMemo(memo_size)
+        self._compiled: "OrderedDict[str, CompiledRule]" = OrderedDict()  # 指纹 -> 编译结果
+        self._rule_fingerprints = {}  # rule_id -> 最近一次编译时的指纹，用于规则修改后清理缓存
+        # 最近一次 check 的判定说明 (每组的命中数量与结论) 以及是否来自缓存
+        self.last_explain = None
+        self.last_from_memo = False
+        # 可选的已知词缀目录，设置后每行先吸附到规范条目再做关键词判定
+        self.catalog: Optional[AffixCatalog] = None
+        # 可选的形近字加权编辑距离 (设置后代替 SequenceMatcher 做模糊包含判断)
+        self.confusions: Optional[ConfusionTable] = None
+        self._weighted_needles: Dict[str, WeightedNeedle] = {}
+        # 可选的校准阈值表 (按关键词 / 长度分桶，见 calibrate_thresholds.py)，未设置时统一使用 DEFAULT_THRESHOLD
+        self.thresholds: Optional[ThresholdTable] = None
+        # 追踪模式 (默认关闭): 打开后 last_trace 记录每条规则、每个组、每个关键词的结论、命中行、得分/数值与耗时
+        self.trace_enabled = False
+        self.last_trace: Optional[List[Dict]] = None
+        # 时间预算 (None 表示不限制) 与超时统计
+        self.time_budget: Optional[float] = self.CHECK_TIME_BUDGET
+        self.degraded_checks = 0
+        self.last_degraded = False
+        self._deadline: Optional[float] = None
+        self._budget_exceeded = False
+
+    def set_catalog(self, catalog: Optional[AffixCatalog]):
+        """启用 / 关闭词缀目录吸附 (判定口径变化，清空结果缓存)"""
+        self.catalog = catalog
+        self.memo.invalidate()
+
+    def set_confusions(self, table: Optional[ConfusionTable]):
+        """
+        启用 / 关闭形近字加权编辑距离 (判定口径变化，清空结果缓存)。
+        需要在 set_catalog 之前调用，目录里按关键词缓存的结果依赖这里的判定方式。
+        """
+        self.confusions = table
+        self._weighted_needles = {}
+        self.memo.invalidate()
+
+    def set_thresholds(self, table: Optional[ThresholdTable]):
+        """
+        启用 / 关闭校准阈值 (判定口径变化，清空结果缓存)。
+        与 set_confusions 一样需要在 set_catalog 之前调用。
+        """
+        self.thresholds = table
+        self.memo.invalidate()
+
+    def threshold_for(self, needle: str) -> float:
+        """关键词 (已标准化) 使用的模糊匹配阈值"""
+        if self.thresholds is None:
+            return self.DEFAULT_THRESHOLD
+        return self.thresholds.threshold_for(needle)
+
     @staticmethod
     def normalize_text(text: str) -> str:
-        """简单的文本标准化，去除标点和多余空格，转小写"""
-        text = text.lower()
-        # 将特殊字符替换为空格，而不是直接删除，防止 "法术伤害+10%" 变成 "法术伤害10" 导致的粘连
-        text = re.sub(r'[^\w\s]', ' ', text)
-        # 合并多余空格
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        """
+        文本标准化，去除标点和多余空格，转小写。
+        同时折叠全角字符、替换 OCR 形近字、去掉汉字之间的空格，
+        让 OCR 文本和关键词尽量能直接走精确包含的快速路径 (见 text_normalize)。
+        """
+        return normalize_ocr_text(text)
 
-    def _fuzzy_contains(self, haystack: str, needle: str, threshold: float = None) -> bool:
+    def _fuzzy_contains(self, haystack: str, needle: str, threshold: float = None,
+                        index: Optional[QGramIndex] = None) -> bool:
         """
         检查 haystack (长文本) 中是否模糊包含 needle (关键词)。
         使用滑动窗口 + SequenceMatcher。
+        窗口先经过 q-gram 计数过滤 (见 qgram.QGramIndex)，只有可能达到阈值的窗口才计算相似度。
+
+        :param threshold: 不传时按关键词取校准阈值 (见 threshold_for)
+        :param index: haystack 的 q-gram 索引 (同一帧内复用)，不传则临时建立
         """
         if threshold is None:
-            threshold = self.DEFAULT_THRESHOLD
+            threshold = self.threshold_for(needle)
 
         if not needle:
             return True
@@ -41,6 +188,15 @@ class AffixMatcher:
         n_len = len(needle)
         h_len = len(haystack)
         
+        # 超过时间预算: 只保留上面的精确包含判断
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            self._budget_exceeded = True
+            return False
+
+        # 形近字加权编辑距离模式
+        if self.confusions is not None:
+            return self._weighted_needle(needle).contains(haystack, threshold)
+
         # 如果关键词比文本还长，直接算两个字符串的相似度
         if n_len > h_len:
              return difflib.SequenceMatcher(None, haystack, needle).ratio() >= threshold
@@ -52,255 +208,416 @@ class AffixMatcher:
         # 优化: 只在特定步长滑动，减少计算量
         step = 1 if n_len < 10 else 2
         
-        for w_len in window_sizes:
-            if w_len <= 0: continue
-            for i in range(0, h_len - w_len + 1, step):
-                # 截取窗口
-                sub_str = haystack[i : i + w_len]
-                # 计算相似度
-                ratio = difflib.SequenceMatcher(None, sub_str, needle).ratio()
-                if ratio >= threshold:
-                    return True
+        if index is None or index.text != haystack:
+            index = QGramIndex(haystack)
+
+        deadline = self._deadline
+        for i, w_len in index.candidate_windows(needle, threshold, window_sizes, step):
+            if deadline is not None and time.perf_counter() > deadline:
+                self._budget_exceeded = True
+                return False
+            # 截取窗口
+            sub_str = haystack[i : i + w_len]
+            # 计算相似度
+            ratio = difflib.SequenceMatcher(None, sub_str, needle).ratio()
+            if ratio >= threshold:
+                return True
                     
         return False
 
+    def mentions_any(self, line: str, keywords: List[str]) -> bool:
+        """一行 OCR 文本是否 (模糊) 包含任一关键词 (keywords 需已标准化)"""
+        text = self.normalize_text(line)
+        return any(self._fuzzy_contains(text, kw) for kw in keywords)
+
+    def _weighted_needle(self, needle: str) -> WeightedNeedle:
+        weighted = self._weighted_needles.get(needle)
+        if weighted is None:
+            weighted = WeightedNeedle(needle, self.confusions)
+            self._weighted_needles[needle] = weighted
+        return weighted
+
+    def similarity(self, haystack: str, needle: str) -> float:
+        """
+        haystack 中与 needle 最接近的子串的相似度，与 _fuzzy_contains 同口径 (包含加权模式)。
+        不做任何过滤，较慢，只用于追踪和阈值校准。
+        """
+        if not needle or needle in haystack:
+            return 1.0
+        if not haystack:
+            return 0.0
+        n_len = len(needle)
+        if self.confusions is not None:
+            return max(0.0, 1.0 - self._weighted_needle(needle).best_distance(haystack) / n_len)
+        if n_len > len(haystack):
+            return difflib.SequenceMatcher(None, haystack, needle).ratio()
+        step = 1 if n_len < 10 else 2
+        best = 0.0
+        for w_len in (n_len, n_len + 1, n_len - 1):
+            for i in range(0, len(haystack) - w_len + 1, step):
+                best = max(best, difflib.SequenceMatcher(None, haystack[i:i + w_len], needle).ratio())
+        return best
+
     def _extract_number_after(self, text: str, keyword: str) -> Union[float, None]:
         """
-        在 text 中找到 keyword 后，提取紧随其后的数值。
-        支持整数和小数，支持 % 号（虽然通常只提取数字部分）。
-        
-        [重要修复] 这里不仅要向后找，如果向后找的紧邻内容是换行符或无关内容，
-        而数字其实是在关键词的前面（例如 "+75% 法术伤害"），
-        那么需要尝试向前提取数字。
-        
-        [最新修复] OCR 有时会有竖线 | 作为边缘噪点或其他分割符，
-        如果提取到的数字跨越了 | 那肯定是错的。
+        在 text 中找到 keyword 后，提取紧随其后的数值 (兼容旧接口)。
+        具体策略见 affix_record.extract_number_near。
         """
-        if not text or not keyword:
-            return None
+        return extract_number_near(text, keyword)
 
-        # 1. 找到关键词位置
-        idx = text.find(keyword)
-        if idx == -1:
-            return None
-        
-        kw_len = len(keyword)
-        
-        # --- 策略 A: 尝试向后提取 (适用于 "力量 +50" 这种格式) ---
-        # 截取关键词后面的一小段，比如 20 个字符
-        start_search = idx + kw_len
-        # 先找到第一个换行符或者 | 符号，作为硬性边界
-        stop_chars = ['\n', '|']
-        snippet_end = start_search + 20
-        
-        for char in stop_chars:
-            stop_idx = text.find(char, start_search)
-            if stop_idx != -1 and stop_idx < snippet_end:
-                snippet_end = stop_idx
-                
-        snippet_after = text[start_search : snippet_end]
-        
-        # 简单的正则: 允许少量空格或冒号或加号，紧接着数字
-        regex_after = r'^[:\+\s=\-]*(\d+\.?\d*)' 
-        match_after = re.search(regex_after, snippet_after)
-        
-        val_after = None
-        if match_after:
-            try:
-                val_str = match_after.group(1)
-                # 再次校验：如果匹配到的数字后面紧跟着就是 | (虽然 snippet 截断了，但为了保险)
-                # 其实不用，因为 snippet 已经截断了
-                if val_str: 
-                     val_after = float(val_str)
-            except: pass
-
-        if val_after is not None:
-            return val_after
-
-        # --- 策略 B: 尝试向前提取 (适用于 "+75% 法术伤害" 这种格式) ---
-        # 截取关键词前面的一小段
-        end_search = idx
-        start_search = max(0, idx - 20)
-        
-        # 同样需要截断，如果前面有换行符或 |
-        # 我们要找的是离 end_search 最近的的那个阻断符
-        # 因为是从左往右找，所以要找 snippet 里的 *最后一个* 阻断符
-        snippet_before_raw = text[start_search : end_search]
-        
-        last_stop_idx = -1
-        for char in stop_chars:
-            # 在片段里找最后一次出现的位置
-            p = snippet_before_raw.rfind(char)
-            if p > last_stop_idx:
-                last_stop_idx = p
-                
-        if last_stop_idx != -1:
-            # 只保留阻断符之后的内容
-            snippet_before = snippet_before_raw[last_stop_idx+1:]
+    def compile(self, conditions: Union[str, List, Dict, CompiledRule], rule_id=None) -> CompiledRule:
+        """
+        预编译规则。同一 rule_id 的内容发生变化时，旧规则的缓存结果会被清除。
+        :param rule_id: 规则在数据库中的 ID (可选)
+        """
+        if isinstance(conditions, CompiledRule):
+            rule = conditions
         else:
-            snippet_before = snippet_before_raw
-            
-        # 正则: 找结尾处的数字
-        regex_before = r'(\d+\.?\d*)[%\s\+\-]*$'
-        match_before = re.search(regex_before, snippet_before)
-        
-        if match_before:
-            try:
-                val_str = match_before.group(1)
-                return float(val_str)
-            except: pass
-            
-        # --- 策略 C: 尝试行首提取 (适用于 "97 冰冻系法术伤害" 但关键词只是 "系法术伤害" 这种情况) ---
-        # 如果前两种都没找到，且这一整行本来就是为了这个属性服务的，
-        # 那么数值很有可能就在行的最开头（绝大多数暗黑装备属性都是这样：数值 + 描述）
-        
-        # 必须确保我们是在处理单行文本（通过判断 text 是否包含换行符来简单猜测，或者直接试）
-        # 用于 lines 模式下的 line_norm
-        regex_head = r'^[:\+\s=\-]*(\d+\.?\d*)'
-        match_head = re.search(regex_head, text)
-        
-        if match_head:
-            try:
-                val_str = match_head.group(1)
-                return float(val_str)
-            except: pass
-            
-        return None
+            fp = rule_fingerprint(conditions)
+            rule = self._compiled.get(fp)
+            # 不带 rule_id 的查找直接复用已编译的规则 (保留其上的选择性统计)
+            if rule is None or (rule_id is not None and rule.rule_id != rule_id):
+                rule = CompiledRule(conditions, self.normalize_text, rule_id)
+                self._compiled[fp] = rule
+                while len(self._compiled) > 64:
+                    self._compiled.popitem(last=False)
+
+        if rule.rule_id is not None:
+            old_fp = self._rule_fingerprints.get(rule.rule_id)
+            if old_fp is not None and old_fp != rule.fingerprint:
+                self.memo.invalidate(old_fp)
+            self._rule_fingerprints[rule.rule_id] = rule.fingerprint
+        return rule
 
-    def check(self, screen_text: str, conditions: Union[str, List, Dict]) -> bool:
+    def check(self, screen_text: str, conditions: Union[str, List, Dict, CompiledRule]) -> bool:
         """
         检查屏幕文本是否满足条件。
         
         :param screen_text: OCR 识别出的整段文本
-        :param conditions: 匹配条件
+        :param conditions: 匹配条件 (或 compile() 得到的 CompiledRule)
         """
         # --- [重大架构升级] 基于行的分割策略 ---
         # 既然 OCR 返回的文本混杂在一起容易串行，我们先按换行符和竖线强制分割成独立的小段。
         # 每一个小段作为一个独立的检测单元 (line_segment)。
         # 只有当某个小段里同时包含关键词和符合要求的数值时，才算匹配成功。
-        
-        # 1. 预处理：按 \n 或 | 分割
-        # 先统一换行符
-        screen_text_clean = screen_text.replace('\r\n', '\n').replace('|', '\n')
-        lines = [line.strip() for line in screen_text_clean.split('\n') if line.strip()]
-        
-        # 2. 为了兼容旧逻辑（如果用户只给了一个大字符串查模糊匹配），
-        # 我们同时也保留一份整段的 normalized 文本。
-        # 但对于数值检查，我们必须强制使用 lines 逻辑。
-        full_normalized_text = self.normalize_text(screen_text)
+        # 同时保留一份整段的 normalized 文本，兼容不涉及数值的模糊匹配。
+        rule = self.compile(conditions)
+        self.last_trace = [] if self.trace_enabled else None
+        frame = self._new_frame(screen_text)
+        matched = self._check_rule(frame, rule)
+        if matched and frame.degraded:
+            # 会导致停止洗炼的结论不能来自退化的判定
+            self.last_trace = [] if self.trace_enabled else None
+            matched = self._check_rule(self._new_frame(screen_text, budget=False), rule)
+        return matched
+
+    def check_any(self, screen_text: str, rules: Dict[str, Union[str, List, Dict, CompiledRule]]) -> List[str]:
+        """
+        多目标模式: 一次检查多条规则，返回所有满足条件的规则名 (保持传入顺序)。
+        所有规则共享同一帧的预处理结果和关键词判定缓存，
+        每个不同的关键词在一帧内只会被匹配一次，开销随关键词数增长，而不是随规则数增长。
+
+        :param rules: {规则名: 匹配条件}
+        """
+        frame = self._new_frame(screen_text)
+        self.last_trace = [] if self.trace_enabled else None
+        names = [name for name, conditions in rules.items() if self._check_rule(frame, self.compile(conditions), name)]
+        if names and frame.degraded:
+            # 同 check(): 有规则在退化帧上被判定为满足时，不限时重新判定一遍
+            frame = self._new_frame(screen_text, budget=False)
+            self.last_trace = [] if self.trace_enabled else None
+            names = [name for name, conditions in rules.items() if self._check_rule(frame, self.compile(conditions), name)]
+        return names
+
+    def _new_frame(self, screen_text: str, budget: bool = True) -> _FrameContext:
+        """按长度上限和时间预算建立帧上下文 (同一帧内的所有规则共享一个截止时间；budget=False 时不限时)"""
+        deadline = time.perf_counter() + self.time_budget if self.time_budget and budget else None
+        return _FrameContext(screen_text, self.normalize_text, self.MAX_FRAME_LINES,
+                             self.MAX_LINE_LENGTH, deadline)
+
+    def _check_rule(self, frame: _FrameContext, rule: CompiledRule, name: Optional[str] = None) -> bool:
+        """带结果缓存的规则判定"""
+        trace = None
+        if self.last_trace is not None:
+            trace = {'rule': name if name is not None else (rule.rule_id if rule.rule_id is not None else rule.fingerprint[:8]),
+                     'groups': []}
+            self.last_trace.append(trace)
+            rule_start = time.perf_counter_ns()
+
+        cached = self.memo.get(frame.text_hash, rule.fingerprint)
+        if cached is not None:
+            matched, self.last_explain = cached
+            self.last_from_memo = True
+            # 缓存命中不做任何匹配，不能沿用上一帧的超时退化标记
+            self.last_degraded = frame.degraded
+            if trace is not None:
+                trace.update(passed=matched, from_memo=True, degraded=False,
+                             us=(time.perf_counter_ns() - rule_start) // 1000)
+            return matched
+
+        explain = []
+        self._deadline = frame.deadline
+        self._budget_exceeded = False
+        try:
+            if rule.groups is not None:
+                matched = self._check_complex_groups_v2(frame, rule, explain, trace)
+                rule.record_check()
+            else:
+                matched = bool(self._check_frame(frame, rule.conditions))
+                explain.append({'type': 'RULE', 'passed': matched})
+        finally:
+            self._deadline = None
+
+        if trace is not None:
+            trace.update(passed=matched, from_memo=False, degraded=self._budget_exceeded or frame.degraded,
+                         us=(time.perf_counter_ns() - rule_start) // 1000)
+
+        if self._budget_exceeded and not frame.degraded:
+            frame.degraded = True
+            self.degraded_checks += 1
+        self.last_degraded = frame.degraded
+        self.last_explain = explain
+        self.last_from_memo = False
+        if frame.degraded:
+            # 退化结果可能漏判，不写入缓存，下次遇到同样的文本重新完整判定
+            explain.append({'type': 'DEGRADED', 'passed': matched})
+        else:
+            self.memo.put(frame.text_hash, rule.fingerprint, matched, explain)
+        return matched
+
+    def _check_frame(self, frame: _FrameContext, conditions: Union[str, List, Dict]) -> bool:
+        """在已经预处理好的帧上检查条件"""
+        full_normalized_text = frame.full_text
 
         # 1. 复杂规则组 (List of Dicts with 'idx', 'type' etc.)
         if isinstance(conditions, list) and len(conditions) > 0 and isinstance(conditions[0], dict) and 'type' in conditions[0]:
-            return self._check_complex_groups_v2(lines, full_normalized_text, conditions)
+            return self._check_complex_groups_v2(frame, self.compile(conditions))
 
         if isinstance(conditions, str):
             # 检查是否包含逻辑运算符
             if '&&' in conditions or '||' in conditions or ('(' in conditions and ')' in conditions):
-                return self._check_expression(full_normalized_text, conditions)
+                return self._check_expression(full_normalized_text, conditions, frame)
             
             # 简单单词匹配 (如果不涉及数值，还是查全文最稳，防止 OCR 意外断行把一个词切断)
             keyword = self.normalize_text(conditions)
-            return self._fuzzy_contains(full_normalized_text, keyword)
+            return self._keyword_hit(frame, keyword)
 
         elif isinstance(conditions, list):
-            return all(self.check(screen_text, cond) for cond in conditions)
+            return all(self._check_frame(frame, cond) for cond in conditions)
 
         return False
 
-    def _check_complex_groups_v2(self, lines: List[str], full_text_norm: str, groups: List[Dict]) -> bool:
+    def _check_complex_groups_v2(self, frame: _FrameContext, rule: CompiledRule, explain: Optional[List] = None,
+                                 trace: Optional[Dict] = None) -> bool:
         """
         [新版] 复杂规则检查，基于行 (lines) 来做数值提取的上下文隔离。
+        数值条件通过本帧的词缀记录索引查找，每一行只解析一次。
+
+        组和词缀按 rule.group_order / rule.affix_order 的顺序求值，
+        组内一旦结论确定就停止 (AND 遇到未命中、NOT 遇到命中、COUNT 已超上限或已不可能/必定达标)，
+        同时把每个组和词缀的通过率与耗时记录到 rule 上，供重新排序使用。
+
+        :param rule: 编译后的规则 (rule.groups 中关键词已标准化)
+        :param explain: 如果提供，按组追加判定说明 {'group', 'type', 'matched', 'total', 'passed'}
+        :param trace: 追踪模式下的规则追踪记录，按组追加耗时与每个关键词的命中详情
         """
-        for group in groups:
-            g_type = group.get('type', 'AND')
-            affixes = group.get('affixes', [])
+        groups = rule.groups
+        for gi in rule.group_order:
+            group = groups[gi]
+            g_type = group['type']
+            affixes = group['affixes']
+            min_v, max_v = group['min'], group['max']
+            total = len(affixes)
+            affix_stats = rule.affix_stats[gi]
+            group_start = time.perf_counter_ns()
             
             # 计算当前组里有多少个词缀匹配上了
             matched_count = 0
-            
-            for affix_item in affixes:
-                affix_text = ""
-                min_val = None
-                max_val = None
-                
-                if isinstance(affix_item, dict):
-                    affix_text = affix_item.get('name', '')
-                    min_val = affix_item.get('min_value') 
-                    max_val = affix_item.get('max_value')
-                elif isinstance(affix_item, str):
-                    affix_text = affix_item
-                
-                if not affix_text.strip(): continue
-                
-                kw_normalized = self.normalize_text(affix_text.strip())
-                affix_match_found = False
-                
-                # --- 分支 1: 如果是复杂逻辑表达式 (&& ||) ---
-                if '&&' in affix_text or '||' in affix_text:
-                     # 表达式无法简单对应到单行，只能查全文
-                     if self._check_expression(full_text_norm, affix_text):
-                         affix_match_found = True
-
-                # --- 分支 2: 需要数值检查 ---
-                elif min_val is not None or max_val is not None:
-                    # [关键改变] 必须在【同一行】里既找到关键词，又找到数值
-                    # 遍历每一行寻找匹配
-                    for line in lines:
-                        # 1. 先看这行有没有关键词 (模糊匹配)
-                        line_norm = self.normalize_text(line)
-                        kw_normalized = self.normalize_text(affix_text.strip())
-                        
-                        if self._fuzzy_contains(line_norm, kw_normalized):
-                            val = self._extract_number_after(line_norm, kw_normalized)
-                            if val is not None:
-                                is_min_ok = True
-                                is_max_ok = True
-                                if min_val is not None and val < float(min_val): is_min_ok = False
-                                if max_val is not None and val > float(max_val): is_max_ok = False
-                                
-                                if is_min_ok and is_max_ok:
-                                    affix_match_found = True
-                                    break
-
-                # --- 分支 3: 纯文本检查 (不需要数值) ---
-                else:
-                    kw_normalized = self.normalize_text(affix_text.strip())
-                    if self._fuzzy_contains(full_text_norm, kw_normalized):
-                         affix_match_found = True
-                
-                if affix_match_found:
+            evaluated = 0
+            passed = True
+            affix_traces = [] if trace is not None else None
+            trace_ns = 0  # 追踪本身的耗时，不计入组耗时
+            for ai in rule.affix_order[gi]:
+                t0 = time.perf_counter_ns()
+                hit = self._affix_hit(frame, affixes[ai])
+                cost = time.perf_counter_ns() - t0
+                stat = affix_stats[ai]
+                stat[0] += 1
+                stat[2] += cost
+                evaluated += 1
+                if affix_traces is not None:
+                    t1 = time.perf_counter_ns()
+                    affix_traces.append(self._trace_affix(frame, affixes[ai], hit, cost))
+                    trace_ns += time.perf_counter_ns() - t1
+                if hit:
+                    stat[1] += 1
                     matched_count += 1
-            
-            # (后半部分逻辑不变: 判断 group 是否满足)
-            if g_type == 'AND':
-                total_valid = 0
-                for a in affixes:
-                    if isinstance(a, str):
-                         if a.strip(): total_valid += 1
-                    elif isinstance(a, dict):
-                         if a.get('name', '').strip(): total_valid += 1
-                if matched_count < total_valid: return False
-                    
-            elif g_type == 'NOT':
-                if matched_count > 0: return False
-                    
-            elif g_type == 'COUNT':
-                min_v = group.get('min')
-                max_v = group.get('max')
-                if min_v is not None and matched_count < int(min_v): return False
-                if max_v is not None and matched_count > int(max_v): return False
+
+                # 组内提前结束: 剩下的词缀已经不可能改变本组结论
+                remaining = total - evaluated
+                if g_type == 'AND':
+                    if not hit:
+                        passed = False
+                        break
+                elif g_type == 'NOT':
+                    if hit:
+                        passed = False
+                        break
+                elif g_type == 'COUNT':
+                    if max_v is not None and matched_count > max_v:
+                        passed = False
+                        break
+                    if min_v is not None and matched_count + remaining < min_v:
+                        passed = False
+                        break
+                    if (min_v is None or matched_count >= min_v) and (max_v is None or matched_count + remaining <= max_v):
+                        break
+            else:
+                # 全部词缀都判定完 (或组为空) 时按数量给出结论
+                if g_type == 'COUNT':
+                    if min_v is not None and matched_count < min_v: passed = False
+                    if max_v is not None and matched_count > max_v: passed = False
+
+            g_stat = rule.group_stats[gi]
+            g_cost = time.perf_counter_ns() - group_start - trace_ns
+            g_stat[0] += 1
+            g_stat[2] += g_cost
+            if passed:
+                g_stat[1] += 1
+            if trace is not None:
+                trace['groups'].append({'group': gi, 'type': g_type, 'passed': passed, 'matched': matched_count,
+                                        'total': total, 'us': g_cost // 1000, 'affixes': affix_traces})
+
+            if explain is not None:
+                explain.append({'group': gi, 'type': g_type, 'matched': matched_count,
+                                'total': total, 'passed': passed})
+            if not passed:
+                return False
                     
         return True
 
+    def _affix_hit(self, frame: _FrameContext, affix: Dict) -> bool:
+        """
+        判断单个 (已编译的) 词缀条件在本帧是否命中。结果按 (关键词, min, max) 缓存在帧上，
+        同一帧里重复出现的词缀 (无论来自同一规则还是多目标的其它规则) 只计算一次。
+        """
+        kind = affix['kind']
+
+        # --- 分支 1: 如果是复杂逻辑表达式 (&& ||) ---
+        if kind == 'expr':
+            key = (affix['text'], None, None)
+            hit = frame.keyword_hits.get(key)
+            if hit is None:
+                # 表达式无法简单对应到单行，只能查全文
+                hit = bool(self._check_expression(frame.full_text, affix['text'], frame))
+                frame.keyword_hits[key] = hit
+            return hit
+
+        kw_normalized = affix['kw']
+
+        # --- 分支 3: 纯文本检查 (不需要数值) ---
+        if kind == 'text':
+            return self._keyword_hit(frame, kw_normalized)
+
+        # --- 分支 2: 需要数值检查 ---
+        min_val, max_val = affix['min'], affix['max']
+        key = (kw_normalized, min_val, max_val)
+        hit = frame.keyword_hits.get(key)
+        if hit is not None:
+            return hit
+
+        hit = False
+        # [关键改变] 必须在【同一行】里既找到关键词，又找到数值
+        # 先按词缀名哈希查找，查不到再退回按行模糊匹配 (结果按帧缓存)
+        if self.catalog is not None:
+            candidates = self._catalog_candidates(frame, kw_normalized)
+        else:
+            contains = lambda text, kw: self._fuzzy_contains(text, kw, index=frame.qgrams(text))
+            candidates = frame.records.iter_candidates(kw_normalized, contains)
+        for record in candidates:
+            val = record.value_for(kw_normalized)
+            if val is None:
+                continue
+            if min_val is not None and val < min_val: continue
+            if max_val is not None and val > max_val: continue
+            hit = True
+            break
+
+        frame.keyword_hits[key] = hit
+        return hit
+
+    def _keyword_hit(self, frame: _FrameContext, keyword: str) -> bool:
+        """
+        纯文本关键词在整段文本中的模糊包含判断 (按帧缓存)。
+        目录模式下先按行查规范条目，没有命中时仍然查整段文本 (OCR 把一个词缀断成两行时只有整段能匹配上)。
+        """
+        key = (keyword, None, None)
+        hit = frame.keyword_hits.get(key)
+        if hit is None and self.catalog is not None and self._catalog_candidates(frame, keyword):
+            hit = True
+            frame.keyword_hits[key] = hit
+        if hit is None:
+            full_text = frame.full_text
+            hit = self._fuzzy_contains(full_text, keyword, index=frame.qgrams(full_text))
+            frame.keyword_hits[key] = hit
+        return hit
+
+    def _trace_affix(self, frame: _FrameContext, affix: Dict, hit: bool, cost_ns: int) -> Dict:
+        """
+        追踪模式下补充单个词缀的命中详情: 最接近的行号、相似度得分、提取到的数值。
+        只在追踪时调用，允许做额外的计算 (不影响判定结果)。
+        """
+        entry = {'kw': affix['text'], 'hit': hit, 'us': cost_ns // 1000}
+        if affix['kind'] == 'expr' or not frame.records.records:
+            return entry
+
+        kw = affix['kw']
+        best = None  # (得分, 记录)
+        for rec in frame.records.records:
+            score = self.similarity(rec.text, kw)
+            if best is None or score > best[0]:
+                best = (score, rec)
+                if score >= 1.0:
+                    break
+        score, rec = best
+        entry.update(line=rec.line_no, score=round(score, 2), text=rec.text)
+        if affix['kind'] == 'value':
+            entry['value'] = rec.value_for(kw)
+            entry['range'] = (affix['min'], affix['max'])
+        return entry
+
+    def _catalog_candidates(self, frame: _FrameContext, keyword: str) -> List[AffixRecord]:
+        """
+        词缀目录模式下可能对应 keyword 的行：
+        已吸附的行只做集合查询 (规范条目是否包含该关键词)，吸附失败的行才退回逐行模糊匹配。
+        """
+        if frame.canonical is None:
+            frame.canonical = [(rec, self.catalog.snap(rec.name)) for rec in frame.records.records]
+        # 关键词 -> 条目集合会被目录永久缓存，必须完整计算: 不受本帧时间预算限制 (每个关键词只算一次)
+        deadline, self._deadline = self._deadline, None
+        try:
+            entries = self.catalog.entries_for(keyword, self._fuzzy_contains)
+        finally:
+            self._deadline = deadline
+        found = []
+        for rec, entry in frame.canonical:
+            if entry is not None:
+                if entry in entries:
+                    found.append(rec)
+            elif self._fuzzy_contains(rec.text, keyword, index=frame.qgrams(rec.text)):
+                found.append(rec)
+        return found
+
     def _check_complex_groups(self, raw_text: str, groups: List[Dict]) -> bool:
          # 保留这个空壳方法或者直接删除，现在 logic 转移到了 _check_complex_groups_v2
          return False
 
-    def _check_expression(self, raw_text: str, expression: str) -> bool:
+    def _check_expression(self, raw_text: str, expression: str, frame: Optional[_FrameContext] = None) -> bool:
         """
         解析并执行复杂逻辑表达式
         例如: "冰霜抗性 && (攻速 || 暴击)"
         支持 ! 符号表示非，例如 "!冰冻"
+        :param frame: 如果提供，表达式里的关键词判定会复用该帧的缓存 (此时 raw_text 应为 frame.full_text)
         """
         # 1. 预处理表达式：将 && || ! 转换为 python 的 and or not
         # 同时为了避免 eval 安全问题和变量名问题，我们采用“提取-替换-计算”的策略
@@ -319,7 +636,10 @@ class AffixMatcher:
         for kw in keywords:
             # 归一化关键词进行比对
             normalized_kw = self.normalize_text(kw)
-            is_exist = self._fuzzy_contains(raw_text, normalized_kw)
+            if frame is not None:
+                is_exist = self._keyword_hit(frame, normalized_kw)
+            else:
+                is_exist = self._fuzzy_contains(raw_text, normalized_kw)
             context[kw] = is_exist
 
         # 4. 执行求值
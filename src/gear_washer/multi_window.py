@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .jobs import MATCHED, format_results
+from .ocr_pool import OcrPool
+from . import win32_utils
+
+
+class MultiWindowController:
+    """
+    同时驱动多个游戏窗口: 每个窗口 (hwnd) 一个后台模式的 GearWasher，在各自的线程里执行同一份任务队列，
+    所有洗炼器共享一个 OCR 并发池 (见 ocr_pool.OcrPool)。
+
+    每个窗口的悬停 / 按键 / 截图都发给各自的 hwnd，互不影响；
+    OCR 是主要的 CPU 开销，由并发池限制总进程数并在窗口之间轮流分配，CPU 跑满之前总速度随窗口数增加。
+    """
+
+    def __init__(self, ocr_workers: Optional[int] = None, interleave: bool = False):
+        """
+        :param interleave: 每个窗口用交替洗炼执行任务 (见 GearWasher.run_interleaved)
+        """
+        self.pool = OcrPool(ocr_workers)
+        self.interleave = interleave
+        self.entries = []   # [(名称, 洗炼器, 任务列表)]
+        self.results: Dict[str, List[Dict]] = {}
+        self._threads: List[threading.Thread] = []
+        self._started = None
+        self.elapsed = 0.0
+
+    def add(self, name: str, washer, jobs):
+        """
+        添加一个窗口。washer.hwnd 必须已经设置；这里把它切换成后台模式并接入 OCR 并发池。
+        """
+        washer.background_mode = True
+        washer.register_stop_hotkey = False  # 停止由控制器统一转发
+        washer.show_message_box = False
+        washer.log_prefix = f"[{name}] "
+        if washer.session_path:
+            # 每个窗口录制到各自的存档
+            root, ext = os.path.splitext(washer.session_path)
+            washer.session_path = f"{root}_{name}{ext}"
+        washer.screen.ocr_slot = self.pool.slot(name)
+        self.entries.append((name, washer, list(jobs)))
+
+    @classmethod
+    def for_windows(cls, title: str, make_washer: Callable[[], object], jobs,
+                    ocr_workers: Optional[int] = None, interleave: bool = False) -> "MultiWindowController":
+        """为所有标题包含 title 的窗口各创建一个洗炼器 (make_washer 返回配置好的 GearWasher)"""
+        controller = cls(ocr_workers, interleave)
+        for idx, win in enumerate(win32_utils.find_all_windows_by_title(title)):
+            washer = make_washer()
+            washer.hwnd = win['hwnd']
+            controller.add(f"窗口{idx + 1}", washer, jobs)
+        return controller
+
+    def _worker(self, name, washer, jobs):
+        try:
+            run = washer.run_interleaved if self.interleave else washer.run_jobs
+            self.results[name] = run(jobs)
+        except Exception as e:
+            print(f"[{name}] 运行时错误: {e}")
+            self.results.setdefault(name, [])
+
+    def start(self):
+        self._started = time.perf_counter()
+        for name, washer, jobs in self.entries:
+            print(f"[{name}] HWND {washer.hwnd}，{len(jobs)} 个任务")
+            thread = threading.Thread(target=self._worker, args=(name, washer, jobs),
+                                      name=f"washer-{name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待所有窗口结束，返回是否全部结束"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.perf_counter()))
+        done = not self.running()
+        if done and self._started is not None:
+            self.elapsed = time.perf_counter() - self._started
+        return done
+
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def stop(self):
+        for _, washer, _ in self.entries:
+            washer.stop()
+
+    def run(self) -> Dict[str, List[Dict]]:
+        """启动并等待全部结束，打印汇总"""
+        if not self.entries:
+            print("错误: 没有可用的窗口")
+            return {}
+        self.start()
+        self.join()
+        print(self.summary())
+        return self.results
+
+    def summary(self) -> str:
+        lines = []
+        total_attempts = 0
+        matched = 0
+        for name, _, jobs in self.entries:
+            results = self.results.get(name, [])
+            total_attempts += sum(r['attempts'] for r in results)
+            matched += sum(r['status'] == MATCHED for r in results)
+            lines.append(f"[{name}]\n{format_results(jobs, results)}")
+        rate = total_attempts / self.elapsed if self.elapsed > 0 else 0.0
+        lines.append(f"=== 多窗口汇总: {len(self.entries)} 个窗口，成功 {matched} 个任务，"
+                     f"共 {total_attempts} 次洗炼，用时 {self.elapsed:.1f}s ({rate:.2f} 次/秒) ===")
+        lines.append(self.pool.stats())
+        return '\n'.join(lines)
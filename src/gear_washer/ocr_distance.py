@@ -0,0 +1,203 @@
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 默认的形近字表文件 (与数据库一样放在当前运行目录下)
+DEFAULT_CONFUSION_PATH = "ocr_confusions.json"
+
+# Tesseract chi_sim 常见的形近误读，替换代价低于普通替换 (1.0)
+DEFAULT_CONFUSIONS = {
+    ('冰', '水'): 0.3, ('冰', '氷'): 0.2, ('系', '糸'): 0.2, ('冻', '冯'): 0.4,
+    ('己', '已'): 0.2, ('已', '巳'): 0.2, ('未', '末'): 0.3, ('人', '入'): 0.3,
+    ('大', '太'): 0.4, ('日', '曰'): 0.2, ('力', '刀'): 0.3, ('土', '士'): 0.3,
+    ('千', '于'): 0.4, ('天', '夭'): 0.3, ('伤', '份'): 0.4, ('技', '枝'): 0.4,
+    ('0', 'o'): 0.2, ('1', 'l'): 0.2, ('1', 'i'): 0.3, ('5', 's'): 0.3,
+    ('8', 'b'): 0.4, ('2', 'z'): 0.4,
+}
+
+
+class ConfusionTable:
+    """
+    字符替换代价表 (对称)。不在表里的两个不同字符代价为 1.0，相同字符为 0。
+    可以从 "人工校对文本 / OCR 文本" 的行对中学习 (见 learn)。
+    """
+
+    # 学习得到的代价下限，防止某个字符对被当成完全等价
+    MIN_COST = 0.1
+
+    def __init__(self, costs: Optional[Dict[Tuple[str, str], float]] = None):
+        self.costs: Dict[Tuple[str, str], float] = {}
+        for (a, b), cost in (costs if costs is not None else DEFAULT_CONFUSIONS).items():
+            self.set(a, b, cost)
+
+    def set(self, a: str, b: str, cost: float):
+        cost = max(self.MIN_COST, min(1.0, float(cost)))
+        self.costs[(a, b)] = cost
+        self.costs[(b, a)] = cost
+
+    def cost(self, a: str, b: str) -> float:
+        if a == b:
+            return 0.0
+        return self.costs.get((a, b), 1.0)
+
+    def confusables(self, ch: str) -> List[str]:
+        """与 ch 存在低代价替换的所有字符"""
+        return [b for (a, b) in self.costs if a == ch]
+
+    # ------------------------------------------------------------------
+    # 学习 / 读写
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _align(truth: str, ocr: str) -> List[Tuple[str, str]]:
+        """普通编辑距离回溯，返回所有替换位置的 (正确字符, 识别字符)"""
+        n, m = len(truth), len(ocr)
+        dp = [[0] * (m + 1) for _ in range(n + 1)]
+        for i in range(n + 1):
+            dp[i][0] = i
+        for j in range(m + 1):
+            dp[0][j] = j
+        for i in range(1, n + 1):
+            for j in range(1, m + 1):
+                dp[i][j] = min(dp[i - 1][j] + 1, dp[i][j - 1] + 1,
+                               dp[i - 1][j - 1] + (truth[i - 1] != ocr[j - 1]))
+        pairs = []
+        i, j = n, m
+        while i > 0 and j > 0:
+            if dp[i][j] == dp[i - 1][j - 1] + (truth[i - 1] != ocr[j - 1]):
+                if truth[i - 1] != ocr[j - 1]:
+                    pairs.append((truth[i - 1], ocr[j - 1]))
+                i, j = i - 1, j - 1
+            elif dp[i][j] == dp[i - 1][j] + 1:
+                i -= 1
+            else:
+                j -= 1
+        return pairs
+
+    @classmethod
+    def learn(cls, line_pairs: Iterable[Tuple[str, str]], min_count: int = 2,
+              base: Optional["ConfusionTable"] = None) -> "ConfusionTable":
+        """
+        从 (正确文本, OCR 文本) 行对中统计替换频率：
+        cost(a, b) = 1 - (a 被读成 b 的次数 / a 出现的总次数)，只收录出现 >= min_count 次的字符对。
+        :param base: 在已有表的基础上更新 (默认从内置表开始)
+        """
+        subs: Counter = Counter()
+        seen: Counter = Counter()
+        for truth, ocr in line_pairs:
+            seen.update(truth)
+            subs.update(cls._align(truth, ocr))
+
+        table = cls(dict(base.costs) if base is not None else None)
+        for (a, b), count in subs.items():
+            if count >= min_count and seen[a]:
+                table.set(a, b, min(table.cost(a, b), 1.0 - count / seen[a]))
+        return table
+
+    @classmethod
+    def load(cls, path: str) -> "ConfusionTable":
+        """JSON 格式: [[字符a, 字符b, 代价], ...]"""
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+        return cls({(a, b): cost for a, b, cost in rows})
+
+    def save(self, path: str):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        rows = sorted([a, b, round(c, 3)] for (a, b), c in self.costs.items() if a < b)
+        with open(path, 'w', encoding='utf-8') as f:
+            # 每组一行，方便手工查看和修改
+            f.write('[\n' + ',\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n]\n')
+
+
+class WeightedNeedle:
+    """
+    针对单个关键词预先计算好的加权编辑距离匹配器。
+
+    - 每个屏幕字符对应的 "替换代价行" 只计算一次并缓存 (字符 -> 每个关键词位置的代价)
+    - 半全局 (Sellers) 动态规划：关键词必须完整对齐，屏幕文本的起止位置任意，
+      一次扫描得到 "屏幕文本中与关键词最接近的子串" 的距离
+    - 扫描前用 "可接受字符" 计数做过滤：关键词里每个没有对上相同或形近字符的位置至少要花 1，
+      窗口里的可接受字符不够时整段直接跳过
+    """
+
+    def __init__(self, needle: str, table: ConfusionTable):
+        self.needle = needle
+        self.table = table
+        self._rows: Dict[str, Tuple[float, ...]] = {}
+        self.acceptable = set(needle)
+        for ch in needle:
+            self.acceptable.update(table.confusables(ch))
+
+    def _row(self, ch: str) -> Tuple[float, ...]:
+        row = self._rows.get(ch)
+        if row is None:
+            row = tuple(self.table.cost(n_ch, ch) for n_ch in self.needle)
+            self._rows[ch] = row
+        return row
+
+    def _candidate_spans(self, haystack: str, max_dist: float) -> List[Tuple[int, int]]:
+        """可能包含足够接近子串的区间 (已合并)，没有则返回空列表"""
+        n_len = len(self.needle)
+        need = n_len - max_dist
+        width = n_len + int(max_dist)
+        marks = [1 if ch in self.acceptable else 0 for ch in haystack]
+        if sum(marks) < need:
+            return []
+
+        spans = []
+        window = sum(marks[:width])
+        for start in range(0, max(1, len(haystack) - width + 1)):
+            if start > 0:
+                window += (marks[start + width - 1] if start + width - 1 < len(haystack) else 0) - marks[start - 1]
+            if window >= need:
+                end = min(len(haystack), start + width)
+                if spans and start <= spans[-1][1]:
+                    spans[-1] = (spans[-1][0], end)
+                else:
+                    spans.append((start, end))
+        return spans
+
+    def distance(self, haystack: str, max_dist: float) -> float:
+        """
+        屏幕文本中与关键词最接近子串的加权编辑距离。
+        超过 max_dist 时只保证返回值 > max_dist (不一定精确)。
+        """
+        n_len = len(self.needle)
+        best = float(n_len)
+        for lo, hi in self._candidate_spans(haystack, max_dist):
+            prev = [float(j) for j in range(n_len + 1)]
+            for ch in haystack[lo:hi]:
+                row = self._row(ch)
+                cur = [0.0] * (n_len + 1)
+                for j in range(1, n_len + 1):
+                    cur[j] = min(prev[j - 1] + row[j - 1], prev[j] + 1.0, cur[j - 1] + 1.0)
+                if cur[n_len] < best:
+                    best = cur[n_len]
+                    if best <= max_dist:
+                        return best
+                prev = cur
+        return best
+
+    def best_distance(self, haystack: str) -> float:
+        """不做过滤、不提前结束的精确最小距离 (较慢，只用于追踪和阈值校准)"""
+        n_len = len(self.needle)
+        best = float(n_len)
+        prev = [float(j) for j in range(n_len + 1)]
+        for ch in haystack:
+            row = self._row(ch)
+            cur = [0.0] * (n_len + 1)
+            for j in range(1, n_len + 1):
+                cur[j] = min(prev[j - 1] + row[j - 1], prev[j] + 1.0, cur[j - 1] + 1.0)
+            best = min(best, cur[n_len])
+            prev = cur
+        return best
+
+    def contains(self, haystack: str, threshold: float) -> bool:
+        """相似度 = 1 - 距离 / 关键词长度，达到 threshold 即视为包含"""
+        n_len = len(self.needle)
+        if not n_len:
+            return True
+        max_dist = (1.0 - threshold) * n_len
+        return self.distance(haystack, max_dist) <= max_dist + 1e-9
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Dict, Optional
+
+
+class OcrPool:
+    """
+    多个洗炼器共享的 OCR 并发池: 限制同时运行的 tesseract 进程数 (默认 CPU 核数 - 1)。
+
+    每次识别前申请一个名额，名额不够时排队；空出的名额按洗炼器轮流分配 (每个洗炼器一个队列，轮询发放)，
+    识别次数多、排队快的窗口不会把其它窗口饿死。
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._waiting: Dict[str, deque] = {}  # 洗炼器 -> 等待中的申请
+        self._ring: deque = deque()            # 有申请在排队的洗炼器 (轮询顺序)
+        self.grants: Dict[str, int] = {}       # 各洗炼器获得的名额数
+        self.wait_time: Dict[str, float] = {}  # 各洗炼器排队的总时间 (秒)
+
+    def _dispatch(self):
+        """把空闲的名额按轮询顺序发给排队的洗炼器 (调用方持有锁)"""
+        granted = False
+        while self._busy < self.workers and self._ring:
+            client = self._ring.popleft()
+            ticket = self._waiting[client].popleft()
+            ticket['granted'] = True
+            self._busy += 1
+            granted = True
+            if self._waiting[client]:
+                self._ring.append(client)
+        if granted:
+            self._cond.notify_all()
+
+    def acquire(self, client: str):
+        ticket = {'granted': False}
+        start = time.perf_counter()
+        with self._cond:
+            queue = self._waiting.setdefault(client, deque())
+            queue.append(ticket)
+            if len(queue) == 1:
+                self._ring.append(client)
+            self._dispatch()
+            while not ticket['granted']:
+                self._cond.wait()
+            self.grants[client] = self.grants.get(client, 0) + 1
+            self.wait_time[client] = self.wait_time.get(client, 0.0) + time.perf_counter() - start
+
+    def release(self):
+        with self._cond:
+            self._busy -= 1
+            self._dispatch()
+
+    def slot(self, client: str) -> Callable[[], ContextManager]:
+        """
+        给某个洗炼器用的名额函数，赋值给 ScreenReader.ocr_slot:
+            with reader.ocr_slot():
+                ... 运行 tesseract ...
+        """
+        @contextmanager
+        def _slot():
+            self.acquire(client)
+            try:
+                yield
+            finally:
+                self.release()
+        return _slot
+
+    def stats(self) -> str:
+        parts = []
+        for client in sorted(self.grants):
+            n = self.grants[client]
+            parts.append(f"{client}: {n} 次识别，平均排队 {self.wait_time[client] / n * 1000:.0f}ms")
+        return f"OCR 并发 {self.workers}；" + ("；".join(parts) if parts else "无识别")
@@ -0,0 +1,100 @@
+import math
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+
+def min_matches(threshold: float, n_len: int, w_len: int) -> int:
+    """
+    SequenceMatcher.ratio() = 2M / (w + n) 要达到 threshold 时，匹配字符数 M 的最小值。
+    按 difflib 的浮点算法逐个校正，保证与 ratio() >= threshold 的判断完全一致。
+    """
+    total = n_len + w_len
+    if total <= 0:
+        return 0
+    m = max(0, math.ceil(threshold * total / 2) - 1)
+    while m > 0 and 2.0 * (m - 1) / total >= threshold:
+        m -= 1
+    while 2.0 * m / total < threshold:
+        m += 1
+    return m
+
+
+def bigram_need(m_min: int, n_len: int, w_len: int) -> int:
+    """
+    窗口与关键词至少共享多少个二元组 (bigram)。
+
+    M 个匹配字符是两边的公共子序列。关键词共 n-1 个二元组：
+    每个未匹配的关键词字符最多破坏 2 个，窗口里每个未匹配字符最多再拆开 1 个，
+    所以至少有 (n-1) - 2(n-M) - (w-M) = 3M - n - w - 1 个关键词二元组原样出现在窗口中。
+    结果 <= 0 时二元组过滤不起作用，只能用单字计数 (至少 M 个字符出现在关键词中)。
+    """
+    return 3 * m_min - n_len - w_len - 1
+
+
+class QGramIndex:
+    """
+    一段文本的 q-gram 倒排索引 (单字 + 二元组 -> 出现位置列表)。
+
+    模糊包含判断前先用它做计数过滤: 只有 "共享 gram 数量" 达到下界的窗口才需要跑 SequenceMatcher，
+    和关键词一个字都不沾的行只看倒排表长度就能直接排除。
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.unigrams: Dict[str, List[int]] = {}
+        self.bigrams: Dict[str, List[int]] = {}
+        for i, ch in enumerate(text):
+            self.unigrams.setdefault(ch, []).append(i)
+            if i + 1 < len(text):
+                self.bigrams.setdefault(text[i:i + 2], []).append(i)
+
+    def _prefix_counts(self, postings: Dict[str, List[int]], grams, length: int) -> Tuple[int, List[int]]:
+        """把属于关键词的 gram 位置标记出来并求前缀和 (集合计数只会多算，过滤依然安全)"""
+        marks = [0] * length
+        total = 0
+        for g in grams:
+            for pos in postings.get(g, ()):
+                if not marks[pos]:
+                    marks[pos] = 1
+                    total += 1
+        prefix = [0] * (length + 1)
+        acc = 0
+        for i, v in enumerate(marks):
+            acc += v
+            prefix[i + 1] = acc
+        return total, prefix
+
+    def candidate_windows(self, needle: str, threshold: float, window_sizes: Sequence[int],
+                          step: int) -> Iterator[Tuple[int, int]]:
+        """
+        按原滑动窗口的顺序产出 (起点, 窗口长度)，跳过计数上不可能达到 threshold 的窗口。
+        """
+        h_len = len(self.text)
+        n_len = len(needle)
+        sizes = [w for w in window_sizes if 0 < w <= h_len]
+        if not sizes:
+            return
+
+        needs = {w: (min_matches(threshold, n_len, w), bigram_need(min_matches(threshold, n_len, w), n_len, w))
+                 for w in sizes}
+
+        # 快速排除: 整段文本里和关键词共享的 gram 总数都不够时，不用看任何窗口
+        uni_grams = set(needle)
+        uni_upper = sum(len(self.unigrams.get(g, ())) for g in uni_grams)
+        if uni_upper < min(m for m, _ in needs.values()):
+            return
+        bi_grams = {needle[i:i + 2] for i in range(n_len - 1)}
+        bi_upper = sum(len(self.bigrams.get(g, ())) for g in bi_grams)
+        if all(bi_upper < b for _, b in needs.values()):
+            return
+
+        _, uni_prefix = self._prefix_counts(self.unigrams, uni_grams, h_len)
+        _, bi_prefix = self._prefix_counts(self.bigrams, bi_grams, max(h_len - 1, 0))
+
+        for w_len in sizes:
+            m_min, b_need = needs[w_len]
+            for i in range(0, h_len - w_len + 1, step):
+                if uni_prefix[i + w_len] - uni_prefix[i] < m_min:
+                    continue
+                if b_need > 0 and bi_prefix[i + w_len - 1] - bi_prefix[i] < b_need:
+                    continue
+                yield i, w_len
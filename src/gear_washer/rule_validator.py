@@ -0,0 +1,260 @@
+import itertools
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from .compiled_rule import is_expression
+from .text_normalize import normalize_ocr_text
+
+ERROR = 'error'      # 规则永远无法满足
+WARNING = 'warning'  # 规则可以满足，但有多余 / 可疑的条件
+
+# 表达式里最多枚举多少个不同关键词 (2^n 种组合)
+MAX_EXPRESSION_VARS = 12
+
+_EXPR_TOKEN_RE = re.compile(r'[\u4e00-\u9fa5a-zA-Z0-9]+')
+_EXPR_RESERVED = {'and', 'or', 'not', 'True', 'False'}
+
+
+class RuleIssue(NamedTuple):
+    level: str      # ERROR / WARNING
+    where: str      # 位置描述，例如 "第2组(数量)"
+    message: str
+
+    def __str__(self):
+        tag = "错误" if self.level == ERROR else "提示"
+        return f"[{tag}] {self.where}: {self.message}" if self.where else f"[{tag}] {self.message}"
+
+
+def has_errors(issues: List[RuleIssue]) -> bool:
+    return any(issue.level == ERROR for issue in issues)
+
+
+def format_issues(issues: List[RuleIssue]) -> str:
+    return '\n'.join(str(issue) for issue in issues)
+
+
+def validate_rule(conditions: Union[str, List, Dict], normalize: Callable[[str], str] = normalize_ocr_text) -> List[RuleIssue]:
+    """
+    静态检查一条规则 (ComplexRuleEditor.save_data 生成的组列表，或 && / || 表达式字符串)，
+    按 AffixMatcher 的判定口径找出永远无法满足 (ERROR) 或多余 (WARNING) 的条件。
+    """
+    issues: List[RuleIssue] = []
+    if isinstance(conditions, str):
+        _check_string(conditions, "规则", normalize, issues)
+    elif isinstance(conditions, list):
+        if not conditions:
+            issues.append(RuleIssue(WARNING, "规则", "规则为空，任何装备都会被判定为满足"))
+        elif isinstance(conditions[0], dict) and 'type' in conditions[0]:
+            _check_groups(conditions, normalize, issues)
+        else:
+            for i, cond in enumerate(conditions):
+                for issue in validate_rule(cond, normalize):
+                    issues.append(issue._replace(where=f"第{i + 1}项 {issue.where}"))
+    elif isinstance(conditions, dict):
+        _check_groups([conditions], normalize, issues)
+    return issues
+
+
+# ----------------------------------------------------------------------
+# 表达式
+# ----------------------------------------------------------------------
+def _is_expression(text: str) -> bool:
+    """顶层字符串规则是否按表达式求值 (与 AffixMatcher._check_frame 的判断一致)；组内词缀见 compiled_rule.is_expression"""
+    return '&&' in text or '||' in text or ('(' in text and ')' in text)
+
+
+def expression_truth(expression: str, normalize: Callable[[str], str] = normalize_ocr_text) -> Optional[set]:
+    """
+    枚举表达式中关键词的所有命中组合，返回能使表达式为真的结果集合 {True, False} 的子集。
+    标准化后相同的关键词视为同一个变量。变量过多时返回 None (不做判断)；语法错误时抛出 SyntaxError。
+    """
+    python_expr = expression.replace('&&', ' and ').replace('||', ' or ').replace('!', ' not ')
+    raw_keywords = set(_EXPR_TOKEN_RE.findall(python_expr)) - _EXPR_RESERVED
+    variables = sorted({normalize(kw) for kw in raw_keywords})
+    if len(variables) > MAX_EXPRESSION_VARS:
+        return None
+
+    code = compile(python_expr, '<rule>', 'eval')
+    outcomes = set()
+    for values in itertools.product((False, True), repeat=len(variables)):
+        assignment = dict(zip(variables, values))
+        context = {kw: assignment[normalize(kw)] for kw in raw_keywords}
+        outcomes.add(bool(eval(code, {"__builtins__": None}, context)))
+        if len(outcomes) == 2:
+            break
+    return outcomes
+
+
+def _check_string(text: str, where: str, normalize, issues: List[RuleIssue]) -> Optional[bool]:
+    """
+    检查字符串条件。
+    :return: True 恒为真 / False 恒为假 / None 取决于屏幕内容
+    """
+    if not _is_expression(text):
+        if not normalize(text):
+            issues.append(RuleIssue(WARNING, where, f"关键词 [{text}] 标准化后为空，任何文本都会命中"))
+            return True
+        return None
+
+    try:
+        outcomes = expression_truth(text, normalize)
+    except Exception as e:
+        issues.append(RuleIssue(ERROR, where, f"表达式无法解析 [{text}]: {e}"))
+        return False
+    if outcomes is None:
+        issues.append(RuleIssue(WARNING, where, f"表达式关键词超过 {MAX_EXPRESSION_VARS} 个，未做可满足性检查"))
+        return None
+    if outcomes == {False}:
+        issues.append(RuleIssue(ERROR, where, f"表达式 [{text}] 在任何情况下都为假"))
+        return False
+    if outcomes == {True}:
+        issues.append(RuleIssue(WARNING, where, f"表达式 [{text}] 在任何情况下都为真，等于没有限制"))
+        return True
+    return None
+
+
+# ----------------------------------------------------------------------
+# 组规则
+# ----------------------------------------------------------------------
+_TYPE_NAMES = {'AND': '和', 'COUNT': '数量', 'NOT': '非'}
+
+
+def _parse_affix(item, normalize, where: str, issues: List[RuleIssue]) -> Optional[Dict]:
+    """解析一个词缀条件；数值上下限不是数字时记一条 ERROR 并返回 None"""
+    if isinstance(item, dict):
+        text = str(item.get('name', ''))
+        lo, hi = item.get('min_value'), item.get('max_value')
+    else:
+        text, lo, hi = str(item), None, None
+    if not text.strip():
+        return None
+    try:
+        min_v = float(lo) if lo is not None else None
+        max_v = float(hi) if hi is not None else None
+    except (TypeError, ValueError):
+        issues.append(RuleIssue(ERROR, where, f"词缀 [{text}] 的数值范围不是数字 (最小 {lo!r}，最大 {hi!r})"))
+        return None
+    return {
+        'text': text,
+        'kw': normalize(text.strip()),
+        'min': min_v,
+        'max': max_v,
+        # 组内词缀只有带 && / || 才按表达式求值 (与 CompiledRule 一致)，"攻速(装备)" 这类是普通关键词
+        'expr': is_expression(text),
+    }
+
+
+def _range_str(affix: Dict) -> str:
+    lo = '-∞' if affix['min'] is None else f"{affix['min']:g}"
+    hi = '+∞' if affix['max'] is None else f"{affix['max']:g}"
+    return f"[{lo}, {hi}]"
+
+
+def _covers(outer: Dict, inner: Dict) -> bool:
+    """outer 的数值范围是否完全包含 inner (None 表示无限制)"""
+    lo_ok = outer['min'] is None or (inner['min'] is not None and inner['min'] >= outer['min'])
+    hi_ok = outer['max'] is None or (inner['max'] is not None and inner['max'] <= outer['max'])
+    return lo_ok and hi_ok
+
+
+def _overlaps(a: Dict, b: Dict) -> bool:
+    lo = max(x for x in (a['min'], b['min'], float('-inf')) if x is not None)
+    hi = min(x for x in (a['max'], b['max'], float('inf')) if x is not None)
+    return lo <= hi
+
+
+def _check_groups(groups: List[Dict], normalize, issues: List[RuleIssue]):
+    parsed = []
+    for gi, group in enumerate(groups):
+        g_type = group.get('type', 'AND')
+        where = f"第{gi + 1}组({_TYPE_NAMES.get(g_type, g_type)})"
+        affixes = [a for a in (_parse_affix(item, normalize, where, issues) for item in group.get('affixes', [])) if a]
+
+        # 每个词缀单独看: 是否恒命中 / 恒不命中
+        for affix in affixes:
+            affix['always'] = None
+            if affix['expr']:
+                sub: List[RuleIssue] = []
+                affix['always'] = _check_string(affix['text'], where, normalize, sub)
+                # 只有 "和" 组里的表达式恒假才会导致整条规则无法满足；NOT 组恒真的情况在下面单独报错
+                for issue in sub:
+                    issues.append(issue if g_type == 'AND' else issue._replace(level=WARNING))
+            elif not affix['kw']:
+                affix['always'] = True
+                if g_type != 'NOT':  # NOT 组恒命中在下面按错误报告
+                    issues.append(RuleIssue(WARNING, where, f"词缀 [{affix['text']}] 标准化后为空，任何文本都会命中"))
+            elif affix['min'] is not None and affix['max'] is not None and affix['min'] > affix['max']:
+                affix['always'] = False
+                issues.append(RuleIssue(ERROR if g_type == 'AND' else WARNING, where,
+                                        f"词缀 [{affix['text']}] 的最小值 {affix['min']:g} 大于最大值 {affix['max']:g}，永远不会命中"))
+
+        # 组内重复
+        seen = {}
+        for affix in affixes:
+            key = (affix['kw'], affix['min'], affix['max'])
+            if key in seen:
+                issues.append(RuleIssue(WARNING, where, f"词缀 [{affix['text']}] 重复出现"))
+            seen[key] = affix
+
+        parsed.append((gi, g_type, where, group, affixes))
+
+    # 跨组冲突: 必须出现的词缀 (AND) 同时出现在 NOT 里
+    required = [(where, a) for _, g_type, where, _, affixes in parsed if g_type == 'AND' for a in affixes if not a['expr']]
+    forbidden = [(where, a) for _, g_type, where, _, affixes in parsed if g_type == 'NOT' for a in affixes if not a['expr']]
+    dead_in_count = set()
+    for n_where, bad in forbidden:
+        for r_where, need in required:
+            if need['kw'] != bad['kw'] or not need['kw']:
+                continue
+            if _covers(bad, need):
+                issues.append(RuleIssue(ERROR, r_where,
+                                        f"词缀 [{need['text']}] {_range_str(need)} 同时被 {n_where} 排除 {_range_str(bad)}，永远无法满足"))
+            elif _overlaps(bad, need):
+                issues.append(RuleIssue(WARNING, r_where,
+                                        f"词缀 [{need['text']}] 的部分数值范围被 {n_where} 排除"))
+        for _, g_type, _, _, affixes in parsed:
+            if g_type == 'COUNT':
+                for affix in affixes:
+                    if affix['kw'] == bad['kw'] and _covers(bad, affix):
+                        dead_in_count.add(id(affix))
+
+    # 重复的必须条件: 另一个 AND 词缀的范围更严格时，本条是多余的
+    for i, (where, a) in enumerate(required):
+        for j, (b_where, b) in enumerate(required):
+            same = _covers(b, a) and _covers(a, b)
+            if same and where == b_where:
+                continue  # 同组完全重复，上面已经提示过
+            if i != j and a['kw'] == b['kw'] and _covers(a, b) and (not same or i > j):
+                issues.append(RuleIssue(WARNING, where, f"词缀 [{a['text']}] {_range_str(a)} 已被更严格的同名条件覆盖，可以删除"))
+                break
+
+    # 按组类型检查数量约束
+    for gi, g_type, where, group, affixes in parsed:
+        total = len(affixes)
+        if g_type == 'AND':
+            if not affixes:
+                issues.append(RuleIssue(WARNING, where, "组内没有词缀，不产生任何限制"))
+        elif g_type == 'NOT':
+            if not affixes:
+                issues.append(RuleIssue(WARNING, where, "组内没有词缀，不产生任何限制"))
+            for affix in affixes:
+                if affix['always'] is True:
+                    issues.append(RuleIssue(ERROR, where, f"排除的条件 [{affix['text']}] 恒命中，规则永远无法满足"))
+        elif g_type == 'COUNT':
+            min_v, max_v = group.get('min'), group.get('max')
+            min_v = int(min_v) if min_v is not None else None
+            max_v = int(max_v) if max_v is not None else None
+            always_hit = sum(1 for a in affixes if a['always'] is True)
+            possible = sum(1 for a in affixes if a['always'] is not False and id(a) not in dead_in_count)
+            if min_v is not None and max_v is not None and min_v > max_v:
+                issues.append(RuleIssue(ERROR, where, f"最少 {min_v} 个大于最多 {max_v} 个，永远无法满足"))
+            elif min_v is not None and min_v > total:
+                issues.append(RuleIssue(ERROR, where, f"要求至少 {min_v} 个，但组内只有 {total} 个词缀"))
+            elif min_v is not None and min_v > possible:
+                issues.append(RuleIssue(ERROR, where, f"要求至少 {min_v} 个，但组内只有 {possible} 个词缀可能命中 (其余被排除或数值范围无效)"))
+            elif max_v is not None and always_hit > max_v:
+                issues.append(RuleIssue(ERROR, where, f"最多 {max_v} 个，但组内已有 {always_hit} 个条件恒命中"))
+            elif (min_v is None or min_v <= 0) and (max_v is None or max_v >= total):
+                issues.append(RuleIssue(WARNING, where, "数量限制覆盖了所有可能的情况，不产生任何限制"))
+        else:
+            issues.append(RuleIssue(WARNING, where, f"未知的组类型 [{g_type}]，该组不会产生任何限制"))
@@ -1,13 +1,25 @@
-import pyautogui
+try:
+    import pyautogui
+except Exception:  # 没有桌面环境 (例如 Linux 无显示器) 时导入会失败，只能使用 capture_source
+    pyautogui = None
 import pytesseract
 import tempfile
+import math
 import os
 import subprocess
+import time
+from contextlib import nullcontext
 from PIL import Image, ImageOps, ImageChops
-from typing import Tuple, Optional
+from typing import Callable, Iterator, List, Optional, Tuple
 from . import win32_utils
+from .digit_ocr import (DIGIT_WHITELIST, clean_digit_result, line_text, numeric_runs,
+                        parse_tsv_lines, replace_run, run_box)
 
 class ScreenReader:
+    # 数值二次识别: 使用的语言包 (打包时保留了 eng)、裁剪框四周留白 (预处理后图片上的像素)
+    DIGIT_LANG = 'eng'
+    DIGIT_PAD = 6
+
     def __init__(self, tesseract_cmd: str = None, debug_mode: bool = False):
         """
         :param tesseract_cmd: tesseract 可执行文件的路径，如果不在 PATH 中需要指定
@@ -17,6 +29,22 @@ class ScreenReader:
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
         self.debug_mode = debug_mode
         self.debug_counter = 0  # 用于给调试图片编号
+        # 可选的后台执行函数 defer(fn, *args)，设置后调试文件在后台线程写盘 (见 side_work.SideWorker.submit)
+        self.defer: Optional[Callable] = None
+        # 记录最近一次截图的缩略图 (自适应等待时间用来判断画面何时刷新)，(region, hwnd, 缩略图字节)
+        self.keep_thumbnail = False
+        self.last_thumbnail = None
+        # 记录最近一次截图的原图 (会话录制用，见 session.SessionRecorder)，(region, 截图)
+        self.keep_capture = False
+        self.last_capture = None
+        # 可选的 OCR 名额函数 (见 ocr_pool.OcrPool.slot)，多个窗口共享 OCR 并发上限时，每次运行 tesseract 前申请名额
+        self.ocr_slot: Optional[Callable] = None
+        # 可选的截图函数 capture_source(region) -> Image，设置后代替前台 / 后台截图 (见 simulator.GameSimulator.capture)
+        self.capture_source: Optional[Callable] = None
+        # 可选的识别函数 recognizer(预处理后的图片) -> 文本，设置后代替 tesseract (见 simulator.GameSimulator.recognize)
+        self.recognizer: Optional[Callable] = None
+        # 截图、预处理的累计耗时 [截图, 预处理] (秒)，由调用方清零 (见 telemetry.StageTelemetry.split)
+        self.stage_times = [0.0, 0.0]
 
     def capture_region(self, region: Tuple[int, int, int, int]) -> Image.Image:
         """
@@ -36,22 +64,178 @@ class ScreenReader:
             print(f"Screenshot failed for region {region}: {e}")
             return Image.new('RGB', (1, 1), color='black')
 
-    def read_text(self, region: Tuple[int, int, int, int], lang: str = 'chi_sim', scale_factor: float = 2.5, hwnd=None) -> str:
+    def read_text(self, region: Tuple[int, int, int, int], lang: str = 'chi_sim', scale_factor: float = 2.5, hwnd=None,
+                  digit_filter: Optional[Callable[[str], bool]] = None) -> str:
         """
         读取指定区域的文字
         :param region: (left, top, width, height)
         :param lang: 语言代码，默认为简体中文 'chi_sim' (需要安装对应的 tesseract 语言包)
         :param scale_factor: 图片放大倍数，默认放大2.5倍以提高OCR准确度
         :param hwnd: 如果提供，则使用后台截图模式 (region 为相对于窗口的坐标)
+        :param digit_filter: 如果提供，对 digit_filter(行文本) 为 True 的行再做一次只识别数字的二次识别 (见 _read_with_digit_pass)
+        """
+        image = self._acquire(region, hwnd)
+        if image is None:
+            return ""
+        return self.read_image(image, region, lang, scale_factor, digit_filter)
+
+    def grab(self, region: Tuple[int, int, int, int], hwnd=None) -> Optional[Image.Image]:
+        """只截图不识别 (截图和识别分开执行时使用，见 read_image)，失败返回 None"""
+        return self._acquire(region, hwnd)
+
+    def read_image(self, image: Image.Image, region: Tuple[int, int, int, int], lang: str = 'chi_sim',
+                   scale_factor: float = 2.5, digit_filter: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        识别 grab() 得到的截图，参数同 read_text (region 只用于调试输出)。
+        """
+        image = self._preprocess(image, scale_factor)
+        self._save_debug_image(image, region, scale_factor)
+        text = self._recognize(image, lang, digit_filter)
+        self._save_debug_text(text)
+        return text
+
+    def read_text_rows(self, region: Tuple[int, int, int, int], lang: str = 'chi_sim', scale_factor: float = 2.5, hwnd=None,
+                       digit_filter: Optional[Callable[[str], bool]] = None) -> Tuple[str, List[Tuple[int, int, str]]]:
+        """
+        与 read_text 相同，另外返回按水平投影切出的文字行带 (用于学习 / 校验浮窗布局，见 layout.TooltipLayout)。
+        :return: (文本, [(上边界, 下边界, 行签名), ...])，坐标换算回截图区域内的原始像素
+        """
+        image = self._acquire(region, hwnd)
+        if image is None:
+            return "", []
+
+        image = self._preprocess(image, scale_factor)
+        self._save_debug_image(image, region, scale_factor)
+        text = self._recognize(image, lang, digit_filter)
+        self._save_debug_text(text)
+
+        scale = scale_factor if scale_factor > 1.0 else 1.0
+        rows = []
+        for top, bottom in self._split_rows(image):
+            band = image.crop((0, top, image.size[0], bottom))
+            rows.append((int(top / scale), int(math.ceil(bottom / scale)), self._row_signature(band)))
+        return text, rows
+
+    @staticmethod
+    def _row_signature(band: Image.Image) -> str:
+        """行带的缩略位图 (32x8，深色为 1)，十六进制字符串；同样的文字渲染出来签名相同"""
+        small = band.convert('L').resize((32, 8), Image.Resampling.BOX)
+        bits = ''.join('1' if p < 160 else '0' for p in small.getdata())
+        return f"{int(bits, 2):064x}"
+
+    def _recognize(self, image: Image.Image, lang: str, digit_filter: Optional[Callable[[str], bool]]) -> str:
+        if self.recognizer is not None:
+            return self.recognizer(image)
+        if digit_filter is not None:
+            return self._read_with_digit_pass(image, lang, digit_filter)
+        return self._run_tesseract(image, lang)
+
+    def _read_with_digit_pass(self, image: Image.Image, lang: str, digit_filter: Callable[[str], bool]) -> str:
         """
+        主识别改用 TSV 输出 (带每个词的坐标)，再把需要的行里的数值部分单独裁出来，
+        用 "只允许数字和 %+-" 的白名单重新识别，结果替换回该行。
+        所有数值小图竖向拼成一张图，只多调用一次 tesseract，比整帧放大重识别便宜得多。
+        """
+        tsv = self._run_tesseract(image, lang, configs=["tsv"])
+        if not tsv:
+            return self._run_tesseract(image, lang)
+        lines = parse_tsv_lines(tsv)
+
+        targets = []  # [(行下标, 数值区间), ...]
+        for li, words in enumerate(lines):
+            if digit_filter(line_text(words)):
+                targets.extend((li, run) for run in numeric_runs(words))
+        if targets:
+            crops = [image.crop(run_box(lines[li], run, self.DIGIT_PAD, image.size)) for li, run in targets]
+            readings = self._read_digit_crops(crops)
+            # 同一行从右往左替换，前面区间的下标不受影响
+            for (li, run), reading in sorted(zip(targets, readings), key=lambda item: (item[0][0], -item[0][1][0])):
+                digits = clean_digit_result(reading)
+                if digits is None:
+                    continue
+                old = line_text(lines[li][run[0]:run[1]])
+                if self.debug_mode and old != digits:
+                    print(f"[调试] 数值二次识别: {old} -> {digits}")
+                lines[li] = replace_run(lines[li], run, digits)
+        return '\n'.join(line_text(words) for words in lines)
+
+    def _read_digit_crops(self, crops: List[Image.Image]) -> List[str]:
+        """
+        识别若干张数值小图，返回与 crops 一一对应的文本。
+        先竖向拼接成一张图按块识别 (每张小图一行)；行数对不上时退回逐张单行识别。
+        """
+        digit_args = ["-c", f"tessedit_char_whitelist={DIGIT_WHITELIST}"]
+        gap = max(c.size[1] for c in crops)
+        width = max(c.size[0] for c in crops)
+        height = sum(c.size[1] for c in crops) + gap * (len(crops) + 1)
+        sheet = Image.new('L', (width + 2 * gap, height), color=255)
+        y = gap
+        for crop in crops:
+            sheet.paste(crop.convert('L'), (gap, y))
+            y += crop.size[1] + gap
+
+        text = self._run_tesseract(sheet, self.DIGIT_LANG, extra_args=["--psm", "6"] + digit_args)
+        results = [line.strip() for line in text.splitlines() if line.strip()]
+        if len(results) == len(crops):
+            return results
+        return [self._run_tesseract(crop, self.DIGIT_LANG, extra_args=["--psm", "7"] + digit_args).strip()
+                for crop in crops]
+
+    def iter_text_lines(self, region: Tuple[int, int, int, int], lang: str = 'chi_sim', scale_factor: float = 2.5, hwnd=None) -> Iterator[Tuple[str, int]]:
+        """
+        按行流式读取文字：先按水平投影把浮窗切成若干文字行带，再从上到下逐行 OCR。
+        调用方可以在得到确定结论后直接 close() 生成器，剩下的行不再识别。
+
+        :return: 生成 (本行文本, 总行带数)
+        """
+        image = self._acquire(region, hwnd)
+        if image is None:
+            return
+
+        image = self._preprocess(image, scale_factor)
+        self._save_debug_image(image, region, scale_factor)
+
+        bands = self._split_rows(image)
+        total = len(bands)
+        for top, bottom in bands:
+            band_img = image.crop((0, top, image.size[0], bottom))
+            # --psm 7: 把图片当作单行文本处理
+            text = self._run_tesseract(band_img, lang, extra_args=["--psm", "7"])
+            yield text.strip(), total
+
+    def _acquire(self, region: Tuple[int, int, int, int], hwnd=None) -> Optional[Image.Image]:
+        """截图 (前台或后台)，失败返回 None"""
+        start = time.perf_counter()
+        image = self._grab_raw(region, hwnd)
+        if image is None and hwnd:
+            print(f"Background screenshot failed for region {region}")
+        self.stage_times[0] += time.perf_counter() - start
+        if image is not None and self.keep_thumbnail:
+            self.last_thumbnail = (region, hwnd, self._thumbnail(image))
+        if image is not None and self.keep_capture:
+            self.last_capture = (region, image)
+        return image
+
+    def _grab_raw(self, region: Tuple[int, int, int, int], hwnd=None) -> Optional[Image.Image]:
+        if self.capture_source is not None:
+            return self.capture_source(region)
         if hwnd:
-            image = win32_utils.background_screenshot(hwnd, *region)
-            if image is None:
-                print(f"Background screenshot failed for region {region}")
-                return ""
-        else:
-            image = self.capture_region(region)
-        
+            return win32_utils.background_screenshot(hwnd, *region)
+        return self.capture_region(region)
+
+    @staticmethod
+    def _thumbnail(image: Image.Image) -> bytes:
+        """48x16 灰度缩略图，用于快速比较画面是否变化"""
+        return image.convert('L').resize((48, 16), Image.Resampling.BOX).tobytes()
+
+    def region_thumbnail(self, region: Tuple[int, int, int, int], hwnd=None) -> Optional[bytes]:
+        """只截图不识别，返回缩略图 (失败返回 None)"""
+        image = self._grab_raw(region, hwnd)
+        return self._thumbnail(image) if image is not None else None
+
+    def _preprocess(self, image: Image.Image, scale_factor: float) -> Image.Image:
+        """放大 + 提取亮度通道并反色，得到白底黑字的灰度图"""
+        start = time.perf_counter()
         # 放大图片以提高OCR识别准确度
         if scale_factor > 1.0:
             original_size = image.size
@@ -86,17 +270,89 @@ class ScreenReader:
             print(f"Image preprocessing failed: {e}, falling back to grayscale.")
             image = image.convert('L') # 降级处理
         # ====================
-        
-        # 调试模式：保存OCR识别的图片
-        if self.debug_mode:
-            debug_dir = "ocr_debug"
-            if not os.path.exists(debug_dir):
-                os.makedirs(debug_dir)
-            self.debug_counter += 1
-            debug_path = os.path.join(debug_dir, f"ocr_capture_{self.debug_counter}.png")
-            image.save(debug_path)
-            print(f"[调试] OCR图片已保存: {debug_path} (原始区域: {region}, 放大倍数: {scale_factor}x)")
-        
+        self.stage_times[1] += time.perf_counter() - start
+        return image
+
+    def _save_debug_image(self, image: Image.Image, region, scale_factor: float):
+        """调试模式：保存OCR识别的图片"""
+        if not self.debug_mode:
+            return
+        debug_dir = "ocr_debug"
+        if not os.path.exists(debug_dir):
+            os.makedirs(debug_dir)
+        self.debug_counter += 1
+        debug_path = os.path.join(debug_dir, f"ocr_capture_{self.debug_counter}.png")
+        self._run_deferred(self._write_debug_image, image, debug_path, region, scale_factor)
+
+    def _run_deferred(self, fn, *args):
+        if self.defer is not None:
+            self.defer(fn, *args)
+        else:
+            fn(*args)
+
+    @staticmethod
+    def _write_debug_image(image: Image.Image, debug_path: str, region, scale_factor: float):
+        image.save(debug_path)
+        print(f"[调试] OCR图片已保存: {debug_path} (原始区域: {region}, 放大倍数: {scale_factor}x)")
+
+    def _save_debug_text(self, text: str):
+        """调试模式：把识别结果与图片同名保存为 .txt，供离线统计 (normalize_report.py) 使用"""
+        if not self.debug_mode:
+            return
+        debug_path = os.path.join("ocr_debug", f"ocr_capture_{self.debug_counter}.txt")
+        self._run_deferred(self._write_debug_text, text, debug_path)
+
+    @staticmethod
+    def _write_debug_text(text: str, debug_path: str):
+        try:
+            with open(debug_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        except OSError as e:
+            print(f"[调试] 保存识别文本失败: {e}")
+
+    @staticmethod
+    def _split_rows(image: Image.Image, ink_threshold: int = 128, min_gap: int = 3, pad: int = 4) -> List[Tuple[int, int]]:
+        """
+        按水平投影把预处理后的图片 (白底黑字) 切成文字行带。
+        投影通过缩放到 1 像素宽来计算 (在 C 层完成)，不逐像素遍历；
+        用浮点模式缩放，避免一行里只有零星几个文字像素时均值被取整成 0。
+
+        :param min_gap: 小于该高度的空白不视为行间距 (防止把一个字的上下结构切断)
+        :param pad: 每个行带上下额外保留的像素
+        :return: [(top, bottom), ...] 从上到下
+        """
+        width, height = image.size
+        if width <= 0 or height <= 0:
+            return []
+        # 文字像素 -> 255，背景 -> 0
+        ink = image.convert('L').point(lambda p: 255 if p < ink_threshold else 0)
+        profile = list(ink.convert('F').resize((1, height), Image.Resampling.BOX).getdata())
+
+        bands = []
+        start = None
+        gap = 0
+        for y, val in enumerate(profile):
+            if val > 0:
+                if start is None:
+                    start = y
+                gap = 0
+            elif start is not None:
+                gap += 1
+                if gap >= min_gap:
+                    bands.append((start, y - gap + 1))
+                    start = None
+                    gap = 0
+        if start is not None:
+            bands.append((start, height - gap))
+
+        return [(max(0, top - pad), min(height, bottom + pad)) for top, bottom in bands]
+
+    def _run_tesseract(self, image: Image.Image, lang: str = 'chi_sim', extra_args: Optional[List[str]] = None,
+                       configs: Optional[List[str]] = None) -> str:
+        """
+        调用 tesseract 可执行文件识别一张 (已预处理的) 图片
+        :param configs: 配置文件名 (如 "tsv")，必须放在命令行最后
+        """
         # Temporary workaround for PIL saving issue (SystemError: tile cannot extend outside image)
         # We manually save to a BMP file and pass the path to pytesseract
         with tempfile.NamedTemporaryFile(suffix=".bmp", delete=False) as tmp_file:
@@ -115,6 +371,8 @@ class ScreenReader:
             # 显式传递 --tessdata-dir 参数，这是最稳妥的解决路径问题的方法
             # 它可以覆盖环境变量和内置路径
             cmd_args = [tesseract_cmd, temp_filename, "stdout", "-l", lang]
+            if extra_args:
+                cmd_args.extend(extra_args)
             
             # 尝试自动定位 tessdata 目录
             # 逻辑：假设 tesseract.exe 和 tessdata 在同一级或者 tessdata 在 tesseract.exe 的同/子目录下
@@ -134,6 +392,9 @@ class ScreenReader:
                     if env_prefix and os.path.exists(env_prefix):
                          cmd_args.extend(["--tessdata-dir", env_prefix])
 
+            if configs:
+                cmd_args.extend(configs)
+
             # print(f"DEBUG: OCR Running command: {cmd_args}") # Debug usage
             
             # 隐藏窗口 (Windows Only)
@@ -143,40 +404,41 @@ class ScreenReader:
                 startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
                 startupinfo.wShowWindow = subprocess.SW_HIDE
 
-            try:
-                proc = subprocess.Popen(
-                    cmd_args,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    startupinfo=startupinfo
-                )
-                stdout_data, stderr_data = proc.communicate(timeout=10) # 10秒超时
+            with (self.ocr_slot() if self.ocr_slot else nullcontext()):
+                try:
+                    proc = subprocess.Popen(
+                        cmd_args,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        startupinfo=startupinfo
+                    )
+                    stdout_data, stderr_data = proc.communicate(timeout=10) # 10秒超时
                 
-                if proc.returncode != 0:
-                    # 尝试解码错误信息 (优先 UTF-8，其次 GBK)
-                    try:
-                        err_msg = stderr_data.decode('utf-8')
-                    except UnicodeDecodeError:
+                    if proc.returncode != 0:
+                        # 尝试解码错误信息 (优先 UTF-8，其次 GBK)
                         try:
-                            err_msg = stderr_data.decode('gbk')
-                        except:
-                            err_msg = str(stderr_data)
-                    print(f"OCR Process Error (Code {proc.returncode}): {err_msg.strip()}")
-                    text = ""
-                else:
-                    # 成功，解码输出
-                    try:
-                        text = stdout_data.decode('utf-8')
-                    except UnicodeDecodeError:
+                            err_msg = stderr_data.decode('utf-8')
+                        except UnicodeDecodeError:
+                            try:
+                                err_msg = stderr_data.decode('gbk')
+                            except:
+                                err_msg = str(stderr_data)
+                        print(f"OCR Process Error (Code {proc.returncode}): {err_msg.strip()}")
+                        text = ""
+                    else:
+                        # 成功，解码输出
                         try:
-                            text = stdout_data.decode('gbk')
-                        except:
-                            print("OCR Output Decode Failed")
-                            text = ""
-            except Exception as sub_e:
-                print(f"Failed to run tesseract directly: {sub_e}")
-                # Fallback (optional, but likely fail if pytesseract was crashing)
-                text = ""
+                            text = stdout_data.decode('utf-8')
+                        except UnicodeDecodeError:
+                            try:
+                                text = stdout_data.decode('gbk')
+                            except:
+                                print("OCR Output Decode Failed")
+                                text = ""
+                except Exception as sub_e:
+                    print(f"Failed to run tesseract directly: {sub_e}")
+                    # Fallback (optional, but likely fail if pytesseract was crashing)
+                    text = ""
             # -----------------------------------------------------------
             
         except Exception as e:
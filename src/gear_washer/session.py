@@ -0,0 +1,314 @@
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+# 会话存档 (只追加):
+#   数据文件: MAGIC + 记录...，每条记录 = 记录头 (类型 4 字节, 负载长度) + 负载
+#     JOB_ 记录: 任务配置 (JSON)，之后的洗炼记录都属于这个任务
+#     ROLL 记录: 元数据长度 + 元数据 (JSON: 次数、识别文本、判定、各阶段耗时、截图尺寸) + 截图 (zlib 压缩的原始像素)
+#   索引文件 (数据文件名 + '.idx'): IDX_MAGIC + 每次洗炼一个定长条目 (记录偏移, 记录长度, 所属任务记录偏移)
+# 先写数据再写索引，每次写完都刷到文件；读取时只承认完整落在数据文件内的条目，
+# 索引缺失、损坏或比数据短 (程序中途退出) 时按数据文件重建，已写完的部分都能读出来。
+MAGIC = b'GWSESS01'
+IDX_MAGIC = b'GWSIDX01'
+KIND_JOB = b'JOB_'
+KIND_ROLL = b'ROLL'
+_RECORD = struct.Struct('<4sI')
+_META_LEN = struct.Struct('<I')
+_IDX = struct.Struct('<QIQ')
+
+DEFAULT_SESSION_DIR = "sessions"
+
+
+def default_session_path(directory: str = DEFAULT_SESSION_DIR) -> str:
+    """按当前时间生成存档路径 (sessions/session_YYYYmmdd_HHMMSS.gws)"""
+    return os.path.join(directory, time.strftime("session_%Y%m%d_%H%M%S.gws"))
+
+
+def index_path(path: str) -> str:
+    return path + '.idx'
+
+
+class SessionRoll(NamedTuple):
+    """存档中的一次洗炼 (截图按需解码，见 image())"""
+    index: int                 # 在存档中的序号 (从 0 开始)
+    attempt: int               # 在所属任务中的第几次洗炼
+    time: float                # 记录时的时间戳 (time.time())
+    text: str                  # 当时的识别文本
+    matched: bool
+    matched_rules: List[str]
+    region: Optional[List[int]]
+    stages: Optional[List[float]]  # 各阶段耗时 (ms，顺序同 telemetry.STAGES)，没有记录时为 None
+    job: Dict                  # 所属任务的配置
+    meta: Dict
+    blob: bytes                # 压缩后的截图 (没有截图时为空)
+
+    def image(self) -> Optional[Image.Image]:
+        if not self.blob:
+            return None
+        return Image.frombytes(self.meta['mode'], tuple(self.meta['size']), zlib.decompress(self.blob))
+
+
+def index_stale(path: str) -> bool:
+    """索引是否需要重建: 不存在、格式不对，或者数据文件里还有索引没有覆盖到的完整洗炼记录"""
+    idx = index_path(path)
+    if not os.path.exists(idx):
+        return True
+    with open(idx, 'rb') as f:
+        if f.read(len(IDX_MAGIC)) != IDX_MAGIC:
+            return True
+        n = (os.fstat(f.fileno()).st_size - len(IDX_MAGIC)) // _IDX.size
+        offset = len(MAGIC)
+        if n:
+            f.seek(len(IDX_MAGIC) + (n - 1) * _IDX.size)
+            last, length, _ = _IDX.unpack(f.read(_IDX.size))
+            offset = last + length
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset > size:
+            return True
+        # 只扫描索引末尾之后的记录头
+        while offset + _RECORD.size <= size:
+            f.seek(offset)
+            kind, length = _RECORD.unpack(f.read(_RECORD.size))
+            end = offset + _RECORD.size + length
+            if kind not in (KIND_JOB, KIND_ROLL) or end > size:
+                break
+            if kind == KIND_ROLL:
+                return True
+            offset = end
+    return False
+
+
+def rebuild_index(path: str) -> int:
+    """
+    顺序扫描数据文件重建索引 (索引丢失或比数据短时使用)，截掉末尾不完整的记录。
+    :return: 洗炼记录数
+    """
+    entries = []
+    with open(path, 'r+b') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是洗炼会话存档: {path}")
+        size = os.fstat(f.fileno()).st_size
+        offset = len(MAGIC)
+        job_offset = 0
+        while offset + _RECORD.size <= size:
+            f.seek(offset)
+            kind, length = _RECORD.unpack(f.read(_RECORD.size))
+            end = offset + _RECORD.size + length
+            if kind not in (KIND_JOB, KIND_ROLL) or end > size:
+                break
+            if kind == KIND_JOB:
+                job_offset = offset
+            else:
+                entries.append(_IDX.pack(offset, end - offset, job_offset))
+            offset = end
+        if offset < size:
+            f.truncate(offset)
+    with open(index_path(path), 'wb') as f:
+        f.write(IDX_MAGIC)
+        f.write(b''.join(entries))
+    return len(entries)
+
+
+class SessionRecorder:
+    """
+    把每次洗炼 (截图、识别文本、判定、各阶段耗时) 追加到会话存档。
+    截图压缩和写盘都在调用线程中进行，洗炼循环里应通过 SideWorker 提交 append，不要直接调用。
+    """
+
+    def __init__(self, path: str, compress_level: int = 1):
+        self.path = path
+        self.compress_level = compress_level
+        self.count = 0  # 存档中的洗炼记录数 (包括以前追加的)
+        self._data = None
+        self._idx = None
+        self._job_offset = 0
+
+    def open(self) -> "SessionRecorder":
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            # 继续追加: 先按数据文件重建索引 (上次可能没有正常关闭，只扫描记录头，很快)
+            self.count = rebuild_index(self.path)
+        self._data = open(self.path, 'ab')
+        if self._data.tell() == 0:
+            self._data.write(MAGIC)
+        self._idx = open(index_path(self.path), 'ab')
+        if self._idx.tell() == 0:
+            self._idx.write(IDX_MAGIC)
+        self._flush()
+        return self
+
+    def begin_job(self, config: Dict):
+        """开始一个任务 (规则、识别参数等回放需要的配置)，之后追加的洗炼都属于它"""
+        self._job_offset = self._data.tell()
+        self._write(KIND_JOB, json.dumps(config, ensure_ascii=False).encode('utf-8'))
+        self._flush()
+
+    def append(self, attempt: int, text: str, matched: bool, matched_rules: List[str],
+               image: Optional[Image.Image] = None, region=None, stages: Optional[List[float]] = None,
+               timestamp: Optional[float] = None):
+        """
+        追加一次洗炼。
+        :param stages: 各阶段耗时 (秒，见 StageTelemetry.last)
+        """
+        meta = {
+            'attempt': attempt,
+            'time': timestamp if timestamp is not None else time.time(),
+            'text': text,
+            'matched': matched,
+            'rules': matched_rules,
+            'region': list(region) if region else None,
+            'stages': [round(s * 1000, 3) for s in stages] if stages else None,
+        }
+        blob = b''
+        if image is not None:
+            meta['mode'] = image.mode
+            meta['size'] = list(image.size)
+            blob = zlib.compress(image.tobytes(), self.compress_level)
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        offset = self._data.tell()
+        length = self._write(KIND_ROLL, _META_LEN.pack(len(meta_bytes)) + meta_bytes, blob)
+        self._idx.write(_IDX.pack(offset, length, self._job_offset))
+        self._flush()
+        self.count += 1
+
+    def _write(self, kind: bytes, *parts: bytes) -> int:
+        length = sum(len(p) for p in parts)
+        self._data.write(_RECORD.pack(kind, length))
+        for part in parts:
+            self._data.write(part)
+        return _RECORD.size + length
+
+    def _flush(self):
+        # 先数据后索引 (程序中途退出时不会留下指向未写完数据的索引条目)
+        self._data.flush()
+        self._idx.flush()
+
+    def close(self):
+        # 先数据后索引，保证索引里的条目都有对应的完整数据
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        if self._idx is not None:
+            self._idx.close()
+            self._idx = None
+
+
+class SessionReader:
+    """
+    按序号随机读取会话存档。数据文件和索引都用 mmap 映射，读取第 i 次洗炼只解析这一条记录，
+    截图在调用 SessionRoll.image() 时才解压，十万帧的存档打开和跳转都不需要整体读入内存。
+    索引缺失、损坏或比数据短时先重建 (见 index_stale)。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._jobs: Dict[int, Dict] = {}
+        if index_stale(path):
+            rebuild_index(path)
+        self._data_file = open(path, 'rb')
+        self._data = self._map(self._data_file)
+        if self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"不是洗炼会话存档: {path}")
+        idx = index_path(path)
+        self._idx_file = open(idx, 'rb')
+        self._idx = self._map(self._idx_file)
+        if self._idx[:len(IDX_MAGIC)] != IDX_MAGIC:
+            self.close()
+            raise ValueError(f"索引文件格式不对: {idx}")
+        self._count = self._valid_entries()
+
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _entry(self, i: int) -> Tuple[int, int, int]:
+        start = len(IDX_MAGIC) + i * _IDX.size
+        return _IDX.unpack_from(self._idx, start)
+
+    def _valid_entries(self) -> int:
+        """索引中完整写入、且数据也已写完的条目数 (索引按偏移递增，从末尾往前找第一个有效条目)"""
+        n = max(0, (len(self._idx) - len(IDX_MAGIC)) // _IDX.size)
+        size = len(self._data)
+        while n > 0:
+            offset, length, _ = self._entry(n - 1)
+            if offset + length <= size:
+                break
+            n -= 1
+        return n
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def job(self, offset: int) -> Dict:
+        job = self._jobs.get(offset)
+        if job is None:
+            if not offset:
+                job = {}
+            else:
+                _, length = _RECORD.unpack_from(self._data, offset)
+                start = offset + _RECORD.size
+                job = json.loads(self._data[start:start + length].decode('utf-8'))
+            self._jobs[offset] = job
+        return job
+
+    def jobs(self) -> List[Dict]:
+        """存档中的所有任务配置 (按录制顺序，只读索引和任务记录)"""
+        offsets = []
+        for i in range(self._count):
+            job_offset = self._entry(i)[2]
+            if not offsets or offsets[-1] != job_offset:
+                offsets.append(job_offset)
+        return [self.job(offset) for offset in offsets]
+
+    def __getitem__(self, i: int) -> SessionRoll:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        offset, length, job_offset = self._entry(i)
+        start = offset + _RECORD.size
+        (meta_len,) = _META_LEN.unpack_from(self._data, start)
+        meta_start = start + _META_LEN.size
+        meta = json.loads(self._data[meta_start:meta_start + meta_len].decode('utf-8'))
+        blob = self._data[meta_start + meta_len:offset + length]
+        return SessionRoll(i, meta['attempt'], meta['time'], meta['text'], meta['matched'], meta['rules'],
+                           meta.get('region'), meta.get('stages'), self.job(job_offset), meta, blob)
+
+    def __iter__(self) -> Iterator[SessionRoll]:
+        return self.iter_range()
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[SessionRoll]:
+        stop = self._count if stop is None else min(stop, self._count)
+        for i in range(max(0, start), stop):
+            yield self[i]
+
+    def close(self):
+        for name in ('_idx', '_data'):
+            mapped = getattr(self, name, None)
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+            setattr(self, name, b'')
+        for name in ('_idx_file', '_data_file'):
+            f = getattr(self, name, None)
+            if f is not None:
+                f.close()
+                setattr(self, name, None)
@@ -0,0 +1,43 @@
+import queue
+import threading
+from typing import Callable, Optional
+
+
+class SideWorker:
+    """
+    副作用线程: 日志输出、调试文件保存、统计、提醒等不影响判定的工作放进队列，由单独的线程按提交顺序执行。
+    洗炼主循环 (悬停 -> 截图 -> OCR -> 判定 -> 按键) 只做一次入队，不等待这些工作完成。
+    """
+
+    def __init__(self, name: str = "side-work", maxsize: int = 1000):
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self.dropped = 0  # 队列满时丢弃的任务数 (主循环永远不为副作用阻塞)
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        try:
+            self._queue.put_nowait((fn, args, kwargs))
+        except queue.Full:
+            self.dropped += 1
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            fn, args, kwargs = item
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"后台任务出错: {e}")
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """
+        执行完队列中剩余的任务后结束线程。
+        :param timeout: 最多等待多少秒，None 表示一直等 (例如等待用户关闭提示框)
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self.dropped:
+            print(f"警告: 后台队列已满，丢弃了 {self.dropped} 条日志/任务")
@@ -0,0 +1,305 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .ocr_distance import DEFAULT_CONFUSIONS
+
+# Median XL 浮窗的文字颜色
+WHITE = (255, 255, 255)   # 基础属性
+BLUE = (105, 105, 255)    # 魔法词缀
+GOLD = (199, 179, 119)    # 装备名称
+GREY = (128, 128, 128)    # 说明文字
+
+# 词缀表: text 中的 {v} 替换为 [min, max] 之间的随机整数，weight 为出现的相对概率
+DEFAULT_AFFIX_TABLE = [
+    {'text': "+{v}% 法术伤害", 'min': 50, 'max': 150},
+    {'text': "+{v} 所有技能", 'min': 1, 'max': 3},
+    {'text': "+{v}% 冰冻系法术伤害", 'min': 10, 'max': 40},
+    {'text': "-{v}% 敌人冰冻抗性", 'min': 5, 'max': 25},
+    {'text': "+{v}% 火焰系法术伤害", 'min': 10, 'max': 40},
+    {'text': "-{v}% 敌人火焰抗性", 'min': 5, 'max': 25},
+    {'text': "+{v} 智力", 'min': 20, 'max': 150},
+    {'text': "+{v} 力量", 'min': 20, 'max': 150},
+    {'text': "冰霜抗性 +{v}%", 'min': 10, 'max': 40},
+    {'text': "生命回复 +{v}", 'min': 5, 'max': 30},
+    {'text': "+{v}% 施法速度", 'min': 10, 'max': 40},
+    {'text': "+{v}% 更佳的机会取得魔法装备", 'min': 10, 'max': 50},
+]
+
+# 浮窗固定的行 (装备名称、基础属性 / 需求、售价)，词缀行插在基础属性和需求之间
+DEFAULT_HEADER = [("卓越之 秘法法杖", GOLD), ("物品强度 800", WHITE)]
+DEFAULT_FOOTER = [("需要等级 120", WHITE), ("出售价格 12000", GREY)]
+
+# 常见的中文字体 (找不到时用 PIL 内置字体，中文会渲染成方块，只能配合 recognize 使用)
+CJK_FONTS = [
+    "C:/Windows/Fonts/msyh.ttc", "C:/Windows/Fonts/simhei.ttf", "C:/Windows/Fonts/simsun.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc", "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+]
+
+
+def find_cjk_font() -> Optional[str]:
+    for path in CJK_FONTS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_affix_table(path: str) -> List[Dict]:
+    """读取 JSON 词缀表 ([{"text": "+{v}% 法术伤害", "min": 50, "max": 150, "weight": 1, "color": [r, g, b]}, ...])"""
+    with open(path, 'r', encoding='utf-8') as f:
+        table = json.load(f)
+    if not isinstance(table, list) or not all(isinstance(e, dict) and 'text' in e for e in table):
+        raise ValueError("词缀表必须是包含 text 字段的对象列表")
+    return table
+
+
+class GameSimulator:
+    """
+    无头的游戏模拟器: 在内存里的 "屏幕" 上渲染 Median XL 风格的装备浮窗 (黑底、彩色中文词缀行、随机数值)，
+    并对悬停和洗炼按键作出反应 (可配置延迟、抖动和丢失的输入)。
+
+    作为 ScreenReader.capture_source (截图)、GearWasher.input_device (悬停 / 按键) 接入后，
+    不需要 Windows 和游戏就能完整运行 GearWasher.run()；可选的 recognize 直接返回渲染的文本 (可按概率注入识别错误)，
+    代替 tesseract。所有时间都按真实时钟计算，状态在截图 / 输入时按需推进，不需要后台线程。
+    """
+
+    def __init__(self, affix_table: Optional[List[Dict]] = None, seed: Optional[int] = None,
+                 affix_count: Tuple[int, int] = (3, 5), screen_size: Tuple[int, int] = (800, 600),
+                 item_rect: Tuple[int, int, int, int] = (100, 250, 56, 84), tooltip_pos: Tuple[int, int] = (200, 80),
+                 tooltip_width: int = 360, line_height: int = 26, font_path: Optional[str] = None, font_size: int = 18,
+                 hover_latency: float = 0.03, reroll_latency: float = 0.08, jitter: float = 0.02,
+                 drop_rate: float = 0.0, ocr_error_rate: float = 0.0):
+        """
+        :param affix_count: 每件装备的词缀数范围 (闭区间)
+        :param item_rect: 装备图标所在的区域 (x, y, w, h)，鼠标在区域内时显示浮窗
+        :param hover_latency: 鼠标移到装备上之后浮窗出现的延迟 (秒)
+        :param reroll_latency: 按下洗炼键之后词缀刷新的延迟 (秒)，刷新完成前画面保持旧的词缀
+        :param jitter: 上面两个延迟的随机抖动 (±秒，均匀分布)
+        :param drop_rate: 按键丢失 (游戏没有收到) 的概率
+        :param ocr_error_rate: recognize 每行注入一处识别错误 (形近字、丢字、数字重复) 的概率
+        """
+        self.rng = random.Random(seed)
+        self.affix_table = affix_table or DEFAULT_AFFIX_TABLE
+        self.affix_count = affix_count
+        self.screen_size = screen_size
+        self.item_rect = item_rect
+        self.tooltip_pos = tooltip_pos
+        self.tooltip_width = tooltip_width
+        self.line_height = line_height
+        self.hover_latency = hover_latency
+        self.reroll_latency = reroll_latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.ocr_error_rate = ocr_error_rate
+        self.header = DEFAULT_HEADER
+        self.footer = DEFAULT_FOOTER
+
+        font_path = font_path or find_cjk_font()
+        self.font_path = font_path
+        self.font = ImageFont.truetype(font_path, font_size) if font_path else ImageFont.load_default()
+
+        self._lock = threading.Lock()
+        self._confusions: Dict[str, List[str]] = {}
+        for a, b in DEFAULT_CONFUSIONS:
+            self._confusions.setdefault(a, []).append(b)
+            self._confusions.setdefault(b, []).append(a)
+
+        # 状态
+        self.affixes: List[Tuple[str, Tuple[int, int, int]]] = []
+        self._hovered = False
+        self._shown_at = 0.0          # 浮窗出现的时间
+        self._refresh_at = None       # 刷新完成的时间 (None 表示没有待刷新的洗炼)
+        self._version = 0             # 每次刷新加 1，用于缓存渲染结果
+        self._canvas = None           # ((version, 是否显示浮窗), 画面, 各行 [(上边界, 下边界, 文本)])
+        # 统计
+        self.rerolls = 0        # 实际生效的洗炼次数
+        self.dropped = 0        # 丢失的按键
+        self.ignored = 0        # 没有悬停或刷新未完成时按下、被游戏忽略的按键
+        self.stale_frames = 0   # 刷新未完成时截到的旧画面
+        # 可选的判定函数 judge(浮窗文本) -> 是否满足目标，设置后统计被洗掉的满足目标的装备 (missed)
+        self.judge: Optional[Callable[[str], bool]] = None
+        self.missed = 0
+        self.new_item()
+
+    # ------------------------------------------------------------------
+    # 装备与渲染
+    # ------------------------------------------------------------------
+    def _roll_affixes(self) -> List[Tuple[str, Tuple[int, int, int]]]:
+        count = self.rng.randint(*self.affix_count)
+        weights = [entry.get('weight', 1.0) for entry in self.affix_table]
+        chosen: List[Dict] = []
+        pool = list(self.affix_table)
+        while pool and len(chosen) < count:
+            entry = self.rng.choices(pool, weights=weights)[0]
+            idx = pool.index(entry)
+            pool.pop(idx)
+            weights.pop(idx)
+            chosen.append(entry)
+        lines = []
+        for entry in chosen:
+            value = self.rng.randint(entry.get('min', 1), entry.get('max', 1))
+            lines.append((entry['text'].replace('{v}', str(value)), tuple(entry.get('color', BLUE))))
+        return lines
+
+    def new_item(self):
+        """换一件新的装备 (随机词缀，取消待刷新的洗炼)"""
+        with self._lock:
+            self.affixes = self._roll_affixes()
+            self._refresh_at = None
+            self._version += 1
+
+    def lines(self) -> List[Tuple[str, Tuple[int, int, int]]]:
+        return self.header + self.affixes + self.footer
+
+    def text(self) -> str:
+        """当前显示的浮窗文本 (不含尚未完成的刷新)"""
+        return '\n'.join(text for text, _ in self.lines())
+
+    def settled_text(self) -> str:
+        """所有待刷新的洗炼都完成之后的浮窗文本 (判断停下时装备实际的词缀)"""
+        with self._lock:
+            if self._refresh_at is not None:
+                self._apply_refresh()
+            return self.text()
+
+    def tooltip_region(self) -> Tuple[int, int, int, int]:
+        """浮窗可能占用的最大区域 (x, y, w, h)，作为 GearWasher.affix_region"""
+        rows = len(self.header) + self.affix_count[1] + len(self.footer)
+        return self.tooltip_pos[0], self.tooltip_pos[1], self.tooltip_width, rows * self.line_height + 16
+
+    def item_center(self) -> Tuple[int, int]:
+        x, y, w, h = self.item_rect
+        return x + w // 2, y + h // 2
+
+    def _render(self, visible: bool):
+        canvas = Image.new('RGB', self.screen_size, (0, 0, 0))
+        rows = []
+        draw = ImageDraw.Draw(canvas)
+        x, y, w, h = self.item_rect
+        draw.rectangle((x, y, x + w - 1, y + h - 1), outline=GREY)
+        if visible:
+            lines = self.lines()
+            left, top = self.tooltip_pos
+            bottom = top + len(lines) * self.line_height + 16
+            draw.rectangle((left, top, left + self.tooltip_width - 1, bottom - 1), fill=(0, 0, 0), outline=(60, 60, 60))
+            for i, (text, color) in enumerate(lines):
+                line_top = top + 8 + i * self.line_height
+                width = draw.textlength(text, font=self.font)
+                draw.text((left + (self.tooltip_width - width) / 2, line_top + 2), text, fill=color, font=self.font)
+                rows.append((line_top, line_top + self.line_height, text))
+        return canvas, rows
+
+    # ------------------------------------------------------------------
+    # 接入 GearWasher
+    # ------------------------------------------------------------------
+    def _latency(self, base: float) -> float:
+        return max(0.0, base + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _apply_refresh(self):
+        if self.judge is not None and self.judge(self.text()):
+            self.missed += 1
+        self.affixes = self._roll_affixes()
+        self._refresh_at = None
+        self._version += 1
+        self.rerolls += 1
+
+    def _advance(self, now: float):
+        if self._refresh_at is not None and now >= self._refresh_at:
+            self._apply_refresh()
+
+    def hover(self, x: int, y: int):
+        """输入设备: 鼠标移动到 (x, y)。移入装备区域后经过 hover_latency 显示浮窗，一直停在区域内不会重新计时"""
+        ix, iy, w, h = self.item_rect
+        inside = ix <= x < ix + w and iy <= y < iy + h
+        with self._lock:
+            if inside and not self._hovered:
+                self._shown_at = time.perf_counter() + self._latency(self.hover_latency)
+            self._hovered = inside
+
+    def press(self, key: str):
+        """输入设备: 按键。Z 键在悬停时触发洗炼，经过 reroll_latency 之后刷新词缀"""
+        if key.lower() != 'z':
+            return
+        with self._lock:
+            now = time.perf_counter()
+            self._advance(now)
+            if self.rng.random() < self.drop_rate:
+                self.dropped += 1
+            elif not self._hovered or self._refresh_at is not None:
+                self.ignored += 1
+            else:
+                self._refresh_at = now + self._latency(self.reroll_latency)
+
+    def capture(self, region: Tuple[int, int, int, int]) -> Image.Image:
+        """
+        截图来源 (ScreenReader.capture_source): 截取内存 "屏幕" 的 region 区域 (x, y, w, h)。
+        截图的 info['sim_text'] 是落在区域内的文字行 (预处理时会随图片一起传递，见 recognize)。
+        """
+        with self._lock:
+            now = time.perf_counter()
+            self._advance(now)
+            visible = self._hovered and now >= self._shown_at
+            if visible and self._refresh_at is not None:
+                self.stale_frames += 1
+            key = (self._version, visible)
+            if self._canvas is None or self._canvas[0] != key:
+                canvas, rows = self._render(visible)
+                self._canvas = (key, canvas, rows)
+            _, canvas, rows = self._canvas
+        x, y, w, h = region
+        image = canvas.crop((x, y, x + w, y + h))
+        image.info['sim_text'] = '\n'.join(text for top, bottom, text in rows
+                                           if y <= (top + bottom) / 2 < y + h)
+        return image
+
+    def recognize(self, image: Image.Image) -> str:
+        """
+        识别函数 (ScreenReader.recognizer): 直接返回截图时记录的文字，
+        每行按 ocr_error_rate 的概率注入一处错误 (形近字替换 / 丢一个字 / 重复一个数字)。
+        """
+        text = image.info.get('sim_text', '')
+        if not self.ocr_error_rate or not text:
+            return text
+        with self._lock:
+            return '\n'.join(self._corrupt(line) if self.rng.random() < self.ocr_error_rate else line
+                             for line in text.split('\n'))
+
+    def _corrupt(self, line: str) -> str:
+        positions = [i for i, ch in enumerate(line) if ch in self._confusions]
+        digits = [i for i, ch in enumerate(line) if ch.isdigit()]
+        kind = self.rng.random()
+        if positions and kind < 0.5:
+            i = self.rng.choice(positions)
+            return line[:i] + self.rng.choice(self._confusions[line[i]]) + line[i + 1:]
+        if digits and kind < 0.75:
+            i = self.rng.choice(digits)
+            return line[:i] + line[i] + line[i:]
+        i = self.rng.randrange(len(line))
+        return line[:i] + line[i + 1:]
+
+    def attach(self, washer, oracle_ocr: bool = True):
+        """
+        把洗炼器接到模拟器上: 前台模式、不绑定窗口，装备位置和识别区域取模拟器的。
+        :param oracle_ocr: True 时用 recognize 代替 tesseract (不需要安装 tesseract 和中文字体)
+        """
+        washer.background_mode = False
+        washer.window_title = None
+        washer.hwnd = None
+        washer.gear_pos = self.item_center()
+        washer.affix_region = self.tooltip_region()
+        washer.input_device = self
+        washer.screen.capture_source = self.capture
+        washer.screen.recognizer = self.recognize if oracle_ocr else None
+        return washer
+
+    def stats(self) -> str:
+        return (f"生效洗炼 {self.rerolls} 次，丢失按键 {self.dropped} 次，被忽略按键 {self.ignored} 次，"
+                f"截到刷新前的旧画面 {self.stale_frames} 次" +
+                (f"，洗掉了满足目标的装备 {self.missed} 次" if self.judge is not None else ""))
@@ -0,0 +1,191 @@
+from typing import Dict, List, Optional, Union
+
+from .affix_record import parse_affix_line
+from .text_normalize import fix_pipe_digits
+
+# 流式判定的三种结果
+REJECT = 'REJECT'        # 无论后面的行是什么都不可能满足规则 -> 可以立刻洗炼
+ACCEPT = 'ACCEPT'        # 无论后面的行是什么规则都已满足 -> 可以立刻停止
+UNDECIDED = 'UNDECIDED'  # 还需要更多的行
+
+
+class StreamingEvaluator:
+    """
+    逐行 (从上到下) 的规则判定器。
+
+    OCR 每产出一行就调用一次 feed()，返回 REJECT / ACCEPT / UNDECIDED。
+    只有在结论 "不可能再被后面的行推翻" 时才会提前给出 REJECT 或 ACCEPT：
+      - NOT 组里任意词缀已经在某一行出现 -> REJECT
+      - COUNT 组已命中的数量超过 max -> REJECT
+      - 规则里没有 NOT / COUNT max 这类会被后续行推翻的条件，且所有组都已满足 -> ACCEPT
+    其余情况一律 UNDECIDED，全部行读完后用 finish() 走一遍完整的 AffixMatcher.check 给出最终结论。
+
+    单行命中之所以能当作确定结论：行文本是整段文本的子串，
+    在某一行里精确包含 (或在完整窗口内模糊包含) 的关键词，在整段文本里也一定能匹配上。
+    逐行扫描与整帧判定使用相同的行数 / 单行长度上限；匹配器挂了词缀目录时，
+    命中要经过目录吸附才算数，逐行的原文匹配不再等价，此时不提前判定，只在 finish 时判定。
+    """
+
+    def __init__(self, matcher, conditions: Union[str, List, Dict], total_lines: Optional[int] = None,
+                 max_affixes_per_line: Optional[int] = None):
+        """
+        :param matcher: AffixMatcher 实例
+        :param conditions: 与 AffixMatcher.check 相同的匹配条件
+        :param total_lines: 本帧总行数 (已知时，读完最后一行立即给出最终结论)
+        :param max_affixes_per_line: 可选的浮窗假设 "每行最多对应几个词缀"。
+            设置后才会根据剩余行数提前判定 AND / COUNT min 已经不可能满足；默认不做该假设。
+        """
+        self.matcher = matcher
+        self.conditions = conditions
+        self.total_lines = total_lines
+        self.max_affixes_per_line = max_affixes_per_line
+
+        self.lines_seen = 0
+        self.segments_seen = 0  # 按 \n 和 | 切分后的非空行数 (与整帧判定的行数口径一致)
+        self.verdict = UNDECIDED
+        self._texts: List[str] = []
+        self._groups = self._build_groups(conditions)
+        self._has_value_affix = any(a['kind'] == 'value' for g in self._groups or [] for a in g['affixes'])
+        # 规则里没有会被后续行推翻的条件时，才允许提前 ACCEPT
+        self._can_accept_early = self._groups is not None and all(
+            g['type'] == 'AND' or (g['type'] == 'COUNT' and g['max'] is None) for g in self._groups
+        )
+
+    def _build_groups(self, conditions) -> Optional[List[Dict]]:
+        """
+        基于预编译规则建立逐行判定用的状态；
+        非组结构的规则 (旧版条件列表) 和目录模式无法流式判定，返回 None (只能在 finish 时判定)。
+        """
+        if self.matcher.catalog is not None:
+            return None
+        rule = self.matcher.compile(conditions)
+        if rule.groups is not None:
+            compiled_groups = rule.groups
+        elif isinstance(rule.conditions, str):
+            compiled_groups = self.matcher.compile([{'type': 'AND', 'affixes': [rule.conditions]}]).groups
+        else:
+            return None
+
+        groups = []
+        for group in compiled_groups:
+            affixes = []
+            for affix in group['affixes']:
+                kind = affix['kind']
+                # 字符串规则里带括号的也按表达式处理 (与 check 一致)
+                if kind == 'text' and '(' in affix['text'] and ')' in affix['text']:
+                    kind = 'expr'
+                affixes.append({
+                    'kind': kind,
+                    'kw': affix['kw'],
+                    'min': affix['min'],
+                    'max': affix['max'],
+                    'hit': False,
+                    # 表达式只能在整段文本上判定，始终视为 "可能命中"
+                    'possible': kind == 'expr',
+                })
+            groups.append({'type': group['type'], 'min': group['min'], 'max': group['max'], 'affixes': affixes})
+        return groups
+
+    def feed(self, line: str) -> str:
+        """喂入 OCR 产出的一行 (可以为空串，仍然计入已读行数)，返回当前判定结果"""
+        if self.verdict != UNDECIDED:
+            return self.verdict
+
+        self.lines_seen += 1
+        self._texts.append(line)
+
+        if self._groups is not None:
+            segments = [seg.strip() for seg in fix_pipe_digits(line).replace('|', '\n').split('\n') if seg.strip()]
+            for seg in segments:
+                self.segments_seen += 1
+                # 整帧判定只看前 MAX_FRAME_LINES 行，超出的行不能产生命中
+                if self.segments_seen > self.matcher.MAX_FRAME_LINES:
+                    break
+                self._scan_segment(seg)
+
+        self.verdict = self._decide()
+        return self.verdict
+
+    def _scan_segment(self, segment: str):
+        """用一行文本更新每个词缀的命中状态"""
+        normalize = self.matcher.normalize_text
+        segment = segment[:self.matcher.MAX_LINE_LENGTH]  # 与整帧判定相同的单行长度上限
+        line_norm = normalize(segment)
+        record = parse_affix_line(segment, self.lines_seen - 1, normalize) if self._has_value_affix else None
+
+        for group in self._groups:
+            for affix in group['affixes']:
+                if affix['hit'] or affix['kind'] == 'expr':
+                    continue
+                kw = affix['kw']
+
+                if affix['kind'] == 'text':
+                    if kw in line_norm:
+                        affix['hit'] = affix['possible'] = True
+                    elif self.matcher._fuzzy_contains(line_norm, kw):
+                        affix['possible'] = True
+                        # 短关键词是逐字滑窗的，行内完整窗口的命中在整段文本中同样成立
+                        if len(kw) < 10 and len(line_norm) >= len(kw):
+                            affix['hit'] = True
+
+                elif self.matcher._fuzzy_contains(record.text, kw):
+                    # 数值条件本来就是逐行判定的，与 check 的结论完全一致
+                    val = record.value_for(kw)
+                    if val is None:
+                        continue
+                    if affix['min'] is not None and val < affix['min']: continue
+                    if affix['max'] is not None and val > affix['max']: continue
+                    affix['hit'] = affix['possible'] = True
+
+    def _decide(self) -> str:
+        if self.total_lines is not None and self.lines_seen >= self.total_lines:
+            return self.finish()
+        if self._groups is None:
+            return UNDECIDED
+
+        remaining = None
+        if self.total_lines is not None:
+            remaining = self.total_lines - self.lines_seen
+
+        all_satisfied = True
+        for group in self._groups:
+            affixes = group['affixes']
+            hits = sum(1 for a in affixes if a['hit'])
+            g_type = group['type']
+
+            if g_type == 'NOT':
+                if hits > 0:
+                    return REJECT
+                continue
+            if g_type == 'COUNT' and group['max'] is not None and hits > group['max']:
+                return REJECT
+
+            if g_type == 'AND':
+                need = len(affixes)
+            elif g_type == 'COUNT' and group['min'] is not None:
+                need = group['min']
+            else:
+                need = 0
+
+            if hits < need:
+                all_satisfied = False
+                if self.max_affixes_per_line and remaining is not None:
+                    possible = sum(1 for a in affixes if a['possible'])
+                    upper = possible + min(len(affixes) - possible, remaining * self.max_affixes_per_line)
+                    if upper < need:
+                        return REJECT
+
+        if all_satisfied and self._can_accept_early:
+            return ACCEPT
+        return UNDECIDED
+
+    def finish(self) -> str:
+        """所有行都已读完 (或 OCR 结束)，用完整文本给出最终结论"""
+        matched = self.matcher.check(self.text, self.conditions)
+        self.verdict = ACCEPT if matched else REJECT
+        return self.verdict
+
+    @property
+    def text(self) -> str:
+        """目前为止读到的全部文本"""
+        return '\n'.join(self._texts)
@@ -0,0 +1,174 @@
+import csv
+import json
+import math
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+# 一次洗炼的各个阶段 (顺序即 CSV 的列顺序)
+STAGES = ('hover', 'hover_wait', 'capture', 'preprocess', 'ocr', 'match', 'key', 'reroll_wait')
+STAGE_NAMES = {
+    'hover': "悬停",
+    'hover_wait': "等待浮窗",
+    'capture': "截图",
+    'preprocess': "预处理",
+    'ocr': "识别",
+    'match': "判定",
+    'key': "按键",
+    'reroll_wait': "等待刷新",
+}
+(HOVER, HOVER_WAIT, CAPTURE, PREPROCESS, OCR, MATCH, KEY, REROLL_WAIT) = range(len(STAGES))
+
+DEFAULT_TELEMETRY_PATH = "telemetry.csv"
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """最近秩法 (ordered 已排序且非空)"""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))]
+
+
+class StageTelemetry:
+    """
+    每次洗炼各阶段耗时的环形记录。
+
+    数据放在预先分配好的 array('d') 中 (capacity 行 x 阶段数)，写满后覆盖最旧的行，
+    循环中只做时间戳相减和下标写入，运行几百万次内存也不会增长。
+    百分位数只在汇总 / 导出时对环中的数据排序计算。
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        n = len(STAGES)
+        self._data = array('d', bytes(8 * capacity * n))  # 各阶段耗时 (秒)
+        self._ends = array('d', bytes(8 * capacity))      # 每次洗炼结束的时间戳 (perf_counter)
+        self._current = array('d', bytes(8 * n))          # 当前这次洗炼的累计值
+        self._mark = 0.0
+        self.count = 0  # 记录过的洗炼总次数
+
+    # ------------------------------------------------------------------
+    # 记录 (洗炼循环中调用)
+    # ------------------------------------------------------------------
+    def begin(self):
+        """开始一次洗炼"""
+        current = self._current
+        for i in range(len(current)):
+            current[i] = 0.0
+        self._mark = time.perf_counter()
+
+    def mark(self, stage: int):
+        """从上一个时间点到现在的耗时记到 stage 上"""
+        now = time.perf_counter()
+        self._current[stage] += now - self._mark
+        self._mark = now
+
+    def split(self, stage: int, parts: Iterable[int], seconds: Iterable[float]):
+        """
+        把已经记在 stage 上的耗时拆出一部分给 parts (例如识别中的截图、预处理耗时由 ScreenReader 单独计时)
+        """
+        current = self._current
+        for part, value in zip(parts, seconds):
+            value = min(value, current[stage])
+            current[part] += value
+            current[stage] -= value
+
+    def end(self):
+        """结束一次洗炼，写入环中"""
+        n = len(STAGES)
+        row = (self.count % self.capacity) * n
+        current = self._current
+        for i in range(n):
+            self._data[row + i] = current[i]
+        self._ends[self.count % self.capacity] = time.perf_counter()
+        self.count += 1
+
+    # ------------------------------------------------------------------
+    # 汇总与导出
+    # ------------------------------------------------------------------
+    def last(self) -> List[float]:
+        """最近一次洗炼各阶段的耗时 (秒)，还没有记录时为空列表"""
+        if not self.count:
+            return []
+        n = len(STAGES)
+        row = ((self.count - 1) % self.capacity) * n
+        return list(self._data[row:row + n])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _order(self) -> List[int]:
+        """环中各行从旧到新的下标"""
+        filled = len(self)
+        start = self.count % self.capacity if self.count > self.capacity else 0
+        return [(start + i) % self.capacity for i in range(filled)]
+
+    def column(self, stage: int) -> List[float]:
+        n = len(STAGES)
+        return [self._data[idx * n + stage] for idx in self._order()]
+
+    def stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """各阶段 (环中最近 capacity 次) 的 p50/p95/p99 与平均值 (毫秒)"""
+        stats = {}
+        for stage, name in enumerate(STAGES):
+            values = sorted(self.column(stage))
+            if not values:
+                continue
+            stats[name] = {
+                'p50': _percentile(values, 50) * 1000,
+                'p95': _percentile(values, 95) * 1000,
+                'p99': _percentile(values, 99) * 1000,
+                'mean': sum(values) / len(values) * 1000,
+            }
+        return stats
+
+    def rolls_per_minute(self) -> float:
+        """按环中最旧、最新两次洗炼的结束时间计算"""
+        order = self._order()
+        if len(order) < 2:
+            return 0.0
+        span = self._ends[order[-1]] - self._ends[order[0]]
+        return (len(order) - 1) / span * 60 if span > 0 else 0.0
+
+    def summary(self) -> str:
+        if not self.count:
+            return "耗时统计: 无记录"
+        lines = [f"耗时统计 (最近 {len(self)} 次 / 共 {self.count} 次，{self.rolls_per_minute():.1f} 次/分钟):"]
+        lines.append("  阶段        p50      p95      p99   (ms)")
+        for name, s in self.stage_stats().items():
+            label = STAGE_NAMES[name]
+            lines.append(f"  {label}{' ' * (10 - 2 * len(label))}{s['p50']:7.1f}  {s['p95']:7.1f}  {s['p99']:7.1f}")
+        return '\n'.join(lines)
+
+    def rows(self) -> List[List[float]]:
+        """[[序号, 结束时间戳, 各阶段耗时(ms)...], ...]，从旧到新"""
+        n = len(STAGES)
+        first = self.count - len(self)
+        return [[first + i, self._ends[idx]] + [self._data[idx * n + s] * 1000 for s in range(n)]
+                for i, idx in enumerate(self._order())]
+
+    def export_csv(self, path: str):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['roll', 'end_time'] + [f"{name}_ms" for name in STAGES])
+            for row in self.rows():
+                writer.writerow([row[0], f"{row[1]:.6f}"] + [f"{v:.3f}" for v in row[2:]])
+
+    def export_json(self, path: str, traces: Optional[Iterable[Dict]] = None):
+        """导出汇总、原始记录，以及可选的匹配追踪记录 (GearWasher.recent_traces)"""
+        data = {
+            'stages': list(STAGES),
+            'count': self.count,
+            'rolls_per_minute': self.rolls_per_minute(),
+            'summary': self.stage_stats(),
+            'rows': self.rows(),
+        }
+        if traces is not None:
+            data['traces'] = list(traces)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def export(self, path: str, traces: Optional[Iterable[Dict]] = None):
+        """按扩展名导出 (.json 为 JSON，其它为 CSV)"""
+        if path.lower().endswith('.json'):
+            self.export_json(path, traces)
+        else:
+            self.export_csv(path)
@@ -0,0 +1,77 @@
+import re
+
+
+# OCR 常见的形近误读 (只收录不会和正常词缀文字冲突的字符)
+CONFUSION_MAP = {
+    '丨': '|',   # 中文竖笔画，几乎都是边框竖线
+    '〇': '0',
+    '○': '0',
+    '×': 'x',
+    '—': '-',
+    '–': '-',
+    '−': '-',
+    '～': '~',
+    '\u3000': ' ',  # 全角空格
+}
+
+# 被两侧数字 / 正负号夹住的竖线其实是数字 1 (例如 "+|5%" "2|0")
+_PIPE_AS_ONE_RE = re.compile(r'(?<=[\d+\-.])\|(?=\d)|(?<=\d)\|(?=[\d%.])')
+
+
+def fix_pipe_digits(text: str) -> str:
+    """
+    把数字上下文中的 | 还原成 1。必须在按 | 切行之前调用。
+    中文竖笔画 丨 先统一成 | (否则 "+1丨0%" 会在查表时变成空格，1 就还原不回来了)。
+    """
+    if '丨' in text:
+        text = text.replace('丨', '|')
+    if '|' not in text:
+        return text
+    return _PIPE_AS_ONE_RE.sub('1', text)
+
+
+class _NormalizeTable(dict):
+    """
+    str.translate 用的映射表，按需计算并缓存每个字符的结果:
+    形近字替换 -> 全角转半角 -> 小写 -> 非文字字符 (标点/符号) 变成空格。
+    与旧的 re.sub(r'[^\\w\\s]', ' ') 规则一致，只是多了全角折叠和形近字替换。
+    """
+
+    def __missing__(self, code: int) -> str:
+        ch = chr(code)
+        ch = CONFUSION_MAP.get(ch, ch)
+        if len(ch) == 1 and 0xFF01 <= ord(ch) <= 0xFF5E:
+            ch = chr(ord(ch) - 0xFEE0)
+        ch = ch.lower()
+        result = ''.join(c if (c.isalnum() or c == '_' or c.isspace()) else ' ' for c in ch)
+        self[code] = result
+        return result
+
+
+_TABLE = _NormalizeTable()
+
+
+def _is_cjk(ch: str) -> bool:
+    # 基本区 / 扩展 A / 兼容汉字
+    return '\u4e00' <= ch <= '\u9fff' or '\u3400' <= ch <= '\u4dbf' or '\uf900' <= ch <= '\ufaff'
+
+
+def normalize_ocr_text(text: str) -> str:
+    """
+    OCR 文本标准化 (关键词和屏幕文本都要经过同一个函数):
+    1. 丨 统一成 |，数字上下文里的 | 还原成 1
+    2. 查表完成形近字替换、全角转半角、小写、标点转空格
+    3. 合并空白，并去掉两个汉字之间的空格 (chi_sim 经常输出 "法 术 伤 害")
+    """
+    if not text:
+        return ''
+    tokens = fix_pipe_digits(text).translate(_TABLE).split()
+    if not tokens:
+        return ''
+
+    parts = [tokens[0]]
+    for prev, tok in zip(tokens, tokens[1:]):
+        if not (_is_cjk(prev[-1]) and _is_cjk(tok[0])):
+            parts.append(' ')
+        parts.append(tok)
+    return ''.join(parts)
@@ -0,0 +1,156 @@
+import math
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+class RunningPercentiles:
+    """最近 maxlen 个样本的百分位数 (样本很少，取值时排序即可)"""
+
+    def __init__(self, maxlen: int = 100):
+        self.samples = deque(maxlen=maxlen)
+
+    def add(self, value: float):
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))
+        return ordered[idx]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class TimingProfile:
+    """
+    某件装备的等待时间画像。
+
+    两类等待:
+    - hover:  鼠标移到装备上之后，浮窗出现并稳定需要的时间
+    - reroll: 按下洗炼键之后，浮窗内容刷新并稳定需要的时间
+    每类记录最近的实测值，等待时间 = p90 * (1 + MARGIN_RATIO) + MARGIN_ABS，并限制在 [MIN_WAIT, MAX_WAIT]。
+    样本不足时使用默认值；运行中每 MEASURE_EVERY 次实测一次，画像随游戏的实际刷新速度调整。
+    连续 MAX_FAILURES 次实测都没有测出结果 (检测不到画面变化而超时) 时，本次运行不再实测这一类，
+    一直按 wait() 等待，避免每次都白等一个 timeout()。
+    """
+
+    KINDS = ('hover', 'reroll')
+    MIN_SAMPLES = 5
+    MEASURE_EVERY = 5
+    MARGIN_RATIO = 0.2
+    MARGIN_ABS = 0.02
+    MIN_WAIT = 0.02
+    MAX_WAIT = 2.0
+    MAX_FAILURES = 3
+
+    def __init__(self, defaults: Dict[str, float]):
+        self.defaults = dict(defaults)
+        self.stats = {kind: RunningPercentiles() for kind in self.KINDS}
+        self._counters = {kind: 0 for kind in self.KINDS}
+        self.failures = {kind: 0 for kind in self.KINDS}  # 连续失败的实测次数
+
+    def wait(self, kind: str) -> float:
+        stat = self.stats[kind]
+        if len(stat) < self.MIN_SAMPLES:
+            return self.defaults[kind]
+        value = stat.percentile(90) * (1 + self.MARGIN_RATIO) + self.MARGIN_ABS
+        return min(self.MAX_WAIT, max(self.MIN_WAIT, value))
+
+    def timeout(self, kind: str) -> float:
+        """实测时最多等多久 (超过仍未稳定就放弃这次测量)"""
+        return min(self.MAX_WAIT, max(0.5, 3 * self.wait(kind)))
+
+    def should_measure(self, kind: str) -> bool:
+        if self.failures[kind] >= self.MAX_FAILURES:
+            return False
+        self._counters[kind] += 1
+        return len(self.stats[kind]) < self.MIN_SAMPLES or self._counters[kind] % self.MEASURE_EVERY == 0
+
+    def record(self, kind: str, seconds: float):
+        self.stats[kind].add(seconds)
+        self.failures[kind] = 0
+
+    def record_failure(self, kind: str):
+        """一次实测超时 (没有检测到画面变化或一直不稳定)"""
+        self.failures[kind] += 1
+        if self.failures[kind] == self.MAX_FAILURES:
+            print(f"自适应等待: 连续 {self.MAX_FAILURES} 次没有测出{'浮窗出现' if kind == 'hover' else '洗炼刷新'}时间，"
+                  f"本次不再实测，固定等待 {self.wait(kind) * 1000:.0f}ms")
+
+    def summary(self) -> str:
+        parts = []
+        for kind, name in zip(self.KINDS, ("浮窗出现", "洗炼刷新")):
+            stat = self.stats[kind]
+            if len(stat):
+                parts.append(f"{name} p50 {stat.percentile(50) * 1000:.0f}ms / p90 {stat.percentile(90) * 1000:.0f}ms "
+                             f"(样本 {len(stat)}) -> 等待 {self.wait(kind) * 1000:.0f}ms")
+            else:
+                parts.append(f"{name} 无样本 -> 等待 {self.wait(kind) * 1000:.0f}ms")
+        return "；".join(parts)
+
+    # ------------------------------------------------------------------
+    # 持久化 (SimpleDB 中按装备保存)
+    # ------------------------------------------------------------------
+    def to_dict(self) -> Dict:
+        return {kind: [round(v, 4) for v in self.stats[kind].samples] for kind in self.KINDS}
+
+    @classmethod
+    def from_dict(cls, data, defaults: Dict[str, float]) -> "TimingProfile":
+        profile = cls(defaults)
+        if isinstance(data, dict):
+            for kind in cls.KINDS:
+                for value in data.get(kind) or []:
+                    try:
+                        value = float(value)
+                    except (TypeError, ValueError):
+                        continue
+                    # 旧版会把 "浮窗本来就显示着" 记成 0，不能当作实测值
+                    if value > 0:
+                        profile.record(kind, value)
+        return profile
+
+
+def changed_fraction(a: bytes, b: bytes, pixel_delta: int = 8) -> float:
+    """
+    两张同尺寸缩略图 (灰度字节) 中差值超过 pixel_delta 的像素比例 (0-1)。
+    洗炼只改变几行文字，整张浮窗的平均差很小 (常常不到 1)，但变化的那些像素差值都很明显。
+    """
+    if len(a) != len(b) or not a:
+        return 1.0
+    return sum(1 for x, y in zip(a, b) if abs(x - y) > pixel_delta) / len(a)
+
+
+def measure_settle(capture: Callable[[], Optional[bytes]], baseline: bytes, timeout: float,
+                   wait: Callable[[float], bool], poll: float = 0.01, change_threshold: float = 0.005,
+                   quiet: Optional[float] = None) -> Optional[float]:
+    """
+    轮询截图，测量画面 "先变化、再稳定" 所需的时间。
+    :param capture: 返回当前区域缩略图的函数
+    :param baseline: 操作之前的缩略图
+    :param wait: 可中断的等待函数，返回 True 表示被中止
+    :param change_threshold: 变化像素的比例超过该值才算画面变化 (见 changed_fraction)
+    :param quiet: 画面保持不变超过这么多秒时返回 0 (本来就不需要等待，例如浮窗已经显示；不是实测值，不要记录)
+    :return: 从开始到画面稳定的秒数；超时、被中止或截图失败时返回 None
+    """
+    start = time.perf_counter()
+    prev, prev_time = baseline, 0.0
+    changed = False
+    while time.perf_counter() - start < timeout:
+        if wait(poll):
+            return None
+        current = capture()
+        if current is None:
+            return None
+        now = time.perf_counter() - start
+        if not changed:
+            changed = changed_fraction(current, baseline) > change_threshold
+            if not changed and quiet is not None and now >= quiet:
+                return 0.0
+        elif changed_fraction(current, prev) <= change_threshold:
+            # 连续两帧相同: 上一帧时就已经稳定了
+            return prev_time
+        prev, prev_time = current, now
+    return None
@@ -0,0 +1,175 @@
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# 日志类别 (记录在 record.category 上，控制台按类别限速)
+ROLL = 'roll'        # 每次洗炼的详细记录 (识别文本、判定结果)
+SUMMARY = 'summary'  # 定期汇总
+EVENT = 'event'      # 成功、停止、预算用完等关键事件 (不限速)
+OCR = 'ocr'          # 识别出错
+TRACE = 'trace'      # 匹配追踪
+
+DEFAULT_LOG_FILE = "wash_log.txt"
+
+# 控制台上需要限速的类别 (WARNING 及以上不限速)
+RATE_LIMITED = (ROLL, OCR, TRACE)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按类别限速: 每个类别每 period 秒最多放行 burst 条 (低于 WARNING 的记录)，
+    超出的丢弃并计数，下一条放行的记录后面附上省略的条数。
+    """
+
+    def __init__(self, burst: int = 5, period: float = 1.0, categories=RATE_LIMITED):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.categories = categories
+        self._windows: Dict[str, list] = {}  # 类别 -> [窗口开始时间, 已放行, 已丢弃]
+        self.dropped = 0  # 累计丢弃的条数
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, 'category', None)
+        if category not in self.categories or record.levelno >= logging.WARNING:
+            return True
+        now = record.created
+        window = self._windows.get(category)
+        if window is None or now - window[0] >= self.period:
+            dropped = window[2] if window else 0
+            self._windows[category] = [now, 1, 0]
+            if dropped:
+                record.msg = f"{record.getMessage()}  (已省略 {dropped} 条)"
+                record.args = None
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        self.dropped += 1
+        return False
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """入队时不格式化 (同一进程内传递，格式化留给后台线程)"""
+
+    def prepare(self, record):
+        return record
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """每次都写当前的 sys.stdout (GUI 会把 stdout 重定向到日志框)"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+class WashLog:
+    """
+    洗炼日志。
+
+    - 控制台 (stdout，GUI 中就是日志框): INFO 及以上，按类别限速；
+      每次洗炼的详细记录默认只进文件，控制台每 summary_every 次或 summary_interval 秒输出一行汇总
+      (verbose=True 时每次洗炼也输出到控制台，仍然限速)
+    - 文件 (file_path，可选): DEBUG 及以上，包含每次洗炼的完整识别文本
+    记录在洗炼循环里只入队，格式化和写入都在 QueueListener 的后台线程中进行。
+    """
+
+    def __init__(self, prefix: str = "", verbose: bool = False, file_path: Optional[str] = None,
+                 summary_every: int = 100, summary_interval: float = 10.0,
+                 rate_burst: int = 5, rate_period: float = 1.0):
+        self.prefix = prefix
+        self.verbose = verbose
+        self.file_path = file_path
+        self.summary_every = summary_every
+        self.summary_interval = summary_interval
+
+        # 不注册到 logging 的全局表中: 多个洗炼器 (多窗口) 各自一份，互不影响
+        self._logger = logging.Logger("gear_washer")
+        self._logger.setLevel(logging.DEBUG if file_path else logging.INFO)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._logger.addHandler(_DeferredQueueHandler(self._queue))
+
+        console = _StdoutHandler()
+        console.setLevel(logging.INFO)
+        console.setFormatter(logging.Formatter(f"{prefix}%(message)s"))
+        self._limiter = RateLimitFilter(rate_burst, rate_period)
+        console.addFilter(self._limiter)
+        self._handlers = [console]
+        if file_path:
+            try:
+                file_handler = logging.FileHandler(file_path, encoding='utf-8')
+            except OSError as e:
+                print(f"警告: 无法打开日志文件 {file_path} ({e})，只输出到控制台")
+                self._logger.setLevel(logging.INFO)
+            else:
+                file_handler.setLevel(logging.DEBUG)
+                file_handler.setFormatter(logging.Formatter(
+                    f"%(asctime)s %(levelname)s [{prefix.strip() or '-'}] [%(category)s] %(message)s"))
+                self._handlers.append(file_handler)
+        self._listener = QueueListener(self._queue, *self._handlers, respect_handler_level=True)
+
+        self._roll_level = logging.INFO if verbose else logging.DEBUG
+        self.rolls = 0
+        self._started = time.perf_counter()
+        self._last_summary = (self._started, 0)
+        self._running = False
+
+    def start(self):
+        if not self._running:
+            self._listener.start()
+            self._running = True
+        return self
+
+    def close(self):
+        """输出完剩余的记录后停止后台线程"""
+        if self._running:
+            self._listener.stop()
+            self._running = False
+        for handler in self._handlers[1:]:
+            handler.close()
+        if self._limiter.dropped:
+            where = f"，完整记录见 {self.file_path}" if self.file_path else ""
+            print(f"{self.prefix}(日志限速: 控制台共省略 {self._limiter.dropped} 条{where})")
+            self._limiter.dropped = 0
+
+    def _log(self, level: int, category: str, msg: str, *args):
+        self._logger.log(level, msg, *args, extra={'category': category})
+
+    # ------------------------------------------------------------------
+    # 洗炼循环中使用
+    # ------------------------------------------------------------------
+    def roll(self, attempt: int, text: str, matched: bool, label: str = ""):
+        """一次洗炼的详细记录 (控制台默认不显示)，并按间隔输出汇总"""
+        self.rolls += 1
+        if self._logger.isEnabledFor(self._roll_level):
+            self._log(self._roll_level, ROLL, "%s第 %d 次: %s -> %s", label, attempt,
+                      text.replace("\n", " | "), "命中" if matched else "未匹配，已洗炼")
+        now = time.perf_counter()
+        last_time, last_rolls = self._last_summary
+        if self.rolls - last_rolls >= self.summary_every or now - last_time >= self.summary_interval:
+            rate = (self.rolls - last_rolls) / (now - last_time) if now > last_time else 0.0
+            self._log(logging.INFO, SUMMARY, "[进度] 已洗炼 %d 次 (%.1f 次/秒)，最近: %s%s",
+                      self.rolls, rate, label, text.replace("\n", " | "))
+            self._last_summary = (now, self.rolls)
+
+    def detail(self, msg: str, *args):
+        """与每次洗炼相关的细节 (流式识别的提前结论等)，级别同 roll"""
+        if self._logger.isEnabledFor(self._roll_level):
+            self._log(self._roll_level, ROLL, msg, *args)
+
+    def event(self, msg: str, *args):
+        self._log(logging.INFO, EVENT, msg, *args)
+
+    def ocr_error(self, msg: str, *args):
+        self._log(logging.INFO, OCR, msg, *args)
+
+    def trace(self, msg: str):
+        self._log(logging.INFO, TRACE, "%s", msg)
@@ -1,13 +1,35 @@
+import os
+import threading
 import time
-import pyautogui
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import pyautogui
+except Exception:  # 没有桌面环境 (例如 Linux 无显示器) 时导入会失败，只能使用 input_device
+    pyautogui = None
 import json
 try:
     import keyboard
 except ImportError:
     keyboard = None
 
+from .affix_catalog import AffixCatalog
+from .calibration import ThresholdTable
+from .interleave import InterleavedItem
+from .jobs import MATCHED, EXHAUSTED, TIME_UP, STOPPED, SKIPPED, job_result, format_results
+from .layout import TooltipLayout
+from .match_trace import format_trace
 from .matcher import AffixMatcher
+from .ocr_distance import ConfusionTable
+from .rule_validator import validate_rule, has_errors, format_issues
 from .screen import ScreenReader
+from .session import SessionRecorder
+from .side_work import SideWorker
+from .telemetry import (DEFAULT_TELEMETRY_PATH, StageTelemetry, HOVER, HOVER_WAIT, CAPTURE, PREPROCESS, OCR,
+                        MATCH, KEY, REROLL_WAIT)
+from .timing import TimingProfile, measure_settle
+from .wash_log import WashLog
+from .streaming import StreamingEvaluator, ACCEPT, UNDECIDED
 from . import win32_utils # 导入窗口工具
 
 class GearWasher:
@@ -23,33 +45,119 @@ class GearWasher:
         self.gear_pos = None     # (x, y) 装备悬停位置 (可能是相对坐标)
         self.affix_region = None  # (x, y, w, h) 词缀识别区域 (如果是相对模式，xy为相对)
         self.window_title = None  # 绑定的窗口标题，如果不为None，则启用相对坐标模式
+        self.hwnd = None          # 绑定的窗口句柄 (多开时同标题的窗口有多个，设置后优先于 window_title)
         self.wash_button_pos = None # (x, y) 洗炼按钮位置
         self.conditions = None
+        self.rule_id = None      # 当前规则在数据库中的 ID (可选，用于规则修改后清理匹配缓存)
+        self.rule_set = None     # 多目标模式: {规则名: 条件}，任意一条满足即停止 (设置后优先于 conditions)
+        self.matched_rules = []  # 最近一次成功时命中的规则名列表
+        self.db = None           # SimpleDB (可选)，用于持久化规则的求值顺序
         self.max_attempts = 10000
+        self.time_budget = None  # 单个任务的时间预算(秒)，None 表示不限时
+        self.start_delay = 1.0  # 开始前等待的时间(秒)，留给用户切换到游戏窗口
         self.interval = 0.2 # 每次洗炼间隔(秒) - 默认加快速度
+        self.hover_wait = 0.1  # 鼠标移到装备上之后等待浮窗出现的时间(秒)
+        # 自适应等待: 实测浮窗出现 / 洗炼刷新需要多久，按百分位数 + 余量设置等待时间，
+        # 按装备保存在数据库中 (样本不足时使用上面的 interval / hover_wait)
+        self.adaptive_timing = False
+        self._timing = None
+        # 流式识别: 按行 OCR 并逐行判定，一旦确定不满足就立刻洗炼，剩下的行不再识别
+        # (每行单独调用一次 tesseract，词缀行较多且规则很少能提前判定时反而更慢，默认关闭)
+        self.streaming_ocr = False
+        # 已知词缀目录文件 (可选)，设置且文件存在时每行 OCR 先吸附到最近的目录条目
+        self.affix_catalog_path = None
+        # 形近字加权匹配: True 时用加权编辑距离代替 SequenceMatcher，
+        # 代价表优先读取 confusion_path (可用 learn_confusions.py 生成)，不存在时使用内置表
+        self.weighted_matching = False
+        self.confusion_path = None
+        # 校准阈值表 (calibrate_thresholds.py 生成)，文件存在时按关键词 / 长度使用各自的模糊匹配阈值
+        self.threshold_path = None
+        # 数值二次识别: 对带数值条件的词缀所在行，把数值部分裁出来只按数字再识别一次 (多一次 tesseract 调用)
+        self.digit_ocr = False
+        # 只识别词缀区: 先用几次完整截图学习浮窗布局 (固定行 / 词缀行)，之后只截取、识别词缀行，
+        # 定期完整截图校验一次。布局按装备保存在数据库中 (equipment_id 为空时按截图区域区分)
+        self.roi_layout = False
+        self.equipment_id = None
+        self._layout = None
+        # 匹配追踪: 每次未匹配时在日志中打印每组判定、命中行、得分/数值与耗时，
+        # 最近的追踪记录保存在 recent_traces 中 (供导出)。关闭时没有额外开销
+        self.trace_matching = False
+        self.recent_traces = deque(maxlen=200)
+        # 日志: 每次洗炼的识别文本默认只写入 log_file (可选)，控制台每 summary_every 次 / summary_interval 秒输出一行汇总；
+        # verbose_log=True 时每次洗炼都输出到控制台 (按类别限速)。见 wash_log.WashLog
+        self.verbose_log = False
+        self.log_file = None
+        self.log_prefix = ""  # 多窗口并行时区分各窗口的前缀
+        self.summary_every = 100
+        self.summary_interval = 10.0
+        self._wlog = None
+        # 耗时统计: 记录每次洗炼各阶段 (悬停、等待、截图、预处理、识别、判定、按键、等待刷新) 的耗时，
+        # 结束时打印 p50/p95/p99 并导出到 telemetry_path (.csv 或 .json)，运行中也可以调用 export_telemetry()
+        self.record_timing = False
+        self.telemetry_path = None
+        self.telemetry = None
+        # 会话录制: 设置后每次洗炼的截图、识别文本、判定和各阶段耗时追加到该存档 (见 session.SessionRecorder)，
+        # 之后可以用 replay() / replay_session.py 离线回放
+        self.session_path = None
+        # 可选的输入设备 (有 hover(x, y) 和 press(key) 方法，见 simulator.GameSimulator)，设置后代替鼠标 / 键盘消息
+        self.input_device = None
+        # 跳过 run() 里的规则检查 (调用方已经检查过并让用户确认过时设置)
+        self.skip_rule_validation = False
         
-        # 中止信号标志位
-        self.stop_requested = False
-        if keyboard:
-            try:
-                # 注册全局热键，确保即使在 busy 时也能捕获按键
-                # 注意：如果 gui 已经注册了 stop_key，这里再次注册可能会冲突或冗余，
-                # 但为了保证独立运行时的健壮性，我们可以尝试注册。
-                # 更好的做法是由外部控制 stop()，这里只作为备用兜底。
-                pass 
-                # keyboard.add_hotkey(self.stop_key, self._on_stop_signal)
-            except Exception as e:
-                print(f"热键注册失败: {e}")
+        # 中止信号: 由 stop() / 热键回调设置，所有等待都用 Event.wait，按下即醒，不再轮询按键
+        self._stop_event = threading.Event()
+        # run() 期间是否自己注册停止热键 (命令行运行时需要；GUI 已经注册了全局热键并调用 stop()，会关掉它)
+        self.register_stop_hotkey = True
+        # 结束时是否弹出提示框 (多窗口并行时由控制器统一提示)
+        self.show_message_box = True
+
+    @property
+    def stop_requested(self) -> bool:
+        return self._stop_event.is_set()
+
+    @stop_requested.setter
+    def stop_requested(self, value: bool):
+        if value:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
 
     def _on_stop_signal(self):
-        """停止信号回调"""
-        if not self.stop_requested:
+        """停止信号回调 (可能在热键线程中调用)"""
+        if not self._stop_event.is_set():
             print(f"\n>>> 已捕获停止信号，正在停止... <<<")
-            self.stop_requested = True
+            self._stop_event.set()
 
     def stop(self):
         self._on_stop_signal()
 
+    # run_jobs() 中每个任务会改写的配置 (队列结束后恢复)
+    _JOB_FIELDS = ('gear_pos', 'affix_region', 'window_title', 'equipment_id', 'conditions',
+                   'rule_id', 'rule_set', 'max_attempts', 'time_budget')
+    # 会话存档中每个任务记录的配置 (回放时恢复)
+    _SESSION_FIELDS = ('conditions', 'rule_set', 'rule_id', 'equipment_id', 'affix_region', 'ocr_scale_factor',
+                       'digit_ocr', 'streaming_ocr', 'roi_layout', 'weighted_matching', 'confusion_path',
+                       'threshold_path', 'affix_catalog_path')
+
+    def _register_stop_hotkey(self):
+        """注册停止热键，返回用于注销的句柄 (未注册时为 None)"""
+        if not (keyboard and self.register_stop_hotkey and self.stop_key):
+            return None
+        try:
+            return keyboard.add_hotkey(self.stop_key, self._on_stop_signal)
+        except Exception as e:
+            print(f"热键注册失败: {e}")
+            return None
+
+    @staticmethod
+    def _remove_hotkey(hotkey):
+        if hotkey is None:
+            return
+        try:
+            keyboard.remove_hotkey(hotkey)
+        except Exception:
+            pass
+
     def _wait_for_key(self):
         """等待按键确认坐标"""
         while True:
@@ -163,64 +271,373 @@ class GearWasher:
         print("\n设置完成！")
 
     def _check_stop(self):
-        """检查是否有停止信号"""
-        # 1. 检查标志位
-        if self.stop_requested:
-            return True
-            
-        # 2. 直接检查按键状态 (作为备用)
-        if keyboard:
-            try:
-                # 兼容组合键检测可能比较复杂，这里只做简单的单键检测
-                # 如果用户设置了 ctrl+plus，keyboard.is_pressed('ctrl+plus') 是支持的
-                if keyboard.is_pressed(self.stop_key):
-                    if not self.stop_requested: # 防止重复日志
-                        print(f"\n\n>>> 检测到 {self.stop_key} (直接)，正在停止... <<<")
-                    self.stop_requested = True 
-                    return True
-            except:
-                # 某些键名可能导致异常，忽略之
-                pass
-            
-        return False
+        """检查是否有停止信号 (只读一个标志位，不再查询按键状态)"""
+        return self._stop_event.is_set()
 
     def _smart_sleep(self, duration):
         """
-        智能等待：将长时间的 sleep 切割成小段，
-        期间不断检查由 _check_stop 定义的中止条件。
+        可中断的等待：收到停止信号时立刻返回。
         返回 True 表示被中止，False 表示等待完成。
         """
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            if self._check_stop():
-                return True
-            # 检测频率：每 0.05 秒检查一次
-            time.sleep(0.05)
+        return self._stop_event.wait(duration)
+
+    def _read_streaming(self, region, rule, hwnd=None):
+        """
+        逐行识别并判定。一旦得到确定结论就关闭行生成器，后面的行不再 OCR。
+        :return: (已识别的文本, ACCEPT/REJECT)
+        """
+        evaluator = StreamingEvaluator(self.matcher, rule)
+        lines = self.screen.iter_text_lines(region, scale_factor=self.ocr_scale_factor, hwnd=hwnd)
+        verdict = UNDECIDED
+        try:
+            for line, total in lines:
+                evaluator.total_lines = total
+                verdict = evaluator.feed(line)
+                if verdict != UNDECIDED:
+                    if evaluator.lines_seen < total:
+                        self._wlog.detail("[流式] 第 %d/%d 行已得出结论: %s", evaluator.lines_seen, total, verdict)
+                    break
+        finally:
+            lines.close()
+
+        if verdict == UNDECIDED:
+            verdict = evaluator.finish()
+        return evaluator.text, verdict
+
+    @staticmethod
+    def _order_key(rule):
+        """求值顺序的存储 key: 有规则 ID 时按 ID，否则按规则指纹"""
+        return f"rule_order_{rule.rule_id if rule.rule_id is not None else rule.fingerprint}"
+
+    def _load_rule_orders(self, rules):
+        """从数据库恢复上次学习到的组/词缀求值顺序 (规则内容变化后自动失效)"""
+        if not self.db:
+            return
+        for rule in rules:
+            if rule.groups and rule.import_order(self.db.get(self._order_key(rule))):
+                print(f"已加载规则求值顺序: {rule}")
+
+    def _save_rule_orders(self, rules):
+        """按本次运行的观测结果重新排序并保存"""
+        if not self.db:
+            return
+        for rule in rules:
+            if not rule.groups or not any(s[0] for s in rule.group_stats):
+                continue
+            rule.reorder()
+            self.db.set(self._order_key(rule), rule.export_order())
+
+    def _load_confusions(self):
+        """按配置启用形近字加权匹配 (必须在加载词缀目录之前)"""
+        if not self.weighted_matching:
+            self.matcher.set_confusions(None)
+            return
+        table = ConfusionTable()
+        if self.confusion_path and os.path.exists(self.confusion_path):
+            try:
+                table = ConfusionTable.load(self.confusion_path)
+            except (OSError, ValueError) as e:
+                print(f"警告: 读取形近字表失败 ({e})，使用内置表")
+        self.matcher.set_confusions(table)
+        print(f"已启用形近字加权匹配: {len(table.costs) // 2} 组形近字")
+
+    def _load_thresholds(self):
+        """按配置加载校准阈值表 (必须在加载词缀目录之前)"""
+        if not self.threshold_path or not os.path.exists(self.threshold_path):
+            self.matcher.set_thresholds(None)
+            return
+        try:
+            table = ThresholdTable.load(self.threshold_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"警告: 读取阈值表失败 ({e})，使用默认阈值 {self.matcher.DEFAULT_THRESHOLD}")
+            self.matcher.set_thresholds(None)
+            return
+        self.matcher.set_thresholds(table)
+        print(f"已加载校准阈值: 长度分桶 {len(table.by_length)} 个，单独关键词 {len(table.by_keyword)} 个")
+
+    def _load_catalog(self):
+        """按配置加载词缀目录 (文件不存在时关闭目录模式)"""
+        if not self.affix_catalog_path:
+            self.matcher.set_catalog(None)
+            return
+        if not os.path.exists(self.affix_catalog_path):
+            print(f"警告: 找不到词缀目录 {self.affix_catalog_path}，按普通模糊匹配运行 (可用 build_affix_catalog.py 生成)")
+            self.matcher.set_catalog(None)
+            return
+        try:
+            catalog = AffixCatalog.load(self.affix_catalog_path)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"警告: 读取词缀目录失败: {e}")
+            self.matcher.set_catalog(None)
+            return
+        self.matcher.set_catalog(catalog)
+        print(f"已加载词缀目录: {len(catalog)} 条")
+
+    def _digit_line_filter(self, rules):
+        """
+        数值二次识别的行过滤: 只处理包含带数值条件词缀的行。
+        未开启、或规则里没有数值条件时返回 None (不做二次识别)。
+        """
+        if not self.digit_ocr:
+            return None
+        keywords = []
+        for rule in rules:
+            keywords.extend(kw for kw in rule.value_keywords() if kw not in keywords)
+        if not keywords:
+            return None
+        if self.streaming_ocr and not self.rule_set:
+            print("提示: 流式识别模式下不做数值二次识别")
+            return None
+        print(f"已启用数值二次识别: {', '.join(keywords)}")
+        return lambda line: self.matcher.mentions_any(line, keywords)
+
+    def _equipment_key(self, prefix):
+        """按装备保存数据的 key (equipment_id 为空时按窗口和截图区域区分)"""
+        if self.equipment_id is not None:
+            return f"{prefix}_{self.equipment_id}"
+        return f"{prefix}_{self.window_title}_{tuple(self.affix_region)}"
+
+    def _layout_allowed(self, layout, rules):
+        """规则里的关键词出现在固定行 (装备名、基础属性等) 中时不能只识别词缀区"""
+        for rule in rules:
+            hits = [kw for kw in rule.all_keywords if self.matcher.mentions_any(layout.fixed_text, [kw])]
+            if hits:
+                print(f"提示: 规则关键词 {', '.join(hits)} 出现在浮窗的固定行中，仍然识别整个区域")
+                return False
+        return True
+
+    def _load_layout(self, rules):
+        """按配置准备浮窗布局 (读取已保存的布局，没有则从头学习)"""
+        self._layout = None
+        if not self.roi_layout:
+            return
+        if self.streaming_ocr and not self.rule_set:
+            print("提示: 流式识别模式下不使用词缀区裁剪")
+            return
+        size = tuple(self.affix_region[2:4])
+        layout = TooltipLayout.from_dict(self.db.get(self._equipment_key('tooltip_layout')), size) if self.db else None
+        if layout is not None:
+            if not self._layout_allowed(layout, rules):
+                return
+            top, bottom = layout.affix_span
+            print(f"已加载浮窗布局: 只识别第 {top}-{bottom} 像素行 (共 {size[1]})")
+        self._layout = layout or TooltipLayout(size)
+
+    def _read_with_layout(self, region, hwnd, digit_filter, rules):
+        """
+        按浮窗布局识别: 布局可用时只截取词缀区；学习阶段和定期校验时截取整个区域并记录行带。
+        """
+        layout = self._layout
+        if layout.ready and not layout.due_for_verify():
+            layout.rolls_since_verify += 1
+            return self.screen.read_text(layout.crop(region), scale_factor=self.ocr_scale_factor, hwnd=hwnd,
+                                         digit_filter=digit_filter)
+
+        text, rows = self.screen.read_text_rows(region, scale_factor=self.ocr_scale_factor, hwnd=hwnd,
+                                                digit_filter=digit_filter)
+        if layout.ready:
+            if layout.verify(rows):
+                return text
+            print("浮窗布局发生变化，重新学习")
+            layout.reset()
+
+        if layout.observe(rows):
+            # 固定行只识别一次，用来判断规则是否依赖这些行
+            spans = [(layout.header[0][0], layout.header[-1][1])] if layout.header else []
+            if layout.footer:
+                spans.append((layout.footer[0][0], layout.footer[-1][1]))
+            layout.fixed_text = '\n'.join(
+                self.screen.read_text((region[0], region[1] + top, region[2], bottom - top),
+                                      scale_factor=self.ocr_scale_factor, hwnd=hwnd)
+                for top, bottom in spans)
+            if self.db:
+                self.db.set(self._equipment_key('tooltip_layout'), layout.to_dict())
+            if not self._layout_allowed(layout, rules):
+                self._layout = None
+                return text
+            top, bottom = layout.affix_span
+            print(f"已学会浮窗布局: 固定行 {len(layout.fixed_rows())} 行，之后只识别第 {top}-{bottom} 像素行 (共 {layout.size[1]})")
+        return text
+
+    def _load_timing(self):
+        """按配置准备自适应等待时间画像"""
+        self._timing = None
+        self.screen.keep_thumbnail = False
+        if not self.adaptive_timing:
+            return
+        defaults = {'hover': self.hover_wait, 'reroll': self.interval}
+        data = self.db.get(self._equipment_key('timing_profile')) if self.db else None
+        self._timing = TimingProfile.from_dict(data, defaults)
+        self.screen.keep_thumbnail = True
+        print(f"自适应等待: {self._timing.summary()}")
+
+    def _save_timing(self):
+        if self._timing is None:
+            return
+        print(f"自适应等待: {self._timing.summary()}")
+        if self.db:
+            self.db.set(self._equipment_key('timing_profile'), self._timing.to_dict())
+
+    def _timed_wait(self, kind, region, hwnd, baseline):
+        """
+        等待浮窗出现 / 刷新。需要实测时轮询截图直到画面变化并稳定 (同时记录耗时)，否则按画像等待固定时间。
+        :param baseline: 操作之前的缩略图 (None 表示这次不实测)
+        :return: True 表示被中止
+        """
+        timing = self._timing
+        if baseline is None:
+            return self._smart_sleep(timing.wait(kind) if timing else (self.hover_wait if kind == 'hover' else self.interval))
+        # 鼠标一直停在装备上时浮窗不会变化: 等满平时的悬停等待就返回，不算样本也不算失败
+        quiet = timing.wait('hover') if kind == 'hover' else None
+        elapsed = measure_settle(lambda: self.screen.region_thumbnail(region, hwnd), baseline,
+                                 timing.timeout(kind), self._smart_sleep, quiet=quiet)
+        if self._check_stop():
+            return True
+        if elapsed is None:
+            timing.record_failure(kind)
+        elif elapsed > 0:
+            timing.record(kind, elapsed)
         return False
 
+    def _compile_rules(self):
+        """
+        编译当前任务的规则并恢复求值顺序。规则只编译一次，循环里直接使用编译结果 (同时作为匹配结果缓存的 key)
+        :return: (主规则, 多目标规则字典或 None, 所有规则列表)
+        """
+        active_rule = self.matcher.compile(self.conditions, rule_id=self.rule_id)
+        active_rules = None
+        if self.rule_set:
+            active_rules = {name: self.matcher.compile(cond) for name, cond in self.rule_set.items()}
+        all_rules = [active_rule] + list((active_rules or {}).values())
+        self._load_rule_orders(all_rules)
+        return active_rule, active_rules, all_rules
+
+    def _read_target(self, window):
+        """截图用的 (区域, hwnd): 后台模式传递 hwnd 和相对区域，前台模式使用绝对区域"""
+        offset_x, offset_y, target_hwnd = window
+        if self.background_mode:
+            return self.affix_region, target_hwnd
+        x, y, w, h = self.affix_region
+        return (x + offset_x, y + offset_y, w, h), None
+
+    def _hover(self, gear_pos, window):
+        """把鼠标移到装备上 (显示浮窗)"""
+        offset_x, offset_y, target_hwnd = window
+        if self.input_device is not None:
+            self.input_device.hover(gear_pos[0] + offset_x, gear_pos[1] + offset_y)
+        elif self.background_mode:
+             # 后台模式：发送鼠标移动消息 (使用相对坐标)
+             win32_utils.send_mouse_move(target_hwnd, gear_pos[0], gear_pos[1])
+        else:
+             # 前台模式：物理移动鼠标
+             pyautogui.moveTo(gear_pos[0] + offset_x, gear_pos[1] + offset_y, duration=0)
+
+    def _press_reroll(self, target_hwnd):
+        """按Z键洗炼当前悬停的装备"""
+        if self.input_device is not None:
+            self.input_device.press('z')
+        elif self.background_mode:
+             win32_utils.send_key_click(target_hwnd, 'z')
+        else:
+            if keyboard:
+                try:
+                    keyboard.press_and_release('z')
+                except:
+                    pyautogui.press('z')
+            else:
+                pyautogui.press('z')
+
+    def validate_rules(self):
+        """
+        静态检查本次要用的规则 (多目标模式下检查每一条)。
+        :return: (所有规则都永远无法满足, {规则名: 问题列表})
+        """
+        rules = self.rule_set if self.rule_set else {'当前规则': self.conditions}
+        report = {name: validate_rule(cond, self.matcher.normalize_text) for name, cond in rules.items()}
+        impossible = all(has_errors(issues) for issues in report.values())
+        return impossible, report
+
     def run(self):
-        if not self.affix_region or not self.gear_pos:
-            print("错误: 未配置区域，请先运行 setup_wizard()")
-            return
+        """
+        按当前配置执行洗炼 (单个任务)。
+        :return: 结果字典 (见 jobs.job_result)
+        """
+        hotkey = self._register_stop_hotkey()
+        try:
+            return self._run()
+        finally:
+            self._remove_hotkey(hotkey)
 
-        print(f"开始执行洗炼，最大尝试次数: {self.max_attempts}")
+    def run_jobs(self, jobs):
+        """
+        依次执行任务队列 (jobs.WashJob 列表)。
+        OCR 引擎、形近字 / 阈值 / 词缀目录、窗口句柄和编译好的规则在任务之间复用，每个任务只切换装备位置、区域和规则。
+        用户中止后剩下的任务不再执行。
+        :return: 各任务的结果字典列表 (与 jobs 按顺序对应，中止后的任务没有结果)
+        """
+        hotkey = self._register_stop_hotkey()
+        try:
+            return self._run_jobs(list(jobs))
+        finally:
+            self._remove_hotkey(hotkey)
+
+    def run_interleaved(self, jobs):
+        """
+        交替洗炼同一窗口里的多件装备 (jobs.WashJob 列表)，一件装备的识别和另一件装备的刷新同时进行。
+        每件装备有自己的规则、预算和结束状态，全部结束或用户中止时返回。
+        :return: 各任务的结果字典列表 (与 jobs 按顺序对应)
+        """
+        hotkey = self._register_stop_hotkey()
+        try:
+            jobs = list(jobs)
+            if len(jobs) < 2:
+                print("提示: 交替洗炼至少需要两件装备，按普通队列执行")
+                return self._run_jobs(jobs)
+            return self._run_interleaved(jobs)
+        finally:
+            self._remove_hotkey(hotkey)
+
+    def _rules_runnable(self):
+        """运行前检查规则，打印问题；规则永远无法满足时返回 False"""
+        impossible, report = self.validate_rules()
+        for name, issues in report.items():
+            if issues:
+                print(f"规则检查 [{name}]:\n{format_issues(issues)}")
+        if impossible:
+            print("错误: 规则永远无法满足，已拒绝运行 (确认无误后可设置 skip_rule_validation 强制运行)")
+        return not impossible
+
+    def _print_mode(self):
         if self.background_mode:
             print("模式: [后台运行] - 请确保游戏窗口不要最小化 (可以被遮挡)")
         else:
             print("模式: [前台运行] - 请在该窗口激活游戏/应用，不要移动鼠标")
             
         print("提示：按【HOME键】可随时终止运行")
-        
-        # 启动等待也可以被打断
-        if self._smart_sleep(1.0): 
-            print("启动被打断。")
-            return
 
-        # 查找窗口并计算
+    def _load_matching_tables(self):
+        """加载形近字表、阈值表和词缀目录 (顺序不能变，任务队列中只加载一次)"""
+        self._load_confusions()
+        self._load_thresholds()
+        self._load_catalog()
+
+    def _locate_window(self):
+        """
+        查找绑定的窗口。
+        :return: (offset_x, offset_y, hwnd)；无法继续运行时返回 None
+        """
         offset_x, offset_y = 0, 0
         target_hwnd = None
         
-        if self.window_title:
+        if self.hwnd is not None:
+            rect = win32_utils.get_window_rect(self.hwnd)
+            if not rect:
+                print(f"错误: 窗口 HWND {self.hwnd} 已不存在！")
+                return None
+            offset_x, offset_y = rect[0], rect[1]
+            target_hwnd = self.hwnd
+            print(f"已定位窗口位置: ({offset_x}, {offset_y}) HWND: {target_hwnd}")
+        elif self.window_title:
             print(f"尝试查找窗口: [{self.window_title}] ...")
             target_win = win32_utils.find_window_by_title(self.window_title)
             if target_win:
@@ -231,104 +648,548 @@ class GearWasher:
                 print(f"错误: 找不到标题包含 [{self.window_title}] 的窗口！")
                 if self.background_mode:
                     print("后台模式必须依赖窗口绑定，无法继续！")
-                    return
+                    return None
                 print("前台模式将尝试使用最后的绝对坐标 (可能不准确)...")
         else:
              if self.background_mode:
                 print("错误: 后台模式必须在配置中绑定窗口标题！")
-                return
+                return None
+        return offset_x, offset_y, target_hwnd
+
+    def _run(self):
+        if not self.affix_region or not self.gear_pos:
+            print("错误: 未配置区域，请先运行 setup_wizard()")
+            return job_result(SKIPPED, reason="未配置区域")
 
-        # 预计算前台模式需要的绝对坐标
-        real_gear_pos = (self.gear_pos[0] + offset_x, self.gear_pos[1] + offset_y)
-        real_affix_region = (self.affix_region[0] + offset_x, self.affix_region[1] + offset_y, self.affix_region[2], self.affix_region[3])
+        if not self.skip_rule_validation and not self._rules_runnable():
+            return job_result(SKIPPED, reason="规则无法满足")
+
+        print(f"开始执行洗炼，最大尝试次数: {self.max_attempts}")
+        if self.rule_set:
+            print(f"多目标模式: 任意一条规则满足即停止 -> {', '.join(self.rule_set.keys())}")
+        self._print_mode()
+        
+        # 启动等待也可以被打断
+        if self._smart_sleep(self.start_delay): 
+            print("启动被打断。")
+            return job_result(STOPPED)
 
-        for i in range(self.max_attempts):
-            # --- 阶段性检查 1 ---
-            if self._check_stop(): break
+        window = self._locate_window()
+        if window is None:
+            return job_result(SKIPPED, reason="找不到窗口")
+        self._load_matching_tables()
+        return self._wash(window, notify=self.show_message_box)
 
-            # 调试日志仅每10次显示一次，避免刷屏 (还是全显吧，用户爱看不看)
-            print(f"\n--- 第 {i+1} 次尝试 ---")
+    def _run_jobs(self, jobs):
+        saved = {name: getattr(self, name) for name in self._JOB_FIELDS}
+        results = []
+        print(f"开始执行任务队列: 共 {len(jobs)} 个任务")
+        self._print_mode()
+        if self._smart_sleep(self.start_delay):
+            print("启动被打断。")
+            return results
+
+        self._load_matching_tables()
+        windows = {}  # 窗口标题 -> _locate_window() 的结果 (同一个窗口只查找一次)
+        try:
+            for idx, job in enumerate(jobs):
+                if self._check_stop():
+                    break
+                print(f"\n===== 任务 {idx + 1}/{len(jobs)}: {job.name} =====")
+                self.apply_job(job, saved)
+                if not self.affix_region or not self.gear_pos:
+                    print("错误: 任务未配置装备位置或识别区域，跳过")
+                    results.append(job_result(SKIPPED, reason="未配置区域"))
+                    continue
+                if not self.skip_rule_validation and not self._rules_runnable():
+                    results.append(job_result(SKIPPED, reason="规则无法满足"))
+                    continue
+                window_key = self.hwnd if self.hwnd is not None else self.window_title
+                if window_key not in windows:
+                    windows[window_key] = self._locate_window()
+                if windows[window_key] is None:
+                    results.append(job_result(SKIPPED, reason="找不到窗口"))
+                    continue
+                print(f"最大尝试次数: {self.max_attempts}" +
+                      (f"，限时 {self.time_budget:.0f}s" if self.time_budget else ""))
+                result = self._wash(windows[window_key], notify=False)
+                results.append(result)
+                if result['status'] == STOPPED:
+                    break
+        finally:
+            for name, value in saved.items():
+                setattr(self, name, value)
+
+        summary = format_results(jobs, results)
+        print(summary)
+        if self.show_message_box:
+            self._message_box(summary, '装备洗炼助手')
+        return results
+
+    def _run_interleaved(self, jobs):
+        saved = {name: getattr(self, name) for name in self._JOB_FIELDS}
+        results = {}
+        print(f"开始交替洗炼: 共 {len(jobs)} 件装备 (识别与游戏刷新重叠进行)")
+        self._print_mode()
+        # 这些功能依赖 "一次只洗一件" 的阶段划分 (逐帧的阶段耗时、按任务顺序写的存档等)，交替洗炼时不生效
+        ignored = [label for enabled, label in ((self.streaming_ocr, "流式识别"), (self.roi_layout, "词缀区裁剪"),
+                                                (self.adaptive_timing, "自适应等待"), (self.session_path, "会话录制"),
+                                                (self.record_timing, "阶段耗时统计"), (self.trace_matching, "匹配追踪"))
+                   if enabled]
+        if ignored:
+            print(f"提示: 交替洗炼不支持{'、'.join(ignored)}，本次运行不会生效")
+        if self._smart_sleep(self.start_delay):
+            print("启动被打断。")
+            return []
+
+        self._load_matching_tables()
+        windows = {}
+        items = []
+        try:
+            for idx, job in enumerate(jobs):
+                self.apply_job(job, saved)
+                if not self.affix_region or not self.gear_pos:
+                    results[idx] = job_result(SKIPPED, reason="未配置区域")
+                    continue
+                if not self.skip_rule_validation and not self._rules_runnable():
+                    results[idx] = job_result(SKIPPED, reason="规则无法满足")
+                    continue
+                window_key = self.hwnd if self.hwnd is not None else self.window_title
+                if window_key not in windows:
+                    windows[window_key] = self._locate_window()
+                window = windows[window_key]
+                if window is None:
+                    results[idx] = job_result(SKIPPED, reason="找不到窗口")
+                    continue
+                rule, rules, all_rules = self._compile_rules()
+                region, hwnd = self._read_target(window)
+                digit_filter = self._digit_line_filter(list(rules.values()) if rules else [rule])
+                items.append(InterleavedItem(job, idx, window, rule, rules, all_rules, region, hwnd,
+                                             digit_filter, self.max_attempts, self.time_budget))
+        finally:
+            for name, value in saved.items():
+                setattr(self, name, value)
+
+        if items:
+            self._interleave_loop(items)
+        for item in items:
+            results[item.index] = item.result
+            self._save_rule_orders(item.all_rules)
+
+        ordered = [results[idx] for idx in range(len(jobs))]
+        total = sum(r['attempts'] for r in ordered)
+        elapsed = max((r['elapsed'] for r in ordered), default=0.0)
+        summary = format_results(jobs, ordered)
+        summary += f"\n合计 {total} 次洗炼，{elapsed:.1f}s ({total / elapsed if elapsed > 0 else 0.0:.2f} 次/秒)"
+        print(summary)
+        if self.show_message_box:
+            self._message_box(summary, '装备洗炼助手')
+        return ordered
+
+    def _decide(self, item, image):
+        """识别线程: 识别截图并判定 -> (是否命中, 命中规则, 文本)"""
+        text = self.screen.read_image(image, item.region, scale_factor=self.ocr_scale_factor,
+                                      digit_filter=item.digit_filter)
+        if item.rules:
+            names = self.matcher.check_any(text, item.rules)
+            return bool(names), names, text
+        matched = self.matcher.check(text, item.rule)
+        return matched, ['当前规则'] if matched else [], text
+
+    def _interleave_loop(self, items):
+        """
+        轮流处理各件装备 (见 interleave.InterleavedItem): 截图后交给识别线程就去处理下一件，
+        下次轮到时再取结论、按键。识别线程只有一个，匹配器只在识别线程中使用。
+        """
+        ocr = ThreadPoolExecutor(max_workers=1, thread_name_prefix="washer-ocr")
+        side = SideWorker("washer-side")
+        wlog = self._open_log()
+        self.screen.defer = side.submit
+        self.matcher.trace_enabled = False  # 不支持匹配追踪 (见 _run_interleaved)，不要沿用上次运行的设置
+        try:
+            while not self._check_stop():
+                active = [item for item in items if not item.finished]
+                if not active:
+                    break
+                for item in active:
+                    if self._check_stop():
+                        break
+                    name = item.job.name
+                    if item.pending is None:
+                        # 截图阶段: 预算用完就结束这件装备
+                        status = item.out_of_budget()
+                        if status is not None:
+                            item.finish(status)
+                            wlog.event("[%s] %s，停止。", name, '已达到最大尝试次数' if status == EXHAUSTED else '已用完时间预算')
+                            continue
+                        self._hover(item.job.gear_pos, item.window)
+                        if self._smart_sleep(max(self.hover_wait, item.refresh_wait(self.interval))):
+                            break
+                        image = self.screen.grab(item.region, item.hwnd)
+                        if image is None:
+                            continue
+                        item.attempts += 1
+                        item.pending = ocr.submit(self._decide, item, image)
+                        continue
+
+                    # 判定阶段: 先悬停 (按键作用于悬停的装备)，等待期间识别线程多半已经出结果
+                    self._hover(item.job.gear_pos, item.window)
+                    if self._smart_sleep(self.hover_wait):
+                        break
+                    try:
+                        matched, names, text = item.pending.result()
+                    except Exception as e:
+                        wlog.ocr_error("[%s] 识别出错: %s", name, e)
+                        matched, names, text = False, [], ""
+                    item.pending = None
+                    item.text = text
+                    if matched:
+                        item.matched_rules = names
+                        item.finish(MATCHED)
+                        wlog.roll(item.attempts, text, True, label=f"[{name}] ")
+                        wlog.event(">>> [%s] 成功匹配到目标属性！<<< %s", name, text.replace("\n", " | ") +
+                                   (f" 命中规则: {', '.join(names)}" if item.rules else ""))
+                        continue
+                    self._press_reroll(item.window[2])
+                    item.pressed_at = time.perf_counter()
+                    wlog.roll(item.attempts, text, False, label=f"[{name}] ")
+        finally:
+            ocr.shutdown(wait=True)
+            for item in items:
+                if not item.finished:
+                    item.finish(STOPPED)
+            side.close()
+            wlog.close()
+            self._wlog = None
+            self.screen.defer = None
+            print(f"匹配统计: {self.matcher.memo.stats()}，超时退化 {self.matcher.degraded_checks} 次")
+
+    def apply_job(self, job, defaults=None):
+        """
+        把任务的配置写到洗炼器上。
+        :param defaults: 任务没有设置预算时使用的 {'max_attempts', 'time_budget'}，None 表示保留当前值
+        """
+        defaults = defaults or {'max_attempts': self.max_attempts, 'time_budget': self.time_budget}
+        self.gear_pos = job.gear_pos
+        self.affix_region = job.affix_region
+        self.window_title = job.window_title
+        self.equipment_id = job.equipment_id
+        self.conditions = job.conditions
+        self.rule_id = job.rule_id
+        self.rule_set = job.rule_set
+        self.max_attempts = job.max_attempts if job.max_attempts is not None else defaults['max_attempts']
+        self.time_budget = job.time_budget if job.time_budget is not None else defaults['time_budget']
+
+    def _wash(self, window, notify=True):
+        """
+        按当前配置 (装备位置、区域、规则) 执行洗炼循环。
+        :param window: _locate_window() 的结果
+        :param notify: 结束时是否弹出提示框 (任务队列只在全部结束后提示一次)
+        :return: 结果字典 (见 jobs.job_result)
+        """
+        target_hwnd = window[2]
+        self.matched_rules = []
+
+        active_rule, active_rules, all_rules = self._compile_rules()
+        used_rules = list(active_rules.values()) if active_rules else [active_rule]
+        digit_filter = self._digit_line_filter(used_rules)
+        self._load_layout(used_rules)
+        self._load_timing()
+        read_region, read_hwnd = self._read_target(window)
+        if self.record_timing and self.telemetry is None:
+            self.telemetry = StageTelemetry()
+        recorder = self._open_recorder()
+        # 录制时即使没有开启耗时统计也要记录各阶段耗时 (只保留最近一次)
+        tel = self.telemetry if self.record_timing else (StageTelemetry(1) if recorder else None)
+        stage_times = self.screen.stage_times
+
+        # 关键链路 (悬停 -> 截图 -> OCR -> 判定 -> 按键) 留在当前线程；
+        # 日志、调试文件保存交给 side 线程，完成提醒 (会阻塞到用户关闭提示框) 交给 notifier 线程
+        side = SideWorker("washer-side")
+        notifier = SideWorker("washer-notify")
+        wlog = self._open_log()
+        self.screen.defer = side.submit
+        try:
+            status, attempts, text = EXHAUSTED, 0, ""
+            started = time.perf_counter()
+            deadline = started + self.time_budget if self.time_budget else None
+            for i in range(self.max_attempts):
+                # --- 阶段性检查 1 ---
+                if self._check_stop(): break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    status = TIME_UP
+                    wlog.event("已用完时间预算 (%.0fs)，停止执行。", self.time_budget)
+                    break
+                attempts = i + 1
             
-            # 1. 移动到装备位置，显示浮窗
-            if self.background_mode:
-                 # 后台模式：发送鼠标移动消息 (使用相对坐标)
-                 win32_utils.send_mouse_move(target_hwnd, self.gear_pos[0], self.gear_pos[1])
-            else:
-                 # 前台模式：物理移动鼠标
-                 pyautogui.moveTo(real_gear_pos[0], real_gear_pos[1], duration=0)
+                # 1. 移动到装备位置，显示浮窗
+                if tel is not None: tel.begin()
+                hover_baseline = None
+                if self._timing is not None and self._timing.should_measure('hover'):
+                    hover_baseline = self.screen.region_thumbnail(read_region, read_hwnd)
+                self._hover(self.gear_pos, window)
+                if tel is not None: tel.mark(HOVER)
             
-            # --- 阶段性检查 2 (移动后) ---
-            if self._check_stop(): break
+                # --- 阶段性检查 2 (移动后) ---
+                if self._check_stop(): break
 
-            # 等待浮窗显示
-            if self._smart_sleep(0.1): break
+                # 等待浮窗显示
+                if self._timed_wait('hover', read_region, read_hwnd, hover_baseline): break
+                if tel is not None: tel.mark(HOVER_WAIT)
 
-            # 2. 识别当前属性
-            if self._check_stop(): break
+                # 2. 识别当前属性
+                if self._check_stop(): break
             
-            try:
-                if self.background_mode:
-                    # 后台模式：传递 hwnd 和相对区域
-                    text = self.screen.read_text(self.affix_region, scale_factor=self.ocr_scale_factor, hwnd=target_hwnd)
-                else:
-                    # 前台模式：使用绝对区域
-                    text = self.screen.read_text(real_affix_region, scale_factor=self.ocr_scale_factor)
-            except Exception as e:
-                print(f"识别出错: {e}")
-                text = ""
-
-            clean_text = text.replace("\n", " | ")
-            print(f"识别到的文本: {clean_text}")
-
-            # --- 阶段性检查 3 (识别后) ---
-            if self._check_stop(): break
-
-            # 3. 判断是否满足条件
-            if self.matcher.check(text, self.conditions):
-                print(">>> 成功匹配到目标属性！停止洗炼。 <<<")
-                
-                # 尝试强制前台并置顶 (仅提醒)
-                import ctypes
+                stream_verdict = None
+                stage_times[0] = stage_times[1] = 0.0
+                self.screen.last_capture = None
                 try:
-                    # 如果是后台模式，可能需要闪烁任务栏提醒
-                    if self.background_mode:
-                        ctypes.windll.user32.FlashWindow(ctypes.windll.kernel32.GetConsoleWindow(), 1)
+                    if self.streaming_ocr and not self.rule_set:
+                        text, stream_verdict = self._read_streaming(read_region, active_rule, read_hwnd)
+                    elif self._layout is not None:
+                        text = self._read_with_layout(read_region, read_hwnd, digit_filter, used_rules)
                     else:
-                        ctypes.windll.user32.SwitchToThisWindow(ctypes.windll.kernel32.GetConsoleWindow(), 1)
-                except:
-                    pass
-                
-                ctypes.windll.user32.MessageBoxW(0, f'洗炼完成！\n已匹配到目标属性:\n{self.conditions}', '装备洗炼助手', 0x40 | 0x1000)
-                break
+                        text = self.screen.read_text(read_region, scale_factor=self.ocr_scale_factor, hwnd=read_hwnd,
+                                                     digit_filter=digit_filter)
+                except Exception as e:
+                    wlog.ocr_error("识别出错: %s", e)
+                    text = ""
+                if tel is not None:
+                    tel.mark(OCR)
+                    tel.split(OCR, (CAPTURE, PREPROCESS), stage_times)
+
+                # --- 阶段性检查 3 (识别后) ---
+                if self._check_stop(): break
+
+                # 3. 判断是否满足条件 (从拿到识别结果到按键之间只做判定，日志都在按键之后提交)
+                self.matcher.trace_enabled = self.trace_matching
+                self.matcher.last_trace = None
+                if stream_verdict is not None:
+                    # 流式识别已经给出结论
+                    is_matched = stream_verdict == ACCEPT
+                    self.matched_rules = ['当前规则'] if is_matched else []
+                elif self.rule_set:
+                    # 多目标模式: 一帧只做一次关键词判定，返回所有命中的规则
+                    self.matched_rules = self.matcher.check_any(text, active_rules)
+                    is_matched = bool(self.matched_rules)
+                else:
+                    is_matched = self.matcher.check(text, active_rule)
+                    self.matched_rules = ['当前规则'] if is_matched else []
+
+                if self.matcher.last_trace:
+                    self.recent_traces.append({'attempt': i + 1, 'time': time.time(), 'rules': self.matcher.last_trace})
+                if tel is not None: tel.mark(MATCH)
+
+                if is_matched:
+                    if tel is not None: tel.end()
+                    if recorder is not None:
+                        self._record_roll(side, recorder, i + 1, text, True, read_region, tel)
+                    wlog.roll(i + 1, text, True)
+                    wlog.event("识别到的文本: %s", text.replace("\n", " | "))
+                    wlog.event(">>> 成功匹配到目标属性！停止洗炼。 <<<")
+                    if self.rule_set:
+                        wlog.event(">>> 命中规则: %s <<<", ', '.join(self.matched_rules))
+                    status = MATCHED
+                    if notify:
+                        target_desc = '\n'.join(self.matched_rules) if self.rule_set else self.conditions
+                        notifier.submit(self._notify_success, target_desc)
+                    break
             
-            # 4. 不满足，按Z键洗炼
-            # 注意：在后台模式下，鼠标理论上只是发送了消息，不需要显式保持。
-            # 但为了保险，可以再次确保鼠标位置(通常不需要)
+                # 4. 不满足，按Z键洗炼
+                # 注意：在后台模式下，鼠标理论上只是发送了消息，不需要显式保持。
+                # 但为了保险，可以再次确保鼠标位置(通常不需要)
+                self._press_reroll(target_hwnd)
+                if tel is not None: tel.mark(KEY)
+
+                wlog.roll(i + 1, text, False)
+                if self.matcher.last_trace:
+                    side.submit(self._log_trace, wlog, self.matcher.last_trace)
             
-            print("未匹配，按Z键洗炼...")
-            if self.background_mode:
-                 win32_utils.send_key_click(target_hwnd, 'z')
+                # 5. 等待动画或刷新 (需要实测时用识别时截图的缩略图作为 "刷新前" 的画面)
+                reroll_baseline = None
+                if self._timing is not None and self._timing.should_measure('reroll') and self.screen.last_thumbnail:
+                    thumb_region, thumb_hwnd, reroll_baseline = self.screen.last_thumbnail
+                else:
+                    thumb_region, thumb_hwnd = read_region, read_hwnd
+                if self._timed_wait('reroll', thumb_region, thumb_hwnd, reroll_baseline):
+                    wlog.event(">>> 用户手动停止脚本。 <<<")
+                    if notify:
+                        notifier.submit(self._message_box, '用户手动中止洗炼。', '脚本停止')
+                    break
+                if tel is not None:
+                    tel.mark(REROLL_WAIT)
+                    tel.end()
+                if recorder is not None:
+                    self._record_roll(side, recorder, i + 1, text, False, read_region, tel)
+
             else:
-                if keyboard:
-                    try:
-                        keyboard.press_and_release('z')
-                    except:
-                        pyautogui.press('z')
+                 wlog.event("已达到最大尝试次数，停止执行。")
+        finally:
+            # 中途出错 (例如输入设备异常) 也要停掉后台线程、关闭日志和存档并保存学到的数据
+            # 先把剩余日志输出完，再等待提示框关闭 (与之前 run() 在提示框关闭后才返回的行为一致)
+            side.close()
+            wlog.close()
+            self._wlog = None
+            self.screen.defer = None
+            if recorder is not None:
+                recorder.close()
+                self.screen.keep_capture = False
+                self.screen.last_capture = None
+                print(f"会话已录制: {self.session_path} (共 {recorder.count} 次洗炼)")
+            print(f"匹配统计: {self.matcher.memo.stats()}，超时退化 {self.matcher.degraded_checks} 次")
+            self._save_rule_orders(all_rules)
+            self._save_timing()
+            if self.record_timing:
+                print(tel.summary())
+                if self.telemetry_path:
+                    self.export_telemetry(self.telemetry_path)
+            notifier.close(timeout=None)
+
+        if status == EXHAUSTED and self._check_stop():
+            status = STOPPED
+        return job_result(status, attempts, time.perf_counter() - started, self.matched_rules, text)
+
+    def export_telemetry(self, path=None):
+        """
+        导出耗时统计 (运行中也可以调用)。.json 文件同时包含最近的匹配追踪记录。
+        :return: 导出的路径，没有记录或写入失败时返回 None
+        """
+        if self.telemetry is None or not self.telemetry.count:
+            print("没有耗时记录可导出")
+            return None
+        path = path or self.telemetry_path or DEFAULT_TELEMETRY_PATH
+        try:
+            self.telemetry.export(path, traces=list(self.recent_traces))
+        except OSError as e:
+            print(f"导出耗时统计失败: {e}")
+            return None
+        print(f"已导出耗时统计: {path}")
+        return path
+
+    def _open_log(self):
+        """按配置创建本次运行的日志 (见 wash_log.WashLog)，供 _read_streaming 等使用"""
+        self._wlog = WashLog(self.log_prefix, verbose=self.verbose_log, file_path=self.log_file,
+                             summary_every=self.summary_every, summary_interval=self.summary_interval).start()
+        return self._wlog
+
+    def _open_recorder(self):
+        """按配置打开会话存档并写入本任务的配置，未开启或打开失败时返回 None"""
+        if not self.session_path:
+            return None
+        try:
+            recorder = SessionRecorder(self.session_path).open()
+            config = {name: getattr(self, name) for name in self._SESSION_FIELDS}
+            config['started'] = time.time()
+            recorder.begin_job(config)
+        except (OSError, ValueError) as e:
+            print(f"警告: 无法打开会话存档 {self.session_path} ({e})，本次不录制")
+            return None
+        self.screen.keep_capture = True
+        return recorder
+
+    def _record_roll(self, side, recorder, attempt, text, matched, read_region, tel):
+        """把这次洗炼交给 side 线程写入存档 (截图压缩和写盘不在洗炼循环里做)"""
+        capture = self.screen.last_capture
+        # 只保存完整的词缀区截图 (词缀区裁剪模式下的行截图无法原样回放)
+        image = capture[1] if capture is not None and capture[0] == read_region else None
+        side.submit(recorder.append, attempt, text, matched, list(self.matched_rules), image,
+                    read_region, tel.last(), time.time())
+
+    def replay(self, reader, start=0, stop=None, realtime=False, speed=1.0, ocr=True, overrides=None):
+        """
+        离线回放会话存档 (session.SessionReader): 每次洗炼的截图重新走一遍 预处理 -> OCR -> 判定，
+        不需要游戏窗口，也不发送任何输入。用于在真实数据上比较 OCR / 匹配改动的效果和速度。
+        :param realtime: 按录制时的间隔 (除以 speed) 回放；否则尽快回放
+        :param ocr: False 时直接使用录制的识别文本，只测判定
+        :param overrides: 覆盖录制时的配置 (字段见 _SESSION_FIELDS，例如换一个词缀目录)
+        :return: {'rolls', 'elapsed', 'ocr_changed', 'decision_changed', 'no_image', 'changed': [(序号, 录制, 回放)]}
+        """
+        saved = {name: getattr(self, name) for name in self._SESSION_FIELDS}
+        self.telemetry = tel = StageTelemetry()
+        stage_times = self.screen.stage_times
+        stats = {'rolls': 0, 'elapsed': 0.0, 'ocr_changed': 0, 'decision_changed': 0, 'no_image': 0, 'changed': []}
+        job = None
+        rule = rules = digit_filter = None
+        clock = None  # (第一帧的录制时间, 回放开始时间)
+        started = time.perf_counter()
+        try:
+            for roll in reader.iter_range(start, stop):
+                if self._check_stop():
+                    break
+                if roll.job is not job:
+                    job = roll.job
+                    for name in self._SESSION_FIELDS:
+                        setattr(self, name, job.get(name, saved[name]))
+                    for name, value in (overrides or {}).items():
+                        setattr(self, name, value)
+                    self._load_matching_tables()
+                    rule, rules, _ = self._compile_rules()
+                    digit_filter = self._digit_line_filter(list(rules.values()) if rules else [rule])
+                if realtime:
+                    if clock is None:
+                        clock = (roll.time, time.perf_counter())
+                    delay = clock[1] + (roll.time - clock[0]) / speed - time.perf_counter()
+                    if delay > 0 and self._smart_sleep(delay):
+                        break
+
+                tel.begin()
+                stage_times[0] = stage_times[1] = 0.0
+                image = roll.image() if ocr else None
+                tel.mark(CAPTURE)  # 回放时 "截图" 阶段是解压截图
+                if image is not None:
+                    text = self.screen.read_image(image, tuple(roll.region), scale_factor=self.ocr_scale_factor,
+                                                  digit_filter=digit_filter)
+                    tel.mark(OCR)
+                    tel.split(OCR, (PREPROCESS,), stage_times[1:])
                 else:
-                    pyautogui.press('z')
-            
-            # 5. 等待动画或刷新
-            if self._smart_sleep(self.interval):
-                print("\n\n>>> 用户手动停止脚本。 <<<")
-                try:
-                    import ctypes
-                    ctypes.windll.user32.MessageBoxW(0, '用户手动中止洗炼。', '脚本停止', 0x40 | 0x1000)
-                except:
-                    pass
-                break
+                    if ocr:
+                        stats['no_image'] += 1
+                    text = roll.text
+                if rules:
+                    matched = bool(self.matcher.check_any(text, rules))
+                else:
+                    matched = self.matcher.check(text, rule)
+                tel.mark(MATCH)
+                tel.end()
 
-        else:
-             print("已达到最大尝试次数，停止执行。")
+                stats['rolls'] += 1
+                if text != roll.text:
+                    stats['ocr_changed'] += 1
+                if matched != roll.matched:
+                    stats['decision_changed'] += 1
+                    stats['changed'].append((roll.index, roll.matched, matched))
+        finally:
+            for name, value in saved.items():
+                setattr(self, name, value)
+        stats['elapsed'] = time.perf_counter() - started
+        return stats
+
+    @staticmethod
+    def _log_trace(wlog, trace):
+        """在 side 线程中格式化匹配追踪 (格式化较慢，不放在洗炼循环里)"""
+        wlog.trace(format_trace(trace))
+
+    @staticmethod
+    def _message_box(text, title):
+        try:
+            import ctypes
+            ctypes.windll.user32.MessageBoxW(0, text, title, 0x40 | 0x1000)
+        except Exception:
+            pass
+
+    def _notify_success(self, target_desc):
+        """洗炼完成提醒 (在 notifier 线程中执行)"""
+        # 尝试强制前台并置顶 (仅提醒)
+        import ctypes
+        try:
+            # 如果是后台模式，可能需要闪烁任务栏提醒
+            if self.background_mode:
+                ctypes.windll.user32.FlashWindow(ctypes.windll.kernel32.GetConsoleWindow(), 1)
+            else:
+                ctypes.windll.user32.SwitchToThisWindow(ctypes.windll.kernel32.GetConsoleWindow(), 1)
+        except:
+            pass
+        self._message_box(f'洗炼完成！\n已匹配到目标属性:\n{target_desc}', '装备洗炼助手')
 
 if __name__ == "__main__":
     # 示例用法
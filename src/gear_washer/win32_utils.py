@@ -1,10 +1,15 @@
 import ctypes
+import sys
 from ctypes import wintypes
 import time
 
-user32 = ctypes.windll.user32
-kernel32 = ctypes.windll.kernel32
-gdi32 = ctypes.windll.gdi32
+if sys.platform == 'win32':
+    user32 = ctypes.windll.user32
+    kernel32 = ctypes.windll.kernel32
+    gdi32 = ctypes.windll.gdi32
+else:
+    # 非 Windows (例如在 Linux 上用 simulator 测试) 只保证模块能导入，调用窗口函数会出错
+    user32 = kernel32 = gdi32 = None
 
 # Win32 Constants
 SRCCOPY = 0x00CC0020
@@ -49,13 +54,13 @@ def get_foreground_window_info():
         "h": rect.bottom - rect.top
     }
 
-def find_window_by_title(title_part):
+def find_all_windows_by_title(title_part):
     """
-    根据标题查找窗口（部分匹配）
+    查找所有标题包含 title_part 的可见窗口（同一个游戏多开时会有多个）
     注意：FindWindowW 只能精确匹配类名或标题，这里我们需要遍历枚举
     """
     if not title_part:
-        return None
+        return []
 
     found_windows = []
 
@@ -82,6 +87,13 @@ def find_window_by_title(title_part):
 
     CMPFUNC = ctypes.WINFUNCTYPE(ctypes.c_bool, wintypes.HWND, wintypes.LPARAM)
     user32.EnumWindows(CMPFUNC(enum_windows_proc), 0)
+    return found_windows
+
+def find_window_by_title(title_part):
+    """
+    根据标题查找窗口（部分匹配）
+    """
+    found_windows = find_all_windows_by_title(title_part)
     
     # 优先返回完全匹配的，否则返回第一个部分匹配的
     for w in found_windows: